@@ -1,42 +1,98 @@
+import json
 import logging
 import sys
+import time
+from contextlib import nullcontext
+from functools import cached_property
 import utils
-from asana_workspace import AsanaWorkspace
-from typing import List, Dict, Optional
-from data import PRData, AsanaTask
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+from coalesce import COALESCED_ACTIONS, FileDebouncer
+from asana_workspace import AsanaWorkspace, FIELD_PROFILES
+from stages import StageGraph
+from subtask_index import SubtaskIndex
+from task_index import TaskNameIndex
+from user_directory import UserDirectory
+from typing import List, Dict, Optional, Tuple, TypeVar
+from data import PRData, AsanaTask, AsanaProject, FanOutResult, BatchAction
+
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def subtask_name(pr: PRData) -> str:
+    return f"{pr.platform}:pr{pr.number}: {pr.title}"
+
+
+class SprintContext:
+    """Sprint-dependent inputs of new subtasks for one root task, each resolved on first use.
+
+    Only subtask creation reads them, so runs that just close, approve or comment never
+    parse project names or fetch project sections.
+    """
+
+    def __init__(self, asana_ws: AsanaWorkspace, task: AsanaTask):
+        self.asana_ws = asana_ws
+        self.task = task
+
+    @cached_property
+    def fields_config(self) -> Optional[Dict[str, str]]:
+        priority_field = next((cf for cf in self.task.custom_fields if cf.name == "Priority"), None)
+        if not priority_field or not priority_field.enum_value:
+            return None
+        return {priority_field.gid: priority_field.enum_value["gid"]}
+
+    @cached_property
+    def project(self) -> Optional[AsanaProject]:
+        latest_sprint_data = utils.get_latest_sprint_project(self.task.projects)
+        return latest_sprint_data[3] if latest_sprint_data else None
+
+    @property
+    def project_gid(self) -> Optional[str]:
+        return self.project.gid if self.project else None
+
+    @cached_property
+    def section_map(self) -> Optional[Dict[str, str]]:
+        if not self.project:
+            return None
+        return {s['name']: s['gid'] for s in self.asana_ws.list_sections_of_project(self.project.gid)}
+
+    def __repr__(self) -> str:
+        resolved = {name: self.__dict__[name] for name in ("fields_config", "project", "section_map")
+                    if name in self.__dict__}
+        return f"SprintContext(task={self.task.gid}, {resolved})"
+
 
 def handle_open(
         asana_ws: AsanaWorkspace,
         task: AsanaTask,
         pr: PRData,
         reviewers_gids: List[str],
-        latest_sprint_gid: Optional[str],
-        fields_config: Optional[Dict[str, str]],
-        pr_url: str,
-        project_sections_mapping: Dict[str, str]):
-    for assignee in reviewers_gids:
-        asana_ws.create_subtask(task, f"{pr.platform}:pr{pr.number}: {pr.title}", assignee, latest_sprint_gid,
-                                fields_config, pr_url,
-                                project_sections_mapping)
+        sprint: SprintContext,
+        pr_url: str):
+    if reviewers_gids:
+        asana_ws.create_subtasks(task, subtask_name(pr), reviewers_gids, sprint.project_gid,
+                                 sprint.fields_config, pr_url, sprint.section_map)
     logger.info(
-        f"[OPEN] PR #{pr.number} '{pr.title}' – Created subtasks for reviewers: {reviewers_gids}, Sprint: {latest_sprint_gid}, Fields: {fields_config}, URL: {pr_url}")
+        f"[OPEN] PR #{pr.number} '{pr.title}' – Created subtasks for reviewers: {reviewers_gids}, {sprint}, URL: {pr_url}")
 
 
-def handle_closed(asana_ws: AsanaWorkspace, existing_subtasks: List[AsanaTask], pr: PRData):
-    closed = []
-    for subtask in existing_subtasks:
+def queue_close(asana_ws: AsanaWorkspace, subtasks: List[AsanaTask], comment: str) -> Dict[str, BatchAction]:
+    completions = {}
+    for subtask in subtasks:
         if not subtask.completed:
-            asana_ws.add_comment_to_task(subtask.gid, "Pull request closed")
-            asana_ws.complete_task(subtask.gid)
-            closed.append(subtask.gid)
+            asana_ws.queue_comment(subtask.gid, comment)
+            completions[subtask.gid] = asana_ws.queue_complete(subtask.gid)
+    return completions
+
+
+def close_subtasks(asana_ws: AsanaWorkspace, subtasks: List[AsanaTask], comment: str) -> List[str]:
+    completions = queue_close(asana_ws, subtasks, comment)
+    asana_ws.flush_writes()
+    return [gid for gid, action in completions.items() if action.ok]
+
+
+def handle_closed(asana_ws: AsanaWorkspace, existing_subtasks: List[AsanaTask], pr: PRData):
+    closed = close_subtasks(asana_ws, existing_subtasks, "Pull request closed")
     logger.info(f"[CLOSED] PR #{pr.number} – Closed subtasks: {closed}")
 
 
@@ -46,47 +102,36 @@ def handle_updated(
         to_open_user_gids: List[str],
         to_close_tasks: List[AsanaTask],
         pr: PRData,
-        latest_sprint_gid: Optional[str],
-        fields_config: Optional[Dict[str, str]],
-        pr_url: str,
-        project_sections_mapping: Dict[str, str]):
-    opened = []
-    closed = []
-
-    for assignee in to_open_user_gids:
-        asana_ws.create_subtask(
+        sprint: SprintContext,
+        pr_url: str):
+    # One flush, so an outbox journals the whole reviewer change or none of it.
+    if to_open_user_gids:
+        asana_ws.queue_subtasks(
             task,
-            f"{pr.platform}:pr{pr.number}: {pr.title}",
-            assignee,
-            latest_sprint_gid,
-            fields_config,
+            subtask_name(pr),
+            to_open_user_gids,
+            sprint.project_gid,
+            sprint.fields_config,
             pr_url,
-            project_sections_mapping
+            sprint.section_map
         )
-        opened.append(assignee)
-
-    for subtask in to_close_tasks:
-        if not subtask.completed:
-            asana_ws.add_comment_to_task(subtask.gid, "Review request dismissed")
-            asana_ws.complete_task(subtask.gid)
-            closed.append(subtask.gid)
+    completions = queue_close(asana_ws, to_close_tasks, "Review request dismissed")
+    asana_ws.flush_writes()
+    opened = list(to_open_user_gids)
+    closed = [gid for gid, action in completions.items() if action.ok]
 
     logger.info(
         f"[UPDATED] PR #{pr.number} – Title: '{pr.title}'\n"
         f"Opened reviewer GIDs: {opened}\n"
         f"Closed subtask GIDs: {closed}\n"
         f"PR URL: {pr_url}\n"
-        f"Fields Config: {fields_config}\n"
-        f"Latest Sprint GID: {latest_sprint_gid}\n"
-        f"Project Sections Mapping: {project_sections_mapping}"
+        f"Sprint: {sprint}"
     )
 
 
 def handle_approved(asana_ws: AsanaWorkspace, task: AsanaTask, pr: PRData):
     result = "skipped"
-    if not task.completed:
-        asana_ws.add_comment_to_task(task.gid, "Pull request approved")
-        asana_ws.complete_task(task.gid)
+    if not task.completed and close_subtasks(asana_ws, [task], "Pull request approved"):
         result = "completed"
     logger.info(f"[APPROVED] PR #{pr.number} – Task {task.gid} {result}")
 
@@ -94,11 +139,25 @@ def handle_approved(asana_ws: AsanaWorkspace, task: AsanaTask, pr: PRData):
 def handle_comment(asana_ws: AsanaWorkspace, task: AsanaTask, pr: PRData):
     result = "skipped"
     if not task.completed:
-        asana_ws.add_comment_to_task(task.gid, "Changes requested")
+        asana_ws.queue_comment(task.gid, "Changes requested")
+        asana_ws.flush_writes()
         result = "commented"
     logger.info(f"[COMMENT] PR #{pr.number} – Task {task.gid if task else 'N/A'} {result}")
 
 
+ACTIONS = ("opened", "closed", "updated", "approved", "comment")
+# Actions whose handlers may create subtasks, and so read the sections of the sprint project.
+CREATING_ACTIONS = ("opened", "updated")
+# A name match must beat the runner-up by this much, or the PR could land on the wrong task.
+MATCH_MARGIN = 0.1
+NO_ROOT_TASK = "No Asana task URL found in PR body, and no indexed task name matches the PR."
+USER_REFRESH_INTERVAL = 15 * 60  # seconds between directory refreshes triggered by unknown reviewers
+
+
+class SyncError(Exception):
+    pass
+
+
 def get_cli_action() -> str:
     if len(sys.argv) < 2:
         logger.error("Usage: asana.py <action>")
@@ -106,94 +165,333 @@ def get_cli_action() -> str:
     return sys.argv[1]
 
 
-def validate_and_load_config():
-    config = utils.load_config()
+def validate_and_load_config(require_pr: bool = True):
+    config = utils.load_config(require_pr)
     if not config.token or not config.workspace_gid:
         logger.error("ASANA_TOKEN and ASANA_WORKSPACE_GID must be set.")
         sys.exit(1)
     return config
 
 
-def resolve_root_task(asana_ws: AsanaWorkspace, config) -> AsanaTask:
-    task_urls = utils.extract_asana_task_urls(config.pr.body)
-    if not task_urls:
-        logger.error("No Asana task URL found in PR body.")
-        sys.exit(1)
-    task_gid = task_urls[0].rstrip('/').split('/')[-1]
-    return asana_ws.get_task_details(task_gid)
+def root_task_gids(pr: PRData) -> List[str]:
+    """Gids of every Asana task linked in the PR body, in order of first mention."""
+    task_urls = utils.extract_asana_task_urls(pr.body or "")
+    return list(dict.fromkeys(url.rstrip('/').split('/')[-1] for url in task_urls))
 
 
-def extract_existing_subtasks(subtasks: List[AsanaTask], pr_number: str, platform: str) -> List[AsanaTask]:
-    def extract_prs(st):
-        matched, pr_num = utils.parse_task_title(st.name, platform)
-        return (matched, pr_num, st)
+def match_root_task(index: TaskNameIndex, pr: PRData, min_score: float) -> Optional[str]:
+    """Gid of the indexed task whose name is most like the PR title and branch name.
 
-    parsed = map(extract_prs, subtasks)
-    return [st for matched, pr_num, st in parsed if matched and pr_num == pr_number]
+    None when the best score is below ``min_score`` or another task scores within
+    ``MATCH_MARGIN`` of it.
+    """
+    ranked = index.search(f"{pr.title or ''} {pr.branch or ''}", limit=2)
+    if not ranked or ranked[0][2] < min_score:
+        return None
+    gid, name, score = ranked[0]
+    if len(ranked) > 1 and score - ranked[1][2] < MATCH_MARGIN:
+        logger.warning(f"PR #{pr.number} matches several Asana tasks ('{name}' {score}, '{ranked[1][1]}' "
+                       f"{ranked[1][2]}); add the task URL to the PR body.")
+        return None
+    logger.info(f"PR #{pr.number} matched Asana task {gid} '{name}' by name (score {score}).")
+    return gid
 
 
-def resolve_field_config(asana_ws: AsanaWorkspace, task: AsanaTask):
-    priority_field = next((cf for cf in task.custom_fields if cf.name == "Priority"), None)
-    fields_config = {
-        priority_field.gid: priority_field.enum_value["gid"]} if priority_field and priority_field.enum_value else None
+def matched_root_task_gids(asana_ws: AsanaWorkspace, pr: PRData) -> List[str]:
+    """Root task found through the workspace's task name index, for PRs that link none."""
+    index = asana_ws.task_index()
+    task_gid = match_root_task(index, pr, asana_ws.task_match_min) if index else None
+    return [task_gid] if task_gid else []
 
-    latest_sprint_data = utils.get_latest_sprint_project(task.projects)
-    if not latest_sprint_data:
-        return fields_config, None, None
 
-    _, _, _, project = latest_sprint_data
-    custom_fields = {cf['name']: cf['gid'] for cf in asana_ws.list_custom_fields_of_project(project.gid)}
-    section_map = {s['name']: s['gid'] for s in asana_ws.list_sections_of_project(project.gid)}
-    return fields_config, project.gid, section_map
+def find_root_task_gids(asana_ws: AsanaWorkspace, pr: PRData) -> List[str]:
+    return root_task_gids(pr) or matched_root_task_gids(asana_ws, pr)
 
 
-def resolve_reviewers(config) -> List[str]:
-    reviewer_mapping = utils.load_reviewer_mapping()
-    return [reviewer_mapping[r] for r in config.pr.reviewers if r in reviewer_mapping]
+def check_root_task_gids(asana_ws: AsanaWorkspace, task_gids: List[str]) -> List[str]:
+    """``task_gids``, once it is clear the run can build on them; raises SyncError otherwise."""
+    if not task_gids:
+        raise SyncError(NO_ROOT_TASK)
+    for task_gid in task_gids:
+        if asana_ws.undelivered_writes(task_gid):
+            # Planning on top of subtasks the outbox has not created yet would undo or duplicate them.
+            raise SyncError(f"The outbox still holds writes for task {task_gid}; run `asana_sync.py flush` first.")
+    return task_gids
 
 
-def main():
-    action = get_cli_action()
-    config = validate_and_load_config()
-    logger.info(f"Action: {action}\nPR #{config.pr.number} Title: {config.pr.title}")
-    logger.info(f"Body: \"{config.pr.body}\"")
-    asana_ws = AsanaWorkspace(config)
-    root_task = resolve_root_task(asana_ws, config)
-    subtasks = [asana_ws.get_task_details(st.gid) for st in root_task.subtasks]
-    existing_subtasks = extract_existing_subtasks(subtasks, config.pr.number, config.pr.platform)
+def check_loaded(task_gids: List[str], loaded: List[Optional[T]]) -> List[T]:
+    """``loaded``, the results read for ``task_gids``; raises SyncError if any task could not be read."""
+    missing = [task_gid for task_gid, result in zip(task_gids, loaded) if result is None]
+    if missing:
+        raise SyncError(f"Could not load Asana task {', '.join(missing)}.")
+    return loaded
 
-    field_config, latest_sprint_gid, section_map = resolve_field_config(asana_ws, root_task)
-    reviewers_gids = resolve_reviewers(config)
-    gid2task = {st.assignee.gid: st for st in existing_subtasks if st.assignee}
 
+def fetch_root_tasks(asana_ws: AsanaWorkspace, task_gids: List[str], fields: Tuple[str, ...]) -> List[AsanaTask]:
+    """The root tasks themselves, without their subtasks."""
+    return check_loaded(task_gids,
+                        asana_ws.fan_out(lambda task_gid: asana_ws.get_root_task(task_gid, fields), task_gids).results)
+
+
+def hydrate_subtasks(asana_ws: AsanaWorkspace, task_gids: List[str],
+                     fields: Tuple[str, ...]) -> List[List[AsanaTask]]:
+    """The subtasks of every root task, in the order of ``task_gids``."""
+    return check_loaded(task_gids,
+                        asana_ws.fan_out(lambda task_gid: asana_ws.get_subtasks(task_gid, fields), task_gids).results)
+
+
+def extract_existing_subtasks(index: SubtaskIndex, pr_number: str) -> List[AsanaTask]:
+    return index.for_pr(pr_number)
+
+
+def resolve_field_config(asana_ws: AsanaWorkspace, task: AsanaTask) -> SprintContext:
+    return SprintContext(asana_ws, task)
+
+
+def lookup_reviewers(directory: UserDirectory, logins: List[str]) -> Dict[str, str]:
+    """Asana gids of the ``logins`` found in the workspace user directory."""
+    login_map, email_domain = utils.load_login_mapping(), utils.get_email_domain()
+    found = {login: directory.resolve(login, login_map, email_domain) for login in logins}
+    return {login: gid for login, gid in found.items() if gid}
+
+
+def directory_outdated(directory: UserDirectory, resolved: Dict[str, str], logins: List[str]) -> bool:
+    """Whether a lookup of ``logins`` missed some and the directory may be refreshed for them."""
+    return len(resolved) < len(logins) and time.time() - directory.refreshed_at > USER_REFRESH_INTERVAL
+
+
+def map_reviewers(pr: PRData, reviewer_mapping: Dict[str, str], resolved: Optional[Dict[str, str]]) -> List[str]:
+    """Gids of the PR reviewers, in order, from REVIEWERS_GIDS and then the ``resolved`` directory
+    lookups; without a directory (``resolved`` None) unmapped reviewers are skipped silently."""
+    gids = []
+    for login in pr.reviewers:
+        gid = reviewer_mapping.get(login) or (resolved or {}).get(login)
+        if gid:
+            gids.append(gid)
+        elif resolved is not None:
+            logger.warning(f"No Asana user found for reviewer '{login}'.")
+    return gids
+
+
+def resolve_reviewers(pr: PRData, asana_ws: Optional[AsanaWorkspace] = None) -> List[str]:
+    """Asana gids of the PR reviewers, in order; reviewers that cannot be mapped are skipped.
+
+    REVIEWERS_GIDS wins; other logins are looked up in the workspace user directory when
+    it is enabled. A miss refreshes the directory, at most once per USER_REFRESH_INTERVAL.
+    """
+    reviewer_mapping = utils.load_reviewer_mapping()
+    unmapped = [r for r in pr.reviewers if r not in reviewer_mapping]
+    directory = asana_ws.user_directory() if asana_ws and unmapped else None
+    resolved = lookup_reviewers(directory, unmapped) if directory else None
+    if directory and directory_outdated(directory, resolved, unmapped):
+        resolved = lookup_reviewers(asana_ws.user_directory(refresh=True), unmapped)
+    return map_reviewers(pr, reviewer_mapping, resolved)
+
+
+def plan_reviewer_changes(existing_subtasks: List[AsanaTask],
+                          reviewers_gids: List[str]) -> Tuple[List[str], List[AsanaTask]]:
+    """Reviewer gids that still need a subtask, and subtasks whose reviewer is no longer requested."""
+    gid2task = {st.assignee.gid: st for st in existing_subtasks if st.assignee}
+    requested = set(reviewers_gids)
+    to_open = [gid for gid in reviewers_gids if gid not in gid2task]
+    to_close = [st for st in existing_subtasks if
+                st.assignee and st.assignee.gid not in requested]
+    return to_open, to_close
+
+
+def sync_root_task(asana_ws: AsanaWorkspace, action: str, root_task: AsanaTask, pr: PRData, pr_url: str,
+                   reviewers_gids: List[str], sprint: SprintContext):
+    """Apply ``action`` to the reviewer subtasks of one root task."""
+    index = asana_ws.subtask_index(root_task)
+    existing_subtasks = extract_existing_subtasks(index, pr.number)
     if action == "opened":
-        gids_to_open = [gid for gid in reviewers_gids if gid not in gid2task]
-        handle_open(asana_ws, root_task, config.pr, gids_to_open,
-                    latest_sprint_gid, field_config, utils.get_pr_url(), section_map)
+        gids_to_open, _ = plan_reviewer_changes(existing_subtasks, reviewers_gids)
+        handle_open(asana_ws, root_task, pr, gids_to_open, sprint, pr_url)
     elif action == "closed":
-        handle_closed(asana_ws, existing_subtasks, config.pr)
+        handle_closed(asana_ws, existing_subtasks, pr)
     elif action == "updated":
-        to_close = [st for st in existing_subtasks if
-                    st.assignee and st.assignee.gid not in reviewers_gids]
-        to_open = [gid for gid in reviewers_gids if gid not in gid2task]
-        handle_updated(asana_ws, root_task, to_open, to_close, config.pr,
-                       latest_sprint_gid, field_config, utils.get_pr_url(),
-                       section_map)
+        to_open, to_close = plan_reviewer_changes(existing_subtasks, reviewers_gids)
+        handle_updated(asana_ws, root_task, to_open, to_close, pr, sprint, pr_url)
     elif action == "approved":
-        logger.info(f"Reviewers: {config.pr.reviewers}")
+        logger.info(f"Reviewers: {pr.reviewers}")
         first_gid = reviewers_gids[0] if reviewers_gids else None
-        if gid2task.get(first_gid):
-            handle_approved(asana_ws, gid2task.get(first_gid), config.pr)
+        if first_gid and index.get(pr.number, first_gid):
+            handle_approved(asana_ws, index.get(pr.number, first_gid), pr)
         else:
             logger.info("Ignored: no task for reviewer")
     elif action == "comment":
         first_gid = reviewers_gids[0] if reviewers_gids else None
-        if gid2task.get(first_gid):
-            handle_comment(asana_ws, gid2task.get(first_gid), config.pr)
-        logger.info("Ignored: no task for reviewer")
-    else:
-        logger.error(f"Unknown action: {action}")
+        if first_gid and index.get(pr.number, first_gid):
+            handle_comment(asana_ws, index.get(pr.number, first_gid), pr)
+        else:
+            logger.info("Ignored: no task for reviewer")
+
+
+def creates_subtasks(asana_ws: AsanaWorkspace, action: str, root_task: AsanaTask, pr: PRData,
+                     reviewers_gids: List[str]) -> bool:
+    if action not in CREATING_ACTIONS:
+        return False
+    existing_subtasks = extract_existing_subtasks(asana_ws.subtask_index(root_task), pr.number)
+    return bool(plan_reviewer_changes(existing_subtasks, reviewers_gids)[0])
+
+
+def prefetch_sprints(asana_ws: AsanaWorkspace, action: str, pr: PRData, root_tasks: List[AsanaTask],
+                     subtasks: List[List[AsanaTask]], reviewers_gids: List[str]) -> List[SprintContext]:
+    """Sprint context of every root task, once its subtasks are attached. The sections of a sprint
+    project are fetched right away, once per project, only for root tasks that will get new subtasks."""
+    for root_task, root_subtasks in zip(root_tasks, subtasks):
+        root_task.subtasks = root_subtasks
+    sprints = [resolve_field_config(asana_ws, root_task) for root_task in root_tasks]
+    creating = {sprint.project_gid: sprint for root_task, sprint in zip(root_tasks, sprints)
+                if sprint.project_gid and creates_subtasks(asana_ws, action, root_task, pr, reviewers_gids)}
+    asana_ws.fan_out(lambda sprint: sprint.section_map, list(creating.values()))
+    return sprints
+
+
+def sync_pr(asana_ws: AsanaWorkspace, action: str, pr: PRData, pr_url: str):
+    """Bring the reviewer subtasks under every root task linked from the PR in line with ``action``.
+
+    The run is a StageGraph. Root tasks, their subtasks and the reviewer gids are fetched
+    at the same time; the sprint sections follow, for the root tasks that will get new
+    subtasks. Every root tree is then updated concurrently. The stage timeline is kept in
+    ``asana_ws.metrics.timeline``.
+    """
+    if action not in ACTIONS:
+        raise SyncError(f"Unknown action: {action}")
+    profile = FIELD_PROFILES.get(action, FIELD_PROFILES["full"])
+    handle = f"handle_{action}"
+
+    def handle_roots(root_tasks: List[AsanaTask], reviewers_gids: List[str],
+                     sprints: List[SprintContext]) -> FanOutResult:
+        return asana_ws.fan_out(
+            lambda i: sync_root_task(asana_ws, action, root_tasks[i], pr, pr_url, reviewers_gids, sprints[i]),
+            range(len(root_tasks))
+        )
+
+    graph = StageGraph(asana_ws.metrics, asana_ws.max_workers)
+    graph.add("resolve_root_task", lambda: check_root_task_gids(asana_ws, find_root_task_gids(asana_ws, pr)))
+    graph.add("resolve_reviewers", lambda: resolve_reviewers(pr, asana_ws))
+    graph.add("fetch_root_tasks", lambda gids: fetch_root_tasks(asana_ws, gids, profile.task_fields),
+              "resolve_root_task")
+    graph.add("hydrate_subtasks", lambda gids: hydrate_subtasks(asana_ws, gids, profile.subtask_fields),
+              "resolve_root_task")
+    graph.add("resolve_field_config",
+              lambda root_tasks, subtasks, reviewers_gids: prefetch_sprints(asana_ws, action, pr, root_tasks, subtasks,
+                                                                            reviewers_gids),
+              "fetch_root_tasks", "hydrate_subtasks", "resolve_reviewers")
+    graph.add(handle, handle_roots, "fetch_root_tasks", "resolve_reviewers", "resolve_field_config")
+    # Runs even when some root tasks failed, so the subtasks that were created still get their section.
+    graph.add("flush_section_moves", lambda _: asana_ws.flush_section_moves(), handle)
+
+    with asana_ws.metrics.span("sync_pr", action=action, pr=pr.number) as span:
+        try:
+            results = graph.run()
+        finally:
+            timeline = asana_ws.metrics.timeline = graph.timeline()
+            if timeline["critical_path"]:
+                logger.info(f"Critical path: {' > '.join(timeline['critical_path'])}")
+        root_tasks = results["fetch_root_tasks"]
+        span.update(root_tasks=len(root_tasks), subtasks=sum(len(t.subtasks) for t in root_tasks),
+                    reviewers=len(results["resolve_reviewers"]))
+
+    outcome = results[handle]
+    if outcome.errors:
+        failed = ", ".join(root_tasks[i].gid for i in outcome.errors)
+        raise SyncError(f"Sync failed for Asana task {failed}.")
+
+
+def report_metrics(asana_ws: AsanaWorkspace, metrics_path: Optional[str] = None, trace_path: Optional[str] = None,
+                   **context) -> Dict:
+    """Log the per-endpoint call summary of the run as JSON; also written to ``metrics_path`` when given."""
+    summary = asana_ws.metrics.summary(**context)
+    summary["transport"] = asana_ws.transport.stats.as_dict()
+    if asana_ws.request_cache:
+        summary["request_cache"] = asana_ws.request_cache.stats()
+    if asana_ws.outbox:
+        summary["outbox"] = asana_ws.outbox.stats()
+    if metrics_path:
+        with open(metrics_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    logger.info(f"Asana metrics: {json.dumps(summary)}")
+    if trace_path:
+        asana_ws.metrics.write_trace(trace_path)
+    return summary
+
+
+def main():
+    utils.setup_logging()
+    action = get_cli_action()
+    if action == "reconcile":
+        import reconcile
+        if len(sys.argv) < 3:
+            logger.error("Usage: asana_sync.py reconcile <snapshot.jsonl>")
+            sys.exit(1)
+        config = validate_and_load_config(require_pr=False)
+        asana_ws = AsanaWorkspace(config)
+        try:
+            reconcile.reconcile(asana_ws, reconcile.load_snapshot(sys.argv[2], config.platform))
+        finally:
+            report_metrics(asana_ws, config.metrics_path, config.trace_path, action=action)
+        return
+    if action == "flush":
+        config = validate_and_load_config(require_pr=False)
+        if not config.outbox_path:
+            logger.error("ASANA_OUTBOX_PATH must be set to flush the outbox.")
+            sys.exit(1)
+        asana_ws = AsanaWorkspace(config)
+        try:
+            stats = asana_ws.drain_outbox()
+        finally:
+            report_metrics(asana_ws, config.metrics_path, config.trace_path, action=action)
+        if stats["pending"] or stats["sending"]:
+            logger.error(f"{stats['pending'] + stats['sending']} outbox write(s) are still undelivered.")
+            sys.exit(1)
+        return
+    if action == "index":
+        config = validate_and_load_config(require_pr=False)
+        if not config.task_index_projects:
+            logger.error("ASANA_TASK_INDEX_PROJECTS must be set to build the task name index.")
+            sys.exit(1)
+        asana_ws = AsanaWorkspace(config)
+        try:
+            index = asana_ws.task_index(refresh=True, export_path=sys.argv[2] if len(sys.argv) > 2 else None)
+            logger.info(f"Task name index holds {len(index)} task(s).")
+        finally:
+            report_metrics(asana_ws, config.metrics_path, config.trace_path, action=action)
+        return
+    if action == "serve":
+        import webhook_server
+        config = validate_and_load_config(require_pr=False)
+        if config.async_client:
+            from async_workspace import AsyncAsanaWorkspace
+            asana_ws = AsyncAsanaWorkspace(config)
+        else:
+            asana_ws = AsanaWorkspace(config)
+        webhook_server.serve(asana_ws, *sys.argv[2:3], coalesce_window=config.coalesce_window)
+        return
+
+    config = validate_and_load_config()
+    logger.info(f"Action: {action}\nPR #{config.pr.number} Title: {config.pr.title}")
+    logger.info(f"Body: \"{config.pr.body}\"")
+
+    pr_lock = nullcontext()
+    if config.coalesce_window > 0:
+        debouncer = FileDebouncer(config.coalesce_dir, config.coalesce_window)
+        key = (config.pr.platform, config.pr.number)
+        if action in COALESCED_ACTIONS and not debouncer.wait_turn(key):
+            logger.info(f"Superseded by a newer {action} event for PR #{config.pr.number}; nothing to do.")
+            return
+        pr_lock = debouncer.lock(key)
+
+    asana_ws = AsanaWorkspace(config)
+    try:
+        with pr_lock:
+            sync_pr(asana_ws, action, config.pr, utils.get_pr_url())
+    except SyncError as e:
+        logger.error(str(e))
         sys.exit(1)
+    finally:
+        report_metrics(asana_ws, config.metrics_path, config.trace_path, action=action, pr=config.pr.number)
 
 
 if __name__ == "__main__":
@@ -1,173 +1,645 @@
-import sys
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from time import sleep
 
-from data import Config, AsanaUser, AsanaTask, AsanaProject, AsanaCustomField
-import asana
-from asana.rest import ApiException
+from metadata_cache import MetadataCache
+from outbox import Outbox
+from request_cache import RequestCache
+from subtask_index import SubtaskIndex
+from task_index import TaskNameIndex, checkpoint
+from task_mirror import TaskMirror
+from user_directory import UserDirectory
+from transport import Transport, LazyApi, RETRYABLE_STATUSES, in_doubt, safe_to_resend, sdk
+from data import (Config, AsanaUser, AsanaTask, AsanaProject, AsanaCustomField, FanOutResult, FieldProfile,
+                  BatchAction)
 import logging
-from typing import List, Optional, Dict
+import utils
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Sequence, Tuple, TypeVar
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+PLANNED_SECTION = "Запланировано"
+BATCH_SIZE = 10  # Asana rejects /batch requests with more actions
+
+TASK_DETAIL_FIELDS = (
+    "name", "gid", "assignee.gid", "projects.name", "projects.gid",
+    "custom_fields.name", "custom_fields.enum_value.name", "custom_fields.gid", "completed"
+)
+SUBTASK_STATE_FIELDS = ("name", "assignee.gid", "completed")
+# Kept with every mirrored subtask, so an event can be checked against the copy before it is re-read.
+MIRROR_VERSION_FIELD = "modified_at"
+SEARCH_FIELDS = (
+    "name", "gid", "assignee.gid", "projects.name", "projects.gid",
+    "custom_fields.name", "custom_fields.enum_value.name", "custom_fields.gid", "created_at"
+)
+
+# What each action reads from the root task and its subtasks. An empty
+# task_fields tuple skips the root GET entirely: the gid is already known.
+FIELD_PROFILES: Dict[str, FieldProfile] = {
+    "full": FieldProfile(task_fields=TASK_DETAIL_FIELDS, subtask_fields=SUBTASK_STATE_FIELDS),
+    "opened": FieldProfile(
+        task_fields=("name", "projects.name", "projects.gid",
+                     "custom_fields.name", "custom_fields.enum_value.name", "custom_fields.gid"),
+        subtask_fields=SUBTASK_STATE_FIELDS
+    ),
+    "closed": FieldProfile(task_fields=(), subtask_fields=SUBTASK_STATE_FIELDS),
+    "approved": FieldProfile(task_fields=(), subtask_fields=SUBTASK_STATE_FIELDS),
+    "comment": FieldProfile(task_fields=(), subtask_fields=SUBTASK_STATE_FIELDS),
+}
+FIELD_PROFILES["updated"] = FIELD_PROFILES["opened"]
+
+
+def project_task_params(project_gid: str, modified_since: Optional[str] = None, page_size: int = 100) -> Dict:
+    """GET /tasks query for the task name index: open tasks for a full export, every change otherwise."""
+    params = {"project": project_gid, "opt_fields": "name,completed,parent", "limit": page_size}
+    if modified_since:
+        params["modified_since"] = modified_since
+    else:
+        params["completed_since"] = "now"
+    return params
+
+
+def search_task_params(name: str, assignee_gid: Optional[str] = None, limit: Optional[int] = None,
+                       page_size: int = 100) -> Dict:
+    """Task search query for the first page of tasks matching ``name``, newest first."""
+    params = {
+        "text": name,
+        "opt_fields": ",".join(SEARCH_FIELDS),
+        "sort_by": "created_at",
+        "sort_ascending": False,
+        "limit": min(page_size, limit or page_size, 100),
+    }
+    if assignee_gid:
+        params["assignee.any"] = assignee_gid
+    return params
+
+
+def next_search_page(params: Dict, page: List[Dict]) -> bool:
+    """Point ``params`` at the search page after ``page``; False when ``page`` was the last one.
+
+    The search endpoint has no offsets, so the next page asks for tasks created before
+    the oldest one seen so far.
+    """
+    if len(page) < params["limit"] or not page[-1].get("created_at"):
+        return False
+    params["created_at.before"] = page[-1]["created_at"]
+    return True
+
+
+def sections_from_raw(sections: Iterable[Dict]) -> List[Dict[str, str]]:
+    return [{"gid": section["gid"], "name": section["name"]} for section in sections]
+
+
+def custom_fields_from_raw(project: Dict) -> List[Dict[str, str]]:
+    return [{"gid": setting["custom_field"]["gid"], "name": setting["custom_field"]["name"]}
+            for setting in project.get("custom_field_settings", []) if "custom_field" in setting]
+
+
+def enum_options_from_raw(field: Dict) -> List[Dict[str, str]]:
+    return [{"gid": opt["gid"], "name": opt["name"]} for opt in field.get("enum_options", [])]
+
+
+def take(items: Iterable[T], limit: Optional[int] = None, stop: Optional[Callable[[T], bool]] = None) -> Iterator[T]:
+    """Yield at most ``limit`` items, ending right after the first one ``stop`` accepts."""
+    if limit is not None and limit <= 0:
+        return
+    for count, item in enumerate(items, 1):
+        yield item
+        if (stop and stop(item)) or count == limit:
+            return
+
+
+def split_failed(actions: Iterable[BatchAction]) -> Tuple[List[BatchAction], List[BatchAction]]:
+    """Failed batch actions that may be resent as they are, and creations that must be looked up first."""
+    resend, check = [], []
+    for action in actions:
+        if action.ok:
+            continue
+        if in_doubt(action.method, action.status_code):
+            check.append(action)
+        elif safe_to_resend(action.method, action.status_code):
+            resend.append(action)
+    return resend, check
+
+
+def applied_lookup(action: BatchAction) -> Optional[Tuple[str, Dict[str, object]]]:
+    """Collection (path, query) that shows whether a creation already reached Asana; None when resending is
+    harmless (updates and section moves)."""
+    parts = action.relative_path.strip("/").split("/")
+    if action.method != "post" or len(parts) != 3 or parts[0] != "tasks":
+        return None
+    if parts[2] == "subtasks":
+        return action.relative_path, {"opt_fields": ",".join(SUBTASK_STATE_FIELDS + ("memberships.section.gid",)),
+                                      "limit": 100}
+    if parts[2] == "stories":
+        return action.relative_path, {"opt_fields": "text,resource_subtype,created_at", "limit": 100}
+    return None
+
+
+def created_since(raw: Dict, moment: float) -> bool:
+    """Whether an Asana record was created at or after ``moment`` (epoch seconds)."""
+    created_at = raw.get("created_at")
+    return bool(created_at) and datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp() >= moment
+
+
+def find_applied(action: BatchAction, items: Iterable[Dict]) -> Optional[Dict]:
+    """The subtask or comment in ``items`` that ``action`` would have created.
+
+    The handlers post the same comment texts to a subtask again and again, so only
+    comments created since the write was queued can be the result of this one.
+    """
+    if action.relative_path.rstrip("/").endswith("/subtasks"):
+        return next((raw for raw in items if raw.get("name") == action.data.get("name") and
+                     (raw.get("assignee") or {}).get("gid") == action.data.get("assignee")), None)
+    return next((raw for raw in items if raw.get("resource_subtype") == "comment_added" and
+                 raw.get("text") == action.data.get("text") and created_since(raw, action.queued_at)), None)
+
+
+def task_from_raw(raw: Dict) -> AsanaTask:
+    return AsanaTask(
+        gid=raw["gid"],
+        name=raw.get("name"),
+        assignee=AsanaUser(gid=raw["assignee"]["gid"]) if raw.get("assignee") else None,
+        projects=[AsanaProject(gid=proj["gid"], name=proj["name"]) for proj in raw.get("projects", [])],
+        custom_fields=[
+            AsanaCustomField(name=cf["name"], gid=cf["gid"], enum_value=cf.get("enum_value"))
+            for cf in raw.get("custom_fields", [])
+        ],
+        completed=raw.get("completed")
+    )
+
 
 class AsanaWorkspace:
+    is_async = False
+
+    users_api = LazyApi("UsersApi")
+    tasks_api = LazyApi("TasksApi")
+    workspaces_api = LazyApi("WorkspacesApi")
+    sections_api = LazyApi("SectionsApi")
+    custom_fields_api = LazyApi("CustomFieldsApi")
+    projects_api = LazyApi("ProjectsApi")
+    stories_api = LazyApi("StoriesApi")
+    batch_api = LazyApi("BatchAPIApi")
+    events_api = LazyApi("EventsApi")
+
     def __init__(self, config: Config):
-        self.platform = config.pr.platform
+        self.platform = config.platform
         self.workspace_gid = config.workspace_gid
+        self.max_workers = max(1, config.max_workers)
+        self._lock = threading.Lock()
+        self._pending_section_moves: List[Tuple[str, str]] = []
+        # Writes are queued per thread, so handlers running side by side flush only their own.
+        self._local = threading.local()
+        self.cache = MetadataCache(config.cache_path, config.cache_ttl)
+        self.mirror = TaskMirror(config.cache_path, config.cache_ttl) if config.mirror else None
+        # Subtask gid -> modified_at of the last write of this process that _mirror_write applied.
+        self._mirror_applied: Dict[str, Optional[str]] = {}
+        self._user_directory_enabled = config.user_directory
+        self._user_directory: Optional[UserDirectory] = None
+        self.task_index_projects = config.task_index_projects
+        self.task_match_min = config.task_match_min
+        self._task_index: Optional[TaskNameIndex] = None
+        self.outbox = Outbox(config.outbox_path) if config.outbox_path else None
+        self.outbox_defer = config.outbox_defer
+
+        self.transport = Transport(rate=config.rate_limit, burst=config.rate_burst,
+                                   max_retries=config.max_retries, pool_size=config.pool_size,
+                                   trace=bool(config.trace_path))
+        self.metrics = self.transport.metrics
+        # Run-scoped: the daemon clears it after every event.
+        self.request_cache = RequestCache()
+        # The SDK client and API objects are built on first use, see LazyApi.
+        self._token = config.token
+        self._host = config.host
+        self._api_lock = threading.RLock()
+        self._api_client = None
+
+    @property
+    def api_client(self):
+        if self._api_client is None:
+            with self._api_lock:
+                if self._api_client is None:
+                    self._api_client = self.transport.api_client(self._token, self._host, self.request_cache)
+        return self._api_client
+
+    def fan_out(self, fn: Callable[[T], object], items: Iterable[T]) -> FanOutResult:
+        """Run ``fn`` over ``items`` on at most ``max_workers`` threads.
 
-        configuration = asana.Configuration()
-        configuration.access_token = config.token
-        api_client = asana.ApiClient(configuration)
-        self.users_api = asana.UsersApi(api_client)
-        self.tasks_api = asana.TasksApi(api_client)
-        self.workspaces_api = asana.WorkspacesApi(api_client)
-        self.sections_api = asana.SectionsApi(api_client)
-        self.custom_fields_api = asana.CustomFieldsApi(api_client)
-        self.projects_api = asana.ProjectsApi(api_client)
-        self.stories_api = asana.StoriesApi(api_client)
+        Results keep the input order; an item whose call raised gets ``None``
+        in ``results`` and its exception in ``errors`` under the same index.
+        """
+        items = list(items)
+        outcome = FanOutResult(results=[None] * len(items))
+        if not items:
+            return outcome
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            futures = {executor.submit(fn, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    outcome.results[i] = future.result()
+                except Exception as e:
+                    logger.error(f"Fan-out call failed for item #{i}: {e}")
+                    outcome.errors[i] = e
+        return outcome
+
+    def _cache_key(self, *parts: str) -> str:
+        return ":".join((self.workspace_gid,) + parts)
+
+    def _sections_key(self, project_gid: str) -> str:
+        return self._cache_key("project", project_gid, "sections")
+
+    def _custom_fields_key(self, project_gid: str) -> str:
+        return self._cache_key("project", project_gid, "custom_fields")
+
+    def _enum_options_key(self, custom_field_gid: str) -> str:
+        return self._cache_key("custom_field", custom_field_gid, "enum_options")
+
+    def invalidate_metadata(self, project_gid: Optional[str] = None) -> int:
+        """Forget cached metadata for one project, or for the whole workspace."""
+        if project_gid:
+            return self.cache.invalidate(self._cache_key("project", project_gid) + ":")
+        return self.cache.invalidate(self._cache_key())
+
+    def get_workspace(self) -> Dict:
+        key = self._cache_key("workspace")
+        workspace = self.cache.get(key)
+        if workspace is None:
+            workspace = self.workspaces_api.get_workspace(self.workspace_gid, {})
+            self.cache.set(key, workspace)
+        return workspace
 
     def list_users(self) -> List[AsanaUser]:
+        return list(self.iter_users())
+
+    def iter_users(self, limit: Optional[int] = None, page_size: int = 100,
+                   stop: Optional[Callable[[AsanaUser], bool]] = None) -> Iterator[AsanaUser]:
+        """Stream workspace users page by page; the next page is only requested once this one is consumed.
+
+        Iteration ends after ``limit`` users or right after the first user ``stop`` returns True for.
+        """
         try:
-            workspace = self.workspaces_api.get_workspace(self.workspace_gid, {})
-            users = self.users_api.get_users_for_workspace(workspace["gid"], {"opt_fields": "gid,name,email"})
-            return [AsanaUser(gid=u["gid"], name=u.get("name"), email=u.get("email")) for u in users]
-        except ApiException as e:
+            yield from take(self._stream_users(limit, page_size), limit, stop)
+        except sdk.ApiException as e:
             logger.error(f"Asana API error when listing users: {e.body}")
-        return []
+
+    def _stream_users(self, limit: Optional[int] = None, page_size: int = 100) -> Iterator[AsanaUser]:
+        workspace = self.get_workspace()
+        users = self.users_api.get_users_for_workspace(
+            workspace["gid"], {"opt_fields": "gid,name,email", "limit": page_size}, item_limit=limit
+        )
+        return (AsanaUser(gid=u["gid"], name=u.get("name"), email=u.get("email")) for u in users)
+
+    def user_directory(self, refresh: bool = False) -> Optional[UserDirectory]:
+        """The persisted workspace user directory, refreshed when stale; None unless enabled in the config."""
+        if not self._user_directory_enabled:
+            return None
+        with self._api_lock:
+            if self._user_directory is None:
+                self._user_directory = UserDirectory(self.cache.path, self.cache.default_ttl)
+            directory = self._user_directory
+            if refresh or directory.stale:
+                try:
+                    directory.sync(self._stream_users())
+                except sdk.ApiException as e:
+                    logger.error(f"Asana API error when refreshing the user directory: {e.body}")
+        return directory
+
+    def task_index(self, refresh: bool = False, export_path: Optional[str] = None) -> Optional[TaskNameIndex]:
+        """The persisted name index of the configured projects; None unless projects are configured.
+
+        A project is exported in full when it was never indexed or its index is older than the
+        cache TTL, and otherwise only asked for the tasks modified since its last refresh, at
+        most once per ``refresh_interval`` unless ``refresh`` is set. ``export_path`` seeds the
+        index from an Asana JSON export first.
+        """
+        if not self.task_index_projects:
+            return None
+        with self._api_lock:
+            if self._task_index is None:
+                self._task_index = TaskNameIndex(self.cache.path, self.cache.default_ttl)
+            index = self._task_index
+            if export_path:
+                index.load_export(export_path, self.task_index_projects)
+            for project_gid in self.task_index_projects:
+                if not (refresh or index.needs_refresh(project_gid)):
+                    continue
+                started, since = checkpoint(), index.modified_since(project_gid)
+                try:
+                    if since is None or index.needs_build(project_gid):
+                        index.sync_project(project_gid, self._stream_project_tasks(project_gid), started)
+                    else:
+                        index.apply_changes(project_gid, self._stream_project_tasks(project_gid, since), started)
+                except sdk.ApiException as e:
+                    logger.error(f"Asana API error when refreshing the task name index of project {project_gid}: "
+                                 f"{e.body}")
+        return index
+
+    def _stream_project_tasks(self, project_gid: str, modified_since: Optional[str] = None) -> Iterator[Dict]:
+        return self.tasks_api.get_tasks(project_task_params(project_gid, modified_since))
 
     def complete_task(self, task_gid: str) -> None:
         try:
             self.tasks_api.update_task({"data": {"completed": True}}, task_gid, {})
             logger.info(f"Task {task_gid} marked as completed.")
-        except ApiException as e:
+        except sdk.ApiException as e:
             logger.error(f"Asana API error when completing task {task_gid}: {e.body}")
 
     def delete_task(self, task_gid: str) -> None:
         try:
             self.tasks_api.delete_task(task_gid)
             logger.info(f"Task {task_gid} deleted.")
-        except ApiException as e:
+        except sdk.ApiException as e:
             logger.error(f"Asana API error when deleting task {task_gid}: {e.body}")
 
     def create_subtask(self, task: AsanaTask, name: str, assignee_gid: Optional[str] = None,
                        project_gid: Optional[str] = None, custom_fields: Optional[Dict[str, str]] = None,
                        description: Optional[str] = None, project_sections_mapping: Optional[Dict[str, str]] = None
                        ) -> Optional[AsanaTask]:
-        parent_task_gid = task.gid
-        existing_subtasks = task.subtasks
-        try:
-            subtask = next(
-                (sub for sub in existing_subtasks if
-                 sub.name == name and sub.assignee and sub.assignee.gid == assignee_gid),
-                None
-            )
-            if subtask:
-                return self.get_task_details(subtask.gid)
-            else:
-                subtask_data = {"data": {"name": name}}
-
-                if assignee_gid:
-                    subtask_data["data"]["assignee"] = assignee_gid
-                if project_gid:
-                    subtask_data["data"]["projects"] = project_gid
-                if custom_fields:
-                    subtask_data["data"]["custom_fields"] = custom_fields
-                if description:
-                    subtask_data["data"]["notes"] = description
-
-                response = self.tasks_api.create_subtask_for_task(subtask_data, parent_task_gid, {})
-                task = AsanaTask(
-                    gid=response["gid"],
-                    name=response["name"],
-                    assignee=AsanaUser(gid=response["assignee"]["gid"]) if response.get("assignee") else None,
-                    projects=[AsanaProject(gid=proj["gid"], name=proj["name"]) for proj in
-                              response.get("projects", [])],
-                    custom_fields=[
-                        AsanaCustomField(name=cf["name"], gid=cf["gid"], enum_value=cf.get("enum_value"))
-                        for cf in response.get("custom_fields", [])
-                    ]
-                )
-                if project_sections_mapping and "Запланировано" in project_sections_mapping:
-                    sleep(3)
-                    self.move_task_to_section(task.gid, project_sections_mapping["Запланировано"])
-                logger.info(f"Created subtask '{name}' under task {parent_task_gid}.")
-                return task
-        except ApiException as e:
-            logger.error(f"Asana API error when creating subtask: {e.body}")
-        return None
+        subtask = self._find_subtask(task, name, assignee_gid)
+        if subtask:
+            return self.get_task_details(subtask.gid)
+        # Sent through the batch writer, so a creation that fails ambiguously is looked up, not resent.
+        section_gid = (project_sections_mapping or {}).get(PLANNED_SECTION)
+        action = self.queue_subtask(task.gid, self._subtask_data(name, assignee_gid, project_gid, custom_fields,
+                                                                 description, section_gid))
+        self.flush_writes()
+        if not action.ok:
+            return None
+        logger.info(f"Created subtask '{name}' under task {task.gid}.")
+        return self._subtask_created(action.result, section_gid)
+
+    def create_subtasks(self, task: AsanaTask, name: str, assignee_gids: List[str],
+                        project_gid: Optional[str] = None, custom_fields: Optional[Dict[str, str]] = None,
+                        description: Optional[str] = None, project_sections_mapping: Optional[Dict[str, str]] = None
+                        ) -> List[Optional[AsanaTask]]:
+        """Batched ``create_subtask`` for several assignees; results follow ``assignee_gids`` order."""
+        created: Dict[str, AsanaTask] = {}
+        self.queue_subtasks(task, name, assignee_gids, project_gid, custom_fields, description,
+                            project_sections_mapping, on_created=created.__setitem__)
+        self.flush_writes()
+        return [created.get(gid) or self._find_subtask(task, name, gid) for gid in assignee_gids]
+
+    def queue_subtasks(self, task: AsanaTask, name: str, assignee_gids: List[str],
+                       project_gid: Optional[str] = None, custom_fields: Optional[Dict[str, str]] = None,
+                       description: Optional[str] = None, project_sections_mapping: Optional[Dict[str, str]] = None,
+                       on_created: Optional[Callable[[str, AsanaTask], None]] = None) -> Dict[str, BatchAction]:
+        """Queue creation of the ``name`` subtask for every assignee that does not have one yet.
 
-    def search_task_by_name(self, name: str, assignee_gid: Optional[str] = None) -> List[AsanaTask]:
-        search_params = {
-            "text": name,
-            "opt_fields": ",".join([
-                "name", "gid", "assignee.gid", "projects.name", "projects.gid",
-                "custom_fields.name", "custom_fields.enum_value.name", "custom_fields.gid"
-            ])
-        }
+        Nothing is sent until ``flush_writes``; ``on_created(assignee_gid, subtask)`` is then
+        called for each subtask Asana accepted. Returns the queued actions by assignee gid.
+        """
+        section_gid = (project_sections_mapping or {}).get(PLANNED_SECTION)
+
+        def created(assignee_gid: str) -> Callable[[BatchAction], None]:
+            def on_done(action: BatchAction) -> None:
+                if not action.ok:
+                    return
+                subtask = self._subtask_created(action.result, section_gid)
+                logger.info(f"Created subtask '{name}' for {assignee_gid} under task {task.gid}.")
+                if on_created:
+                    on_created(assignee_gid, subtask)
+            return on_done
+
+        queued: Dict[str, BatchAction] = {}
+        for assignee_gid in assignee_gids:
+            if assignee_gid in queued or self._find_subtask(task, name, assignee_gid):
+                continue
+            data = self._subtask_data(name, assignee_gid, project_gid, custom_fields, description, section_gid)
+            queued[assignee_gid] = self.queue_subtask(task.gid, data, on_done=created(assignee_gid))
+        return queued
+
+    def subtask_index(self, task: AsanaTask) -> SubtaskIndex:
+        """The (platform, PR number, assignee) index of ``task.subtasks``, rebuilt when the list is replaced."""
+        index = task.subtask_index
+        if index is None or index.source is not task.subtasks or index.platform != self.platform:
+            index = task.subtask_index = SubtaskIndex(self.platform, task.subtasks)
+        return index
+
+    def _find_subtask(self, task: AsanaTask, name: str, assignee_gid: Optional[str]) -> Optional[AsanaTask]:
+        if utils.parse_task_title(name, self.platform)[0]:
+            return self.subtask_index(task).find(name, assignee_gid)
+        return next(
+            (sub for sub in task.subtasks if
+             sub.name == name and sub.assignee and sub.assignee.gid == assignee_gid),
+            None
+        )
+
+    @staticmethod
+    def _subtask_data(name: str, assignee_gid: Optional[str], project_gid: Optional[str],
+                      custom_fields: Optional[Dict[str, str]], description: Optional[str],
+                      section_gid: Optional[str]) -> Dict:
+        data = {"name": name}
         if assignee_gid:
-            search_params["assignee.any"] = assignee_gid
+            data["assignee"] = assignee_gid
+        if project_gid and section_gid:
+            data["memberships"] = [{"project": project_gid, "section": section_gid}]
+        elif project_gid:
+            data["projects"] = project_gid
+        if custom_fields:
+            data["custom_fields"] = custom_fields
+        if description:
+            data["notes"] = description
+        return data
+
+    def _subtask_created(self, response: Dict, section_gid: Optional[str]) -> AsanaTask:
+        task = task_from_raw(response)
+        placed = any((m.get("section") or {}).get("gid") == section_gid
+                     for m in response.get("memberships") or [])
+        if section_gid and not placed:
+            self.queue_section_move(task.gid, section_gid)
+        return task
+
+    def search_task_by_name(self, name: str, assignee_gid: Optional[str] = None,
+                            limit: Optional[int] = None) -> List[AsanaTask]:
+        return list(self.iter_search_tasks(name, assignee_gid, limit=limit))
+
+    def iter_search_tasks(self, name: str, assignee_gid: Optional[str] = None, limit: Optional[int] = None,
+                          page_size: int = 100, stop: Optional[Callable[[AsanaTask], bool]] = None
+                          ) -> Iterator[AsanaTask]:
+        """Stream tasks matching ``name``, newest first, one search page at a time.
+
+        The search endpoint has no offsets, so each following page asks for tasks created
+        before the oldest one seen so far. Iteration ends after ``limit`` tasks, right after
+        the first task ``stop`` returns True for, or when a page comes back short.
+        """
+        search_params = search_task_params(name, assignee_gid, limit, page_size)
+
+        def pages() -> Iterator[AsanaTask]:
+            while True:
+                page = list(self.tasks_api.search_tasks_for_workspace(self.workspace_gid, dict(search_params)))
+                for raw in page:
+                    yield task_from_raw(raw)
+                if not next_search_page(search_params, page):
+                    return
 
         try:
-            results = list(self.tasks_api.search_tasks_for_workspace(self.workspace_gid, search_params))
-            return [
-                AsanaTask(
-                    gid=task["gid"],
-                    name=task["name"],
-                    assignee=AsanaUser(gid=task["assignee"]["gid"]) if task.get("assignee") else None,
-                    projects=[AsanaProject(gid=proj["gid"], name=proj["name"]) for proj in task.get("projects", [])],
-                    custom_fields=[
-                        AsanaCustomField(name=cf["name"], gid=cf["gid"], enum_value=cf.get("enum_value"))
-                        for cf in task.get("custom_fields", [])
-                    ]
-                ) for task in results
-            ]
-        except ApiException as e:
+            yield from take(pages(), limit, stop)
+        except sdk.ApiException as e:
             logger.error(f"Asana API error when searching for task by name '{name}': {e.body}")
-        return []
 
     def get_task_details(self, task_gid: str) -> Optional[AsanaTask]:
-        fields = [
-            "name", "gid", "assignee.gid", "projects.name", "projects.gid",
-            "custom_fields.name", "custom_fields.enum_value.name", "custom_fields.gid", "completed"
-        ]
         try:
-            raw = self.tasks_api.get_task(task_gid, {"opt_fields": ",".join(fields)})
+            raw = self.tasks_api.get_task(task_gid, {"opt_fields": ",".join(TASK_DETAIL_FIELDS)})
             subtasks_raw = self.tasks_api.get_subtasks_for_task(task_gid, {"opt_fields": "name,gid,assignee.gid"})
 
-            subtasks = [
-                AsanaTask(
-                    gid=st["gid"],
-                    name=st["name"],
-                    assignee=AsanaUser(gid=st["assignee"]["gid"]) if st.get("assignee") else None
-                ) for st in subtasks_raw
-            ]
-
-            return AsanaTask(
-                gid=raw["gid"],
-                name=raw["name"],
-                assignee=AsanaUser(gid=raw["assignee"]["gid"]) if raw.get("assignee") else None,
-                projects=[AsanaProject(gid=proj["gid"], name=proj["name"]) for proj in raw.get("projects", [])],
-                custom_fields=[
-                    AsanaCustomField(name=cf["name"], gid=cf["gid"], enum_value=cf.get("enum_value"))
-                    for cf in raw.get("custom_fields", [])
-                ],
-                subtasks=subtasks,
-                completed=raw.get("completed", False)
-            )
-        except ApiException as e:
+            task = task_from_raw(raw)
+            task.subtasks = [task_from_raw(st) for st in subtasks_raw]
+            task.completed = raw.get("completed", False)
+            return task
+        except sdk.ApiException as e:
             logger.error(f"Asana API error when retrieving task details for {task_gid}: {e.body}")
         return None
 
+    def get_task_tree(self, task_gid: str, profile: FieldProfile = FIELD_PROFILES["full"]) -> Optional[AsanaTask]:
+        """Fetch a task and the state of all its direct subtasks.
+
+        Subtasks come from a single paginated ``get_subtasks_for_task`` call
+        carrying ``profile.subtask_fields``, so they need no per-subtask GET.
+        """
+        task = self.get_root_task(task_gid, profile.task_fields)
+        subtasks = self.get_subtasks(task_gid, profile.subtask_fields) if task else None
+        if subtasks is None:
+            return None
+        task.subtasks = subtasks
+        logger.info(f"Fetched task tree for {task_gid}: {len(task.subtasks)} subtask(s).")
+        return task
+
+    def get_root_task(self, task_gid: str, fields: Tuple[str, ...]) -> Optional[AsanaTask]:
+        """The task itself, without subtasks; no request at all when ``fields`` is empty."""
+        if not fields:
+            return task_from_raw({"gid": task_gid})
+        try:
+            return task_from_raw(self.tasks_api.get_task(task_gid, {"opt_fields": ",".join(fields)}))
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when retrieving task {task_gid}: {e.body}")
+        return None
+
+    def get_subtasks(self, task_gid: str, fields: Tuple[str, ...]) -> Optional[List[AsanaTask]]:
+        """Direct subtasks of ``task_gid``, from the mirror when enabled; None when Asana refused the read."""
+        try:
+            if self.mirror:
+                subtasks_raw = self._mirrored_subtasks(task_gid, fields)
+            else:
+                subtasks_raw = self._fetch_subtasks(task_gid, fields)
+            return [task_from_raw(st) for st in subtasks_raw]
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when retrieving subtasks of {task_gid}: {e.body}")
+        return None
+
+    def _fetch_subtasks(self, task_gid: str, fields: Tuple[str, ...]) -> List[Dict]:
+        return list(self.tasks_api.get_subtasks_for_task(task_gid, {"opt_fields": ",".join(fields), "limit": 100}))
+
+    def _mirrored_subtasks(self, task_gid: str, fields: Tuple[str, ...]) -> List[Dict]:
+        """Subtasks of ``task_gid`` from the local mirror, brought up to date through the events API.
+
+        Only subtasks named in the events since the stored sync token are re-read. A full fetch
+        happens when there is no usable copy, the token expired (412), or re-reading the changed
+        subtasks would take more requests than paging through all of them.
+        """
+        if MIRROR_VERSION_FIELD not in fields:
+            fields = fields + (MIRROR_VERSION_FIELD,)
+        stored = self.mirror.load(task_gid, fields)
+        try:
+            events, sync = self._read_events(task_gid, stored[0] if stored else None)
+        except sdk.ApiException as e:
+            logger.warning(f"Asana events unavailable for task {task_gid}, mirror not used: {e.body}")
+            return self._fetch_subtasks(task_gid, fields)
+        if stored and events is not None:
+            subtasks = self._apply_events(task_gid, fields, sync, stored[1], events)
+            if subtasks is not None:
+                return subtasks
+        elif stored:
+            logger.info(f"Events sync token for task {task_gid} expired, fetching all subtasks.")
+
+        subtasks = self._fetch_subtasks(task_gid, fields)
+        self.mirror.replace(task_gid, fields, sync, subtasks)
+        return subtasks
+
+    def _read_events(self, resource_gid: str, sync: Optional[str]) -> Tuple[Optional[List[Dict]], str]:
+        """Events on ``resource_gid`` since ``sync`` and the token to store next.
+
+        Events are None when ``sync`` was missing or has expired; Asana then answers 412
+        with a fresh token, from which the next run continues.
+        """
+        events: List[Dict] = []
+        while True:
+            try:
+                response = self.events_api.get_events(resource_gid, {"sync": sync} if sync else {}, full_payload=True)
+            except sdk.ApiException as e:
+                if e.status != 412:
+                    raise
+                return None, json.loads(e.body)["sync"]
+            events.extend(response.get("data") or [])
+            sync = response["sync"]
+            if not response.get("has_more"):
+                return events, sync
+
+    def _apply_events(self, task_gid: str, fields: Tuple[str, ...], sync: str, subtasks: List[Dict],
+                      events: List[Dict]) -> Optional[List[Dict]]:
+        """Re-read the subtasks touched by ``events`` and store the result; None when a full fetch is cheaper.
+
+        An event no newer than the ``modified_at`` of the mirrored subtask is already in the
+        copy, and so is one about a write of this process that ``_mirror_write`` applied.
+        """
+        touched: Dict[str, Tuple[str, Optional[str]]] = {}
+        for event in events:
+            resource = event.get("resource") or {}
+            if resource.get("resource_type") == "task" and resource.get("gid") != task_gid:
+                touched[resource["gid"]] = (event.get("action"), event.get("created_at"))
+        versions = {raw["gid"]: raw.get(MIRROR_VERSION_FIELD) for raw in subtasks}
+        with self._lock:
+            own = {gid: self._mirror_applied.pop(gid) for gid in list(touched) if gid in self._mirror_applied}
+        for gid, (action, at) in list(touched.items()):
+            known = own.get(gid) or versions.get(gid)
+            if action != "deleted" and ((at and known and at <= known) or (gid in own and not (at and known))):
+                del touched[gid]
+        full_fetch_pages = len(subtasks) // 100 + 1
+        if len(touched) > full_fetch_pages:
+            return None
+
+        def reread(gid: str) -> Optional[Dict]:
+            try:
+                raw = self.tasks_api.get_task(gid, {"opt_fields": ",".join(fields + ("parent.gid",))})
+            except sdk.ApiException as e:
+                if e.status == 404:
+                    return None
+                raise
+            if (raw.get("parent") or {}).get("gid") != task_gid:
+                return None
+            return {key: value for key, value in raw.items() if key != "parent"}
+
+        recheck = [gid for gid, (action, _) in touched.items() if action != "deleted"]
+        fetched = self.fan_out(reread, recheck)
+        if not fetched.ok:
+            return None
+        upserts = [raw for raw in fetched.results if raw]
+        kept = {raw["gid"] for raw in upserts}
+        removed = {gid for gid in touched if gid not in kept}
+        self.mirror.apply(task_gid, sync, upserts, removed)
+        logger.info(f"Mirror of task {task_gid}: {len(events)} event(s), {len(upserts)} subtask(s) re-read, "
+                    f"{len(removed)} removed.")
+        by_gid = {raw["gid"]: raw for raw in upserts}
+        merged = [by_gid.pop(raw["gid"], raw) for raw in subtasks if raw["gid"] not in removed]
+        return merged + list(by_gid.values())
+
     def get_custom_field_enum_options(self, custom_field_gid: str) -> List[Dict[str, str]]:
+        key = self._enum_options_key(custom_field_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         try:
             field = self.custom_fields_api.get_custom_field(custom_field_gid, {"opt_fields": "enum_options.name"})
-            return [{"gid": opt["gid"], "name": opt["name"]} for opt in field.get("enum_options", [])]
-        except ApiException as e:
+            options = enum_options_from_raw(field)
+            self.cache.set(key, options)
+            return options
+        except sdk.ApiException as e:
             logger.error(f"Asana API error fetching enum options for custom field {custom_field_gid}: {e.body}")
         return []
 
@@ -177,36 +649,245 @@ class AsanaWorkspace:
             self.sections_api.add_task_for_section(section_gid, opts)
             logger.info(f"Moved task {task_gid} to section {section_gid}.")
             return True
-        except ApiException as e:
+        except sdk.ApiException as e:
             logger.error(f"Asana API error moving task {task_gid} to section {section_gid}: {e.body}")
         return False
 
+    def queue_section_move(self, task_gid: str, section_gid: str) -> None:
+        with self._lock:
+            self._pending_section_moves.append((task_gid, section_gid))
+
+    def flush_section_moves(self, max_attempts: int = 6, base_delay: float = 0.25) -> List[Tuple[str, str]]:
+        """Apply queued section moves, retrying rejected ones with jittered exponential backoff.
+
+        A task created a moment ago may not be accepted by the sections endpoint yet, so
+        readiness is polled instead of waiting a fixed time. Returns the moves that never succeeded.
+        """
+        with self._lock:
+            pending, self._pending_section_moves = self._pending_section_moves, []
+
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            if attempt:
+                sleep(base_delay * 2 ** (attempt - 1) * (1 + random.random()))
+            actions = [self.queue_section_add(task_gid, section_gid) for task_gid, section_gid in pending]
+            self.flush_writes()
+            # Journaled moves are retried by the outbox instead.
+            pending = [move for move, action in zip(pending, actions) if not action.ok and action.journal_id is None]
+
+        for task_gid, section_gid in pending:
+            logger.error(f"Gave up moving task {task_gid} to section {section_gid} after {max_attempts} attempts.")
+        return pending
+
     def list_sections_of_project(self, project_gid: str) -> List[Dict[str, str]]:
+        key = self._sections_key(project_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         try:
-            sections = self.sections_api.get_sections_for_project(project_gid, {})
-            return [{"gid": section["gid"], "name": section["name"]} for section in sections]
-        except ApiException as e:
+            sections = sections_from_raw(self.sections_api.get_sections_for_project(project_gid, {}))
+            self.cache.set(key, sections)
+            return sections
+        except sdk.ApiException as e:
             logger.error(f"Asana API error listing sections for project {project_gid}: {e.body}")
         return []
 
     def list_custom_fields_of_project(self, project_gid: str) -> List[Dict[str, str]]:
+        key = self._custom_fields_key(project_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         try:
             project = self.projects_api.get_project(project_gid, {"opt_fields": "custom_field_settings.custom_field"})
-            settings = project.get("custom_field_settings", [])
-            return [
-                {"gid": setting["custom_field"]["gid"], "name": setting["custom_field"]["name"]}
-                for setting in settings if "custom_field" in setting
-            ]
-        except ApiException as e:
+            custom_fields = custom_fields_from_raw(project)
+            self.cache.set(key, custom_fields)
+            return custom_fields
+        except sdk.ApiException as e:
             logger.error(f"Asana API error fetching custom fields for project {project_gid}: {e.body}")
         return []
 
     def add_comment_to_task(self, task_gid: str, comment: str) -> bool:
-        try:
-            body = {"data": {"text": comment}}
-            self.stories_api.create_story_for_task(body, task_gid, {})
+        action = self.queue_comment(task_gid, comment)
+        self.flush_writes()
+        if action.ok:
             logger.info(f"Added comment to task {task_gid}: {comment}")
-            return True
-        except ApiException as e:
-            logger.error(f"Asana API error adding comment to task {task_gid}: {e.body}")
-        return False
+        return action.ok
+
+    def queue_comment(self, task_gid: str, comment: str) -> BatchAction:
+        return self._queue_write("post", f"/tasks/{task_gid}/stories", {"text": comment})
+
+    def queue_complete(self, task_gid: str) -> BatchAction:
+        return self._queue_write("put", f"/tasks/{task_gid}", {"completed": True})
+
+    def queue_section_add(self, task_gid: str, section_gid: str) -> BatchAction:
+        return self._queue_write("post", f"/sections/{section_gid}/addTask", {"task": task_gid})
+
+    def queue_subtask(self, parent_task_gid: str, data: Dict,
+                      on_done: Optional[Callable[[BatchAction], None]] = None) -> BatchAction:
+        return self._queue_write("post", f"/tasks/{parent_task_gid}/subtasks", data, on_done)
+
+    def _queue_write(self, method: str, relative_path: str, data: Dict,
+                     on_done: Optional[Callable[[BatchAction], None]] = None) -> BatchAction:
+        action = BatchAction(method=method, relative_path=relative_path, data=data, on_done=on_done)
+        self._thread_writes().append(action)
+        return action
+
+    def _thread_writes(self) -> List[BatchAction]:
+        writes = getattr(self._local, "writes", None)
+        if writes is None:
+            writes = self._local.writes = []
+        return writes
+
+    def flush_writes(self) -> List[BatchAction]:
+        """Send the writes queued by this thread as Asana /batch requests of up to BATCH_SIZE actions each.
+
+        Every queued BatchAction gets the status code and body of its own result, so callers
+        holding the action returned by a ``queue_*`` method can check it after the flush;
+        ``on_done`` callbacks run once each action has its final result.
+
+        With an outbox the writes are journaled in one transaction first and delivered by
+        ``drain_outbox``. In deferred mode they are left for ``asana_sync.py flush``: the
+        actions come back without a status and their callbacks do not run.
+        """
+        queued = self._thread_writes()
+        actions = queued[:]
+        queued.clear()
+        if not actions:
+            return actions
+
+        if self.outbox:
+            self.outbox.record(actions)
+            if self.outbox_defer:
+                return actions
+            self.drain_outbox(actions)
+        else:
+            self._deliver(actions)
+
+        for action in actions:
+            if action.status_code is None and action.journal_id is not None:
+                continue  # settled by another flusher
+            if self.mirror and action.ok:
+                self._mirror_write(action)
+            if not action.ok:
+                logger.warning(f"Asana batch action {action.method.upper()} {action.relative_path} failed "
+                               f"({action.status_code}): {action.body}")
+            if action.on_done:
+                action.on_done(action)
+        return actions
+
+    def _deliver(self, actions: List[BatchAction]) -> List[BatchAction]:
+        """Send ``actions`` as /batch requests, resending those that failed transiently.
+
+        A creation that failed in a way that may come after Asana applied it (a 5xx other
+        than 503, or no answer) is looked up first and only resent when it is not there.
+        Returns the creations that could not be looked up: they are left in doubt.
+        """
+        pending, unsure = actions, []
+        for attempt in range(self.transport.max_retries + 1):
+            chunks = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+            self.fan_out(self._send_batch, chunks)
+            # Individual actions inside a successful batch can still be rate limited or fail transiently.
+            pending, check = split_failed(pending)
+            for action in check:
+                applied = self._already_applied(action)
+                if applied is False:
+                    pending.append(action)
+                elif applied is None:
+                    unsure.append(action)
+            if not pending or attempt == self.transport.max_retries:
+                break
+            sleep(self.transport.batch_backoff(pending, attempt))
+        return unsure
+
+    def drain_outbox(self, live: Sequence[BatchAction] = ()) -> Dict[str, int]:
+        """Deliver every unsettled outbox entry, oldest first; returns the journal counts by state.
+
+        ``live`` actions journaled by this process receive the results of their entries. An
+        entry left ``sending`` by a flusher that died is resent only when that is harmless:
+        subtask creations and comments are looked up in Asana first.
+        """
+        by_entry: Dict[int, List[BatchAction]] = {}
+        for action in live:
+            by_entry.setdefault(action.journal_id, []).append(action)
+
+        with self.outbox.exclusive():
+            claimed, in_doubt = self.outbox.claim()
+            checked = [(action, self._already_applied(action) if action.journal_id in in_doubt else False)
+                       for action in claimed]
+            unsure = {action.journal_id for action in self._deliver([a for a, applied in checked if applied is False])}
+            # Entries that could not be checked stay in doubt for the next flusher.
+            self.outbox.settle([action for action, applied in checked
+                                if applied is not None and action.journal_id not in unsure], RETRYABLE_STATUSES)
+
+        for action in claimed:
+            for target in by_entry.get(action.journal_id, ()):
+                target.status_code, target.body, target.headers = action.status_code, action.body, action.headers
+        self.outbox.purge()
+        stats = self.outbox.stats()
+        if claimed:
+            logger.info(f"Drained {len(claimed)} outbox entr{'y' if len(claimed) == 1 else 'ies'}: {stats}")
+        return stats
+
+    def _already_applied(self, action: BatchAction) -> Optional[bool]:
+        """Whether an in-doubt write already reached Asana; None when that cannot be told right now."""
+        lookup = applied_lookup(action)
+        if lookup is None:
+            return False
+        path, query = lookup
+        task_gid = path.strip("/").split("/")[1]
+        try:
+            if path.rstrip("/").endswith("/subtasks"):
+                items = self.tasks_api.get_subtasks_for_task(task_gid, dict(query))
+            else:
+                items = self.stories_api.get_stories_for_task(task_gid, dict(query))
+            match = find_applied(action, items)
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error checking write {action.relative_path}: {e.body}")
+            return None
+        if match is None:
+            return False
+        logger.info(f"Write {action.method.upper()} {action.relative_path} was already applied.")
+        action.status_code, action.body = 201, {"data": match}
+        return True
+
+    def undelivered_writes(self, task_gid: str) -> int:
+        """Outbox entries still targeting ``task_gid`` or its subtask list after a delivery attempt."""
+        prefix = f"/tasks/{task_gid}/"
+        if not self.outbox or not self.outbox.unsettled(prefix):
+            return 0
+        self.drain_outbox()
+        return self.outbox.unsettled(prefix)
+
+    def _mirror_write(self, action: BatchAction) -> None:
+        parts = action.relative_path.strip("/").split("/")
+        result = action.result or {}
+        version = result.get(MIRROR_VERSION_FIELD)
+        if action.method == "put" and len(parts) == 2 and parts[0] == "tasks":
+            changes = dict(action.data, **({MIRROR_VERSION_FIELD: version} if version else {}))
+            applied = self.mirror.update_subtask(parts[1], changes) and parts[1]
+        elif action.method == "post" and len(parts) == 3 and parts[0] == "tasks" and parts[2] == "subtasks":
+            applied = self.mirror.add_subtask(parts[1], result) and result.get("gid")
+        else:
+            return
+        if applied:
+            with self._lock:
+                self._mirror_applied[applied] = version
+
+    def _send_batch(self, actions: List[BatchAction]) -> None:
+        body = {"data": {"actions": [
+            {"method": a.method, "relative_path": a.relative_path, "data": a.data} for a in actions
+        ]}}
+        try:
+            response = self.batch_api.create_batch_request(body, {}, full_payload=True, _return_http_data_only=True)
+            for action, result in zip(actions, response.get("data", [])):
+                action.status_code = result.get("status_code")
+                action.body = result.get("body")
+                action.headers = result.get("headers")
+            logger.info(f"Sent batch of {len(actions)} write(s).")
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error sending batch of {len(actions)} write(s): {e.body}")
+            for action in actions:
+                action.status_code = e.status
+                action.body = {"errors": [{"message": e.reason}]}
+                action.headers = dict(e.headers or {})
@@ -0,0 +1,183 @@
+"""Async versions of the asana_sync handlers, for AsyncAsanaWorkspace.
+
+Planning (which subtasks to open or close) is shared with asana_sync; only the
+Asana calls are awaited, so many PR events can be synced on one event loop.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import utils
+from asana_sync import (ACTIONS, NO_ROOT_TASK, SprintContext, SyncError, check_loaded, creates_subtasks,
+                        directory_outdated, extract_existing_subtasks, lookup_reviewers, map_reviewers,
+                        match_root_task, plan_reviewer_changes, queue_close, resolve_field_config, root_task_gids,
+                        subtask_name)
+from asana_workspace import FIELD_PROFILES
+from async_workspace import AsyncAsanaWorkspace
+from data import AsanaTask, FieldProfile, PRData
+
+logger = logging.getLogger(__name__)
+
+
+async def sprint_sections(asana_ws: AsyncAsanaWorkspace, sprint: SprintContext) -> Optional[Dict[str, str]]:
+    if not sprint.project:
+        return None
+    return {s['name']: s['gid'] for s in await asana_ws.list_sections_of_project(sprint.project.gid)}
+
+
+async def handle_open(
+        asana_ws: AsyncAsanaWorkspace,
+        task: AsanaTask,
+        pr: PRData,
+        reviewers_gids: List[str],
+        sprint: SprintContext,
+        pr_url: str):
+    if reviewers_gids:
+        await asana_ws.create_subtasks(task, subtask_name(pr), reviewers_gids, sprint.project_gid,
+                                       sprint.fields_config, pr_url, await sprint_sections(asana_ws, sprint))
+    logger.info(
+        f"[OPEN] PR #{pr.number} '{pr.title}' – Created subtasks for reviewers: {reviewers_gids}, {sprint}, URL: {pr_url}")
+
+
+async def close_subtasks(asana_ws: AsyncAsanaWorkspace, subtasks: List[AsanaTask], comment: str) -> List[str]:
+    completions = queue_close(asana_ws, subtasks, comment)
+    await asana_ws.flush_writes()
+    return [gid for gid, action in completions.items() if action.ok]
+
+
+async def handle_closed(asana_ws: AsyncAsanaWorkspace, existing_subtasks: List[AsanaTask], pr: PRData):
+    closed = await close_subtasks(asana_ws, existing_subtasks, "Pull request closed")
+    logger.info(f"[CLOSED] PR #{pr.number} – Closed subtasks: {closed}")
+
+
+async def handle_updated(
+        asana_ws: AsyncAsanaWorkspace,
+        task: AsanaTask,
+        to_open_user_gids: List[str],
+        to_close_tasks: List[AsanaTask],
+        pr: PRData,
+        sprint: SprintContext,
+        pr_url: str):
+    if to_open_user_gids:
+        asana_ws.queue_subtasks(task, subtask_name(pr), to_open_user_gids, sprint.project_gid,
+                                sprint.fields_config, pr_url, await sprint_sections(asana_ws, sprint))
+    completions = queue_close(asana_ws, to_close_tasks, "Review request dismissed")
+    await asana_ws.flush_writes()
+    closed = [gid for gid, action in completions.items() if action.ok]
+
+    logger.info(
+        f"[UPDATED] PR #{pr.number} – Title: '{pr.title}'\n"
+        f"Opened reviewer GIDs: {list(to_open_user_gids)}\n"
+        f"Closed subtask GIDs: {closed}\n"
+        f"PR URL: {pr_url}\n"
+        f"Sprint: {sprint}"
+    )
+
+
+async def handle_approved(asana_ws: AsyncAsanaWorkspace, task: AsanaTask, pr: PRData):
+    result = "skipped"
+    if not task.completed and await close_subtasks(asana_ws, [task], "Pull request approved"):
+        result = "completed"
+    logger.info(f"[APPROVED] PR #{pr.number} – Task {task.gid} {result}")
+
+
+async def handle_comment(asana_ws: AsyncAsanaWorkspace, task: AsanaTask, pr: PRData):
+    result = "skipped"
+    if not task.completed:
+        asana_ws.queue_comment(task.gid, "Changes requested")
+        await asana_ws.flush_writes()
+        result = "commented"
+    logger.info(f"[COMMENT] PR #{pr.number} – Task {task.gid if task else 'N/A'} {result}")
+
+
+async def find_root_task_gids(asana_ws: AsyncAsanaWorkspace, pr: PRData) -> List[str]:
+    """Async ``asana_sync.find_root_task_gids``."""
+    task_gids = root_task_gids(pr)
+    if task_gids:
+        return task_gids
+    index = await asana_ws.task_index()
+    task_gid = match_root_task(index, pr, asana_ws.task_match_min) if index else None
+    return [task_gid] if task_gid else []
+
+
+async def resolve_root_tasks(asana_ws: AsyncAsanaWorkspace, task_gids: List[str],
+                             profile: FieldProfile = FIELD_PROFILES["full"]) -> List[AsanaTask]:
+    if not task_gids:
+        raise SyncError(NO_ROOT_TASK)
+    trees = await asyncio.gather(*(asana_ws.get_task_tree(task_gid, profile) for task_gid in task_gids))
+    return check_loaded(task_gids, list(trees))
+
+
+async def resolve_reviewers(pr: PRData, asana_ws: Optional[AsyncAsanaWorkspace] = None) -> List[str]:
+    """Async ``asana_sync.resolve_reviewers``."""
+    reviewer_mapping = utils.load_reviewer_mapping()
+    unmapped = [r for r in pr.reviewers if r not in reviewer_mapping]
+    directory = await asana_ws.user_directory() if asana_ws and unmapped else None
+    resolved = lookup_reviewers(directory, unmapped) if directory else None
+    if directory and directory_outdated(directory, resolved, unmapped):
+        resolved = lookup_reviewers(await asana_ws.user_directory(refresh=True), unmapped)
+    return map_reviewers(pr, reviewer_mapping, resolved)
+
+
+async def sync_root_task(asana_ws: AsyncAsanaWorkspace, action: str, root_task: AsanaTask, pr: PRData, pr_url: str,
+                         reviewers_gids: List[str], sprint: SprintContext):
+    """Async ``asana_sync.sync_root_task``; also flushes the section moves its new subtasks queued."""
+    index = asana_ws.subtask_index(root_task)
+    existing_subtasks = extract_existing_subtasks(index, pr.number)
+    if action == "opened":
+        gids_to_open, _ = plan_reviewer_changes(existing_subtasks, reviewers_gids)
+        await handle_open(asana_ws, root_task, pr, gids_to_open, sprint, pr_url)
+    elif action == "closed":
+        await handle_closed(asana_ws, existing_subtasks, pr)
+    elif action == "updated":
+        to_open, to_close = plan_reviewer_changes(existing_subtasks, reviewers_gids)
+        await handle_updated(asana_ws, root_task, to_open, to_close, pr, sprint, pr_url)
+    elif action in ("approved", "comment"):
+        if action == "approved":
+            logger.info(f"Reviewers: {pr.reviewers}")
+        first_gid = reviewers_gids[0] if reviewers_gids else None
+        subtask = index.get(pr.number, first_gid) if first_gid else None
+        if not subtask:
+            logger.info("Ignored: no task for reviewer")
+        elif action == "approved":
+            await handle_approved(asana_ws, subtask, pr)
+        else:
+            await handle_comment(asana_ws, subtask, pr)
+    # Section moves are queued per asyncio task, so each root task flushes its own.
+    await asana_ws.flush_section_moves()
+
+
+async def sync_pr(asana_ws: AsyncAsanaWorkspace, action: str, pr: PRData, pr_url: str):
+    """Async ``asana_sync.sync_pr``: root trees and reviewer gids are resolved concurrently, then every root
+    task is updated concurrently."""
+    if action not in ACTIONS:
+        raise SyncError(f"Unknown action: {action}")
+
+    with asana_ws.metrics.span("sync_pr", action=action, pr=pr.number) as span:
+        async def root_trees() -> List[AsanaTask]:
+            task_gids = await find_root_task_gids(asana_ws, pr)
+            return await resolve_root_tasks(asana_ws, task_gids, FIELD_PROFILES.get(action, FIELD_PROFILES["full"]))
+
+        root_tasks, reviewers_gids = await asyncio.gather(root_trees(), resolve_reviewers(pr, asana_ws))
+        sprints = [resolve_field_config(asana_ws, root_task) for root_task in root_tasks]
+        span.update(root_tasks=len(root_tasks), subtasks=sum(len(t.subtasks) for t in root_tasks),
+                    reviewers=len(reviewers_gids))
+
+        # Root tasks sharing a sprint project then read its sections from the metadata cache.
+        creating = {sprint.project_gid: sprint for root_task, sprint in zip(root_tasks, sprints)
+                    if sprint.project_gid and creates_subtasks(asana_ws, action, root_task, pr, reviewers_gids)}
+        await asyncio.gather(*(sprint_sections(asana_ws, sprint) for sprint in creating.values()))
+
+        with asana_ws.metrics.span(f"handle_{action}"):
+            results = await asyncio.gather(
+                *(sync_root_task(asana_ws, action, root_task, pr, pr_url, reviewers_gids, sprint)
+                  for root_task, sprint in zip(root_tasks, sprints)),
+                return_exceptions=True
+            )
+
+    failed = [root_task.gid for root_task, result in zip(root_tasks, results) if isinstance(result, Exception)]
+    for root_task, result in zip(root_tasks, results):
+        if isinstance(result, Exception):
+            logger.error(f"Sync of Asana task {root_task.gid} failed: {result!r}")
+    if failed:
+        raise SyncError(f"Sync failed for Asana task {', '.join(failed)}.")
@@ -0,0 +1,561 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import aiohttp
+
+from asana_workspace import (AsanaWorkspace, BATCH_SIZE, FIELD_PROFILES, PLANNED_SECTION, TASK_DETAIL_FIELDS,
+                             applied_lookup, custom_fields_from_raw, enum_options_from_raw, find_applied,
+                             next_search_page, project_task_params, search_task_params, sections_from_raw,
+                             split_failed, task_from_raw)
+from data import AsanaTask, AsanaUser, BatchAction, CallRecord, Config, FieldProfile
+from metadata_cache import MetadataCache
+from metrics import endpoint_name
+from task_index import TaskNameIndex, checkpoint
+from transport import IDEMPOTENT_METHODS, RetryPolicy, sdk
+from user_directory import UserDirectory
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_HOST = "https://app.asana.com/api/1.0"
+
+# Writes and section moves are queued per asyncio task, so concurrent events never flush each other's writes.
+# A value holds its owning task: tasks started by gather() inherit the context but get their own queues.
+_queued_writes: ContextVar[Tuple[Optional[asyncio.Task], List[BatchAction]]] = ContextVar("queued_writes",
+                                                                                          default=(None, []))
+_pending_section_moves: ContextVar[Tuple[Optional[asyncio.Task], List[Tuple[str, str]]]] = ContextVar(
+    "pending_section_moves", default=(None, []))
+
+
+def _task_local(var: ContextVar) -> List:
+    task = asyncio.current_task()
+    owner, items = var.get()
+    if owner is None or owner is not task:
+        items = []
+        var.set((task, items))
+    return items
+
+
+def _query(params: Optional[Dict]) -> Dict[str, str]:
+    return {key: str(value).lower() if isinstance(value, bool) else str(value)
+            for key, value in (params or {}).items() if value is not None}
+
+
+async def take(items: AsyncIterator[T], limit: Optional[int] = None,
+               stop: Optional[Callable[[T], bool]] = None) -> AsyncIterator[T]:
+    """Async ``asana_workspace.take``: at most ``limit`` items, ending right after the first one ``stop`` accepts."""
+    if limit is not None and limit <= 0:
+        return
+    count = 0
+    async for item in items:
+        count += 1
+        yield item
+        if (stop and stop(item)) or count == limit:
+            return
+
+
+class AsyncTransport(RetryPolicy):
+    """Asana REST calls on one aiohttp session, under the rate limit and retry policy of Transport.
+
+    The session keeps up to ``pool_size`` keep-alive connections, so a warm daemon pays
+    the TCP and TLS handshakes once. Errors are raised as the SDK's ApiException, with
+    the raw ``body`` and ``headers``, so callers handle them exactly like SDK calls.
+    """
+
+    def __init__(self, token: str, host: Optional[str] = None, rate: float = 25.0, burst: float = 25.0,
+                 max_retries: int = 5, pool_size: int = 16, base_delay: float = 0.5, trace: bool = False):
+        super().__init__(rate, burst, max_retries, pool_size, base_delay, trace)
+        self.base_url = (host or DEFAULT_HOST).rstrip("/")
+        self._headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Built on first use, inside the running event loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self._headers,
+                                                  timeout=aiohttp.ClientTimeout(total=60))
+        return self._session
+
+    async def _acquire(self) -> float:
+        waited = 0.0
+        while True:
+            wait = self.bucket.try_acquire()
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def request(self, method: str, path: str, params: Optional[Dict] = None,
+                      data: Optional[Dict] = None) -> Dict:
+        """Send one API call and return its decoded JSON body, retrying retryable statuses and connection errors."""
+        url = f"{self.base_url}{path}"
+        body = json.dumps({"data": data}).encode() if data is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else None
+        endpoint = endpoint_name(method, url)
+        attempt = 0
+        start = time.perf_counter()
+
+        def record(outcome: str, response_bytes: int) -> None:
+            self.metrics.record(CallRecord(endpoint=endpoint, latency=time.perf_counter() - start,
+                                           request_bytes=len(body or b""), response_bytes=response_bytes,
+                                           retries=attempt, outcome=outcome))
+
+        while True:
+            self.stats.record(requests=1, limiter_wait=await self._acquire())
+            unsent = False
+            try:
+                async with self.session.request(method, url, params=_query(params), data=body,
+                                                headers=headers) as response:
+                    status, reason = response.status, response.reason
+                    response_headers = dict(response.headers)
+                    payload = await response.read()
+                outcome = str(status)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Only a connection that was never made is sure not to have carried a write.
+                unsent = method.upper() in IDEMPOTENT_METHODS or isinstance(e, aiohttp.ClientConnectorError)
+                status, reason, response_headers, payload = None, str(e) or type(e).__name__, {}, b""
+                outcome = type(e).__name__
+
+            if status is not None and status < 400:
+                record(outcome, len(payload))
+                return json.loads(payload) if payload else {}
+            delay = self.backoff(method, status, response_headers, attempt, unsent, reason)
+            if delay is None:
+                record(outcome, len(payload))
+                error = sdk.ApiException(status=status, reason=reason)
+                error.body, error.headers = payload, response_headers
+                raise error
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def paginate(self, path: str, params: Optional[Dict] = None,
+                       item_limit: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Yield the items of a paginated collection; the next page is only requested once needed."""
+        params = dict(params or {})
+        count = 0
+        while True:
+            page = await self.request("GET", path, params)
+            for item in page.get("data") or []:
+                yield item
+                count += 1
+                if item_limit is not None and count >= item_limit:
+                    return
+            offset = (page.get("next_page") or {}).get("offset")
+            if not offset:
+                return
+            params["offset"] = offset
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+class AsyncAsanaWorkspace:
+    """asyncio counterpart of AsanaWorkspace with the same method surface, as coroutines.
+
+    Every call goes through one AsyncTransport, so many PR events can run on one event
+    loop over shared keep-alive connections. Metadata cache, subtask index and user
+    directory are the synchronous workspace's. Writes queued with ``queue_*`` belong to
+    the asyncio task that queued them. The task mirror, the request cache and the
+    outbox are not supported: writes go straight to Asana.
+    """
+
+    is_async = True
+    mirror = None
+    outbox = None
+    request_cache = None
+
+    # Pure helpers shared with the synchronous workspace.
+    _cache_key = AsanaWorkspace._cache_key
+    _sections_key = AsanaWorkspace._sections_key
+    _custom_fields_key = AsanaWorkspace._custom_fields_key
+    _enum_options_key = AsanaWorkspace._enum_options_key
+    invalidate_metadata = AsanaWorkspace.invalidate_metadata
+    subtask_index = AsanaWorkspace.subtask_index
+    _find_subtask = AsanaWorkspace._find_subtask
+    _subtask_data = staticmethod(AsanaWorkspace._subtask_data)
+    _subtask_created = AsanaWorkspace._subtask_created
+    queue_subtasks = AsanaWorkspace.queue_subtasks
+
+    def __init__(self, config: Config):
+        self.platform = config.platform
+        self.workspace_gid = config.workspace_gid
+        self.max_workers = max(1, config.max_workers)
+        self.cache = MetadataCache(config.cache_path, config.cache_ttl)
+        self._user_directory_enabled = config.user_directory
+        self._user_directory: Optional[UserDirectory] = None
+        self._directory_lock: Optional[asyncio.Lock] = None
+        self.task_index_projects = config.task_index_projects
+        self.task_match_min = config.task_match_min
+        self._task_index: Optional[TaskNameIndex] = None
+        self._index_lock: Optional[asyncio.Lock] = None
+        if config.mirror or config.outbox_path:
+            logger.warning("The task mirror and the outbox are not supported by the async workspace; ignored.")
+
+        self.transport = AsyncTransport(config.token, config.host, rate=config.rate_limit, burst=config.rate_burst,
+                                        max_retries=config.max_retries, pool_size=config.pool_size,
+                                        trace=bool(config.trace_path))
+        self.metrics = self.transport.metrics
+
+    async def close(self) -> None:
+        await self.transport.close()
+
+    async def __aenter__(self) -> "AsyncAsanaWorkspace":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def fan_out(self, fn: Callable[[T], object], items: List[T]) -> List[object]:
+        """Await ``fn`` over ``items`` with at most ``max_workers`` calls in flight; results keep the input order."""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run(item: T):
+            async with semaphore:
+                return await fn(item)
+
+        return list(await asyncio.gather(*(run(item) for item in items)))
+
+    async def get_workspace(self) -> Dict:
+        key = self._cache_key("workspace")
+        workspace = self.cache.get(key)
+        if workspace is None:
+            workspace = (await self.transport.request("GET", f"/workspaces/{self.workspace_gid}"))["data"]
+            self.cache.set(key, workspace)
+        return workspace
+
+    async def list_users(self) -> List[AsanaUser]:
+        return [user async for user in self.iter_users()]
+
+    async def iter_users(self, limit: Optional[int] = None, page_size: int = 100,
+                         stop: Optional[Callable[[AsanaUser], bool]] = None) -> AsyncIterator[AsanaUser]:
+        try:
+            async for user in take(self._stream_users(limit, page_size), limit, stop):
+                yield user
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when listing users: {e.body}")
+
+    async def _stream_users(self, limit: Optional[int] = None, page_size: int = 100) -> AsyncIterator[AsanaUser]:
+        workspace = await self.get_workspace()
+        users = self.transport.paginate(f"/workspaces/{workspace['gid']}/users",
+                                        {"opt_fields": "gid,name,email", "limit": page_size}, item_limit=limit)
+        async for u in users:
+            yield AsanaUser(gid=u["gid"], name=u.get("name"), email=u.get("email"))
+
+    async def user_directory(self, refresh: bool = False) -> Optional[UserDirectory]:
+        """Async ``AsanaWorkspace.user_directory``."""
+        if not self._user_directory_enabled:
+            return None
+        if self._directory_lock is None:
+            self._directory_lock = asyncio.Lock()
+        async with self._directory_lock:
+            if self._user_directory is None:
+                self._user_directory = UserDirectory(self.cache.path, self.cache.default_ttl)
+            directory = self._user_directory
+            if refresh or directory.stale:
+                try:
+                    # Collected first: a failed stream must not prune the users it did not reach.
+                    directory.sync([user async for user in self._stream_users()])
+                except sdk.ApiException as e:
+                    logger.error(f"Asana API error when refreshing the user directory: {e.body}")
+        return directory
+
+    async def task_index(self, refresh: bool = False) -> Optional[TaskNameIndex]:
+        """Async ``AsanaWorkspace.task_index``."""
+        if not self.task_index_projects:
+            return None
+        if self._index_lock is None:
+            self._index_lock = asyncio.Lock()
+        async with self._index_lock:
+            if self._task_index is None:
+                self._task_index = TaskNameIndex(self.cache.path, self.cache.default_ttl)
+            index = self._task_index
+            for project_gid in self.task_index_projects:
+                if not (refresh or index.needs_refresh(project_gid)):
+                    continue
+                started, since = checkpoint(), index.modified_since(project_gid)
+                full = since is None or index.needs_build(project_gid)
+                try:
+                    tasks = [task async for task in self.transport.paginate(
+                        "/tasks", project_task_params(project_gid, None if full else since))]
+                except sdk.ApiException as e:
+                    logger.error(f"Asana API error when refreshing the task name index of project {project_gid}: "
+                                 f"{e.body}")
+                    continue
+                if full:
+                    index.sync_project(project_gid, tasks, started)
+                else:
+                    index.apply_changes(project_gid, tasks, started)
+        return index
+
+    async def complete_task(self, task_gid: str) -> None:
+        try:
+            await self.transport.request("PUT", f"/tasks/{task_gid}", data={"completed": True})
+            logger.info(f"Task {task_gid} marked as completed.")
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when completing task {task_gid}: {e.body}")
+
+    async def delete_task(self, task_gid: str) -> None:
+        try:
+            await self.transport.request("DELETE", f"/tasks/{task_gid}")
+            logger.info(f"Task {task_gid} deleted.")
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when deleting task {task_gid}: {e.body}")
+
+    async def create_subtask(self, task: AsanaTask, name: str, assignee_gid: Optional[str] = None,
+                             project_gid: Optional[str] = None, custom_fields: Optional[Dict[str, str]] = None,
+                             description: Optional[str] = None,
+                             project_sections_mapping: Optional[Dict[str, str]] = None) -> Optional[AsanaTask]:
+        subtask = self._find_subtask(task, name, assignee_gid)
+        if subtask:
+            return await self.get_task_details(subtask.gid)
+        section_gid = (project_sections_mapping or {}).get(PLANNED_SECTION)
+        action = self.queue_subtask(task.gid, self._subtask_data(name, assignee_gid, project_gid, custom_fields,
+                                                                 description, section_gid))
+        await self.flush_writes()
+        if not action.ok:
+            return None
+        logger.info(f"Created subtask '{name}' under task {task.gid}.")
+        return self._subtask_created(action.result, section_gid)
+
+    async def create_subtasks(self, task: AsanaTask, name: str, assignee_gids: List[str],
+                              project_gid: Optional[str] = None, custom_fields: Optional[Dict[str, str]] = None,
+                              description: Optional[str] = None,
+                              project_sections_mapping: Optional[Dict[str, str]] = None) -> List[Optional[AsanaTask]]:
+        """Async ``AsanaWorkspace.create_subtasks``."""
+        created: Dict[str, AsanaTask] = {}
+        self.queue_subtasks(task, name, assignee_gids, project_gid, custom_fields, description,
+                            project_sections_mapping, on_created=created.__setitem__)
+        await self.flush_writes()
+        return [created.get(gid) or self._find_subtask(task, name, gid) for gid in assignee_gids]
+
+    async def search_task_by_name(self, name: str, assignee_gid: Optional[str] = None,
+                                  limit: Optional[int] = None) -> List[AsanaTask]:
+        return [task async for task in self.iter_search_tasks(name, assignee_gid, limit=limit)]
+
+    async def iter_search_tasks(self, name: str, assignee_gid: Optional[str] = None, limit: Optional[int] = None,
+                                page_size: int = 100, stop: Optional[Callable[[AsanaTask], bool]] = None
+                                ) -> AsyncIterator[AsanaTask]:
+        """Stream tasks matching ``name``, newest first, paging on ``created_at.before`` like the sync workspace."""
+        search_params = search_task_params(name, assignee_gid, limit, page_size)
+
+        async def pages() -> AsyncIterator[AsanaTask]:
+            while True:
+                page = (await self.transport.request("GET", f"/workspaces/{self.workspace_gid}/tasks/search",
+                                                     search_params))["data"]
+                for raw in page:
+                    yield task_from_raw(raw)
+                if not next_search_page(search_params, page):
+                    return
+
+        try:
+            async for task in take(pages(), limit, stop):
+                yield task
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when searching for task by name '{name}': {e.body}")
+
+    async def get_task_details(self, task_gid: str) -> Optional[AsanaTask]:
+        try:
+            raw, subtasks_raw = await asyncio.gather(
+                self.transport.request("GET", f"/tasks/{task_gid}", {"opt_fields": ",".join(TASK_DETAIL_FIELDS)}),
+                self._fetch_subtasks(task_gid, ("name", "gid", "assignee.gid"))
+            )
+            task = task_from_raw(raw["data"])
+            task.subtasks = [task_from_raw(st) for st in subtasks_raw]
+            task.completed = raw["data"].get("completed", False)
+            return task
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when retrieving task details for {task_gid}: {e.body}")
+        return None
+
+    async def get_task_tree(self, task_gid: str,
+                            profile: FieldProfile = FIELD_PROFILES["full"]) -> Optional[AsanaTask]:
+        """Fetch a task and the state of all its direct subtasks; the two reads run concurrently."""
+
+        async def root() -> Dict:
+            if not profile.task_fields:
+                return {"gid": task_gid}
+            return (await self.transport.request("GET", f"/tasks/{task_gid}",
+                                                 {"opt_fields": ",".join(profile.task_fields)}))["data"]
+
+        try:
+            raw, subtasks_raw = await asyncio.gather(root(), self._fetch_subtasks(task_gid, profile.subtask_fields))
+            task = task_from_raw(raw)
+            task.subtasks = [task_from_raw(st) for st in subtasks_raw]
+            logger.info(f"Fetched task tree for {task_gid}: {len(task.subtasks)} subtask(s).")
+            return task
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error when retrieving task tree for {task_gid}: {e.body}")
+        return None
+
+    async def _fetch_subtasks(self, task_gid: str, fields: Tuple[str, ...]) -> List[Dict]:
+        return [raw async for raw in self.transport.paginate(f"/tasks/{task_gid}/subtasks",
+                                                             {"opt_fields": ",".join(fields), "limit": 100})]
+
+    async def get_custom_field_enum_options(self, custom_field_gid: str) -> List[Dict[str, str]]:
+        key = self._enum_options_key(custom_field_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            field = (await self.transport.request("GET", f"/custom_fields/{custom_field_gid}",
+                                                  {"opt_fields": "enum_options.name"}))["data"]
+            options = enum_options_from_raw(field)
+            self.cache.set(key, options)
+            return options
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error fetching enum options for custom field {custom_field_gid}: {e.body}")
+        return []
+
+    async def move_task_to_section(self, task_gid: str, section_gid: str) -> bool:
+        try:
+            await self.transport.request("POST", f"/sections/{section_gid}/addTask", data={"task": task_gid})
+            logger.info(f"Moved task {task_gid} to section {section_gid}.")
+            return True
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error moving task {task_gid} to section {section_gid}: {e.body}")
+        return False
+
+    def queue_section_move(self, task_gid: str, section_gid: str) -> None:
+        _task_local(_pending_section_moves).append((task_gid, section_gid))
+
+    async def flush_section_moves(self, max_attempts: int = 6, base_delay: float = 0.25) -> List[Tuple[str, str]]:
+        """Apply this task's queued section moves, retrying rejected ones with jittered exponential backoff."""
+        queued = _task_local(_pending_section_moves)
+        pending = queued[:]
+        queued.clear()
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            if attempt:
+                await asyncio.sleep(base_delay * 2 ** (attempt - 1) * (1 + random.random()))
+            actions = [self.queue_section_add(task_gid, section_gid) for task_gid, section_gid in pending]
+            await self.flush_writes()
+            pending = [move for move, action in zip(pending, actions) if not action.ok]
+
+        for task_gid, section_gid in pending:
+            logger.error(f"Gave up moving task {task_gid} to section {section_gid} after {max_attempts} attempts.")
+        return pending
+
+    async def list_sections_of_project(self, project_gid: str) -> List[Dict[str, str]]:
+        key = self._sections_key(project_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            sections = sections_from_raw([section async for section in
+                                          self.transport.paginate(f"/projects/{project_gid}/sections")])
+            self.cache.set(key, sections)
+            return sections
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error listing sections for project {project_gid}: {e.body}")
+        return []
+
+    async def list_custom_fields_of_project(self, project_gid: str) -> List[Dict[str, str]]:
+        key = self._custom_fields_key(project_gid)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            project = (await self.transport.request("GET", f"/projects/{project_gid}",
+                                                    {"opt_fields": "custom_field_settings.custom_field"}))["data"]
+            custom_fields = custom_fields_from_raw(project)
+            self.cache.set(key, custom_fields)
+            return custom_fields
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error fetching custom fields for project {project_gid}: {e.body}")
+        return []
+
+    async def add_comment_to_task(self, task_gid: str, comment: str) -> bool:
+        action = self.queue_comment(task_gid, comment)
+        await self.flush_writes()
+        if action.ok:
+            logger.info(f"Added comment to task {task_gid}: {comment}")
+        return action.ok
+
+    def queue_comment(self, task_gid: str, comment: str) -> BatchAction:
+        return self._queue_write("post", f"/tasks/{task_gid}/stories", {"text": comment})
+
+    def queue_complete(self, task_gid: str) -> BatchAction:
+        return self._queue_write("put", f"/tasks/{task_gid}", {"completed": True})
+
+    def queue_section_add(self, task_gid: str, section_gid: str) -> BatchAction:
+        return self._queue_write("post", f"/sections/{section_gid}/addTask", {"task": task_gid})
+
+    def queue_subtask(self, parent_task_gid: str, data: Dict,
+                      on_done: Optional[Callable[[BatchAction], None]] = None) -> BatchAction:
+        return self._queue_write("post", f"/tasks/{parent_task_gid}/subtasks", data, on_done)
+
+    def _queue_write(self, method: str, relative_path: str, data: Dict,
+                     on_done: Optional[Callable[[BatchAction], None]] = None) -> BatchAction:
+        action = BatchAction(method=method, relative_path=relative_path, data=data, on_done=on_done)
+        _task_local(_queued_writes).append(action)
+        return action
+
+    async def flush_writes(self) -> List[BatchAction]:
+        """Send this task's queued writes as /batch requests of up to BATCH_SIZE actions, all in flight at once."""
+        queued = _task_local(_queued_writes)
+        actions = queued[:]
+        queued.clear()
+        if not actions:
+            return actions
+
+        pending = actions
+        for attempt in range(self.transport.max_retries + 1):
+            await self.fan_out(self._send_batch, [pending[i:i + BATCH_SIZE]
+                                                  for i in range(0, len(pending), BATCH_SIZE)])
+            pending, check = split_failed(pending)
+            for action in check:
+                if await self._already_applied(action) is False:
+                    pending.append(action)
+            if not pending or attempt == self.transport.max_retries:
+                break
+            await asyncio.sleep(self.transport.batch_backoff(pending, attempt))
+
+        for action in actions:
+            if not action.ok:
+                logger.warning(f"Asana batch action {action.method.upper()} {action.relative_path} failed "
+                               f"({action.status_code}): {action.body}")
+            if action.on_done:
+                action.on_done(action)
+        return actions
+
+    async def _already_applied(self, action: BatchAction) -> Optional[bool]:
+        """Async ``AsanaWorkspace._already_applied``."""
+        lookup = applied_lookup(action)
+        if lookup is None:
+            return False
+        try:
+            match = find_applied(action, [item async for item in self.transport.paginate(*lookup)])
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error checking write {action.relative_path}: {e.body}")
+            return None
+        if match is None:
+            return False
+        logger.info(f"Write {action.method.upper()} {action.relative_path} was already applied.")
+        action.status_code, action.body = 201, {"data": match}
+        return True
+
+    async def _send_batch(self, actions: List[BatchAction]) -> None:
+        body = {"actions": [{"method": a.method, "relative_path": a.relative_path, "data": a.data} for a in actions]}
+        try:
+            response = await self.transport.request("POST", "/batch", data=body)
+            for action, result in zip(actions, response.get("data", [])):
+                action.status_code = result.get("status_code")
+                action.body = result.get("body")
+                action.headers = result.get("headers")
+            logger.info(f"Sent batch of {len(actions)} write(s).")
+        except sdk.ApiException as e:
+            logger.error(f"Asana API error sending batch of {len(actions)} write(s): {e.body}")
+            for action in actions:
+                action.status_code = e.status
+                action.body = {"errors": [{"message": e.reason}]}
+                action.headers = dict(e.headers or {})
@@ -0,0 +1,254 @@
+"""Performance checks for the sync scripts.
+
+    python benchmark.py startup [--max-ratio 1.2] [--runs 20] [--update-baseline]
+    python benchmark.py subtask-index [--subtasks 10000] [--reviewers 5] [--max-ratio 3]
+    python benchmark.py actions [--sizes 10,1000] [--latency 0.01] [--inject-429 0] [--update-baseline]
+
+Each subcommand prints its measurements and exits non-zero when a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "benchmark_baseline.json")
+TIME_SLACK_MS = 25.0  # absolute allowance so scheduler noise does not fail the fastest actions
+
+# Modules that must stay out of the import graph of the CLI entry point.
+LAZY_MODULES = ("asana", "dotenv", "urllib3")
+
+
+def measure_import(module: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds per top-level module, from ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and not match.group(2):
+            timings[match.group(3)] = int(match.group(1))
+    return timings
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {path}; run with --update-baseline first")
+        return None
+
+
+def update_baseline(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    """Replace the entries of ``results`` in the baseline file, keeping those of the other benchmarks."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    baseline.update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Baseline written to {path}")
+
+
+def bench_startup(args: argparse.Namespace) -> bool:
+    runs: List[Dict[str, int]] = [measure_import("asana_sync") for _ in range(args.runs)]
+    best = round(min(run["asana_sync"] for run in runs) / 1000, 1)
+    print(f"import asana_sync: best of {args.runs} = {best:.1f} ms")
+
+    eager = [name for name in LAZY_MODULES if name in runs[0]]
+    if eager:
+        print(f"FAIL: imported at start-up although only needed on first use: {', '.join(eager)}")
+    if args.update_baseline:
+        update_baseline(args.baseline, {"startup": {"import_ms": best}})
+        return not eager
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return False
+    if "startup" not in baseline:
+        print(f"No start-up time in {args.baseline}; run with --update-baseline first")
+        return False
+    budget = baseline["startup"]["import_ms"] * args.max_ratio
+    print(f"budget {budget:.1f} ms ({args.max_ratio:g} x baseline {baseline['startup']['import_ms']:.1f} ms)")
+    if best > budget:
+        print("FAIL: start-up import time is over budget")
+    return not eager and best <= budget
+
+
+def synthetic_root_task(platform: str, size: int, reviewers: int):
+    """A root task with ``size`` PR subtasks spread over ``reviewers`` assignees."""
+    from data import AsanaTask, AsanaUser
+
+    subtasks = [
+        AsanaTask(gid=str(i), name=f"{platform}:pr{i // reviewers}: Synthetic change {i // reviewers}",
+                  assignee=AsanaUser(gid=f"user{i % reviewers}"))
+        for i in range(size)
+    ]
+    return AsanaTask(gid="root", name="Root", assignee=None, subtasks=subtasks)
+
+
+def lookup_cost(size: int, reviewers: int, rounds: int = 2000) -> float:
+    """Microseconds per reviewer lookup on an index over ``size`` subtasks (index build excluded)."""
+    from subtask_index import SubtaskIndex
+
+    index = SubtaskIndex("bench", synthetic_root_task("bench", size, reviewers).subtasks)
+    pr_number = str(size // reviewers // 2)
+    gids = [f"user{i}" for i in range(reviewers)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for gid in gids:
+            index.get(pr_number, gid)
+    return (time.perf_counter() - start) / (rounds * reviewers) * 1e6
+
+
+def bench_subtask_index(args: argparse.Namespace) -> bool:
+    from subtask_index import SubtaskIndex
+
+    root = synthetic_root_task("bench", args.subtasks, args.reviewers)
+    start = time.perf_counter()
+    SubtaskIndex("bench", root.subtasks)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"index build over {args.subtasks} subtasks: {build_ms:.1f} ms")
+
+    small, large = lookup_cost(args.subtasks // 10, args.reviewers), lookup_cost(args.subtasks, args.reviewers)
+    print(f"lookup per reviewer: {small:.2f} us at {args.subtasks // 10} subtasks, "
+          f"{large:.2f} us at {args.subtasks} subtasks (ratio {large / small:.2f}, max {args.max_ratio})")
+    if large / small > args.max_ratio:
+        print("FAIL: lookup cost grows with the number of subtasks")
+        return False
+    return True
+
+
+BENCH_REVIEWERS = {"alice": "2001", "bob": "2002", "carol": "2003"}
+# Reviewers that already have a subtask for the benchmarked PR, and the reviewers the event carries.
+BENCH_SCENARIOS = {
+    "opened": ((), ("alice", "bob")),
+    "updated": (("alice", "carol"), ("alice", "bob")),
+    "closed": (("alice", "bob"), ("alice", "bob")),
+    "approved": (("alice", "bob"), ("alice",)),
+    "comment": (("alice", "bob"), ("alice",)),
+}
+
+
+def seed_workspace(fake, action: str, size: int):
+    """A sprint project and a root task with ``size`` subtasks of other PRs; returns the benchmarked PR."""
+    from asana_workspace import PLANNED_SECTION
+    from data import PRData
+
+    for login, gid in BENCH_REVIEWERS.items():
+        fake.add_user(gid, login.title(), f"{login}@example.com")
+    fake.add_custom_field("400", "Priority", ["High", "Low"])
+    fake.add_project("300", "Sprint 12 (01.10-14.10)", sections=[PLANNED_SECTION, "Done"], custom_fields=["400"])
+    fake.add_task("100", "Root", projects=["300"], custom_fields={"400": "400-0"})
+    gids = list(BENCH_REVIEWERS.values())
+    for i in range(size):
+        fake.add_task(None, f"bench:pr{1000 + i}: Other change", parent="100", assignee=gids[i % len(gids)])
+    existing, requested = BENCH_SCENARIOS[action]
+    for login in existing:
+        fake.add_task(None, "bench:pr7: Benchmarked change", parent="100", assignee=BENCH_REVIEWERS[login])
+    return PRData(number="7", title="Benchmarked change", body="https://app.asana.com/0/1/project/300/task/100",
+                  platform="bench", reviewers=list(requested))
+
+
+def run_action(action: str, size: int, latency: float, inject_429: int) -> Dict[str, float]:
+    import asana_sync
+    from asana_workspace import AsanaWorkspace
+    from data import Config
+    from fake_asana import FakeAsana
+
+    with FakeAsana(latency=latency) as fake:
+        pr = seed_workspace(fake, action, size)
+        fake.reset_stats()
+        fake.rate_limit(inject_429)
+        asana_ws = AsanaWorkspace(Config(token="bench", workspace_gid=fake.workspace_gid, platform="bench",
+                                         host=fake.url))
+        start = time.perf_counter()
+        asana_sync.sync_pr(asana_ws, action, pr, "https://github.com/owner/repo/pull/7")
+        wall_ms = (time.perf_counter() - start) * 1000
+        return {"requests": len(fake.requests), "bytes": fake.bytes_in + fake.bytes_out, "wall_ms": round(wall_ms, 1)}
+
+
+def regressions(name: str, measured: Dict[str, float], baseline: Dict[str, float],
+                bytes_tolerance: float, time_tolerance: float) -> List[str]:
+    problems = []
+    if measured["requests"] > baseline["requests"]:
+        problems.append(f"{name}: {measured['requests']} requests, baseline {baseline['requests']}")
+    if measured["bytes"] > baseline["bytes"] * (1 + bytes_tolerance):
+        problems.append(f"{name}: {measured['bytes']} bytes, baseline {baseline['bytes']}")
+    if measured["wall_ms"] > baseline["wall_ms"] * (1 + time_tolerance) + TIME_SLACK_MS:
+        problems.append(f"{name}: {measured['wall_ms']:.1f} ms, baseline {baseline['wall_ms']:.1f} ms")
+    return problems
+
+
+def bench_actions(args: argparse.Namespace) -> bool:
+    import asana_sync
+    from transport import sdk
+
+    os.environ["REVIEWERS_GIDS"] = json.dumps(BENCH_REVIEWERS)
+    sdk.ApiClient  # import the SDK up front so the first action does not pay for it
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        for action in asana_sync.ACTIONS:
+            runs = [run_action(action, size, args.latency, args.inject_429) for _ in range(args.runs)]
+            best = min(runs, key=lambda run: run["wall_ms"])
+            results[f"{action}/{size}"] = best
+            print(f"{action:>9} {size:>6} subtasks: {best['requests']:>4} requests {best['bytes']:>9} bytes "
+                  f"{best['wall_ms']:>8.1f} ms")
+
+    if args.update_baseline:
+        update_baseline(args.baseline, results)
+        return True
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return False
+    problems = [problem for name, measured in results.items() if name in baseline
+                for problem in regressions(name, measured, baseline[name], args.bytes_tolerance, args.time_tolerance)]
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return not problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="cold-start import time of asana_sync")
+    startup.add_argument("--max-ratio", type=float, default=float(os.getenv("STARTUP_MAX_RATIO", "1.2")),
+                         help="fail when the import takes longer than this multiple of the baseline")
+    startup.add_argument("--runs", type=int, default=20)
+    startup.add_argument("--baseline", default=BASELINE_PATH)
+    startup.add_argument("--update-baseline", action="store_true")
+    startup.set_defaults(run=bench_startup)
+
+    index = commands.add_parser("subtask-index", help="reviewer lookup cost on a root task with many subtasks")
+    index.add_argument("--subtasks", type=int, default=10000)
+    index.add_argument("--reviewers", type=int, default=5)
+    index.add_argument("--max-ratio", type=float, default=3.0)
+    index.set_defaults(run=bench_subtask_index)
+
+    actions = commands.add_parser("actions", help="requests, bytes and wall time of each sync action on a fake Asana")
+    actions.add_argument("--sizes", default="10,1000", help="comma-separated subtask counts of the root task")
+    actions.add_argument("--latency", type=float, default=0.01, help="seconds added to every fake response")
+    actions.add_argument("--inject-429", type=int, default=0, help="answer the first N requests with 429")
+    actions.add_argument("--runs", type=int, default=3)
+    actions.add_argument("--baseline", default=BASELINE_PATH)
+    actions.add_argument("--update-baseline", action="store_true")
+    actions.add_argument("--bytes-tolerance", type=float, default=0.05)
+    actions.add_argument("--time-tolerance", type=float, default=0.5)
+    actions.set_defaults(run=bench_actions)
+
+    args = parser.parse_args()
+    sys.exit(0 if args.run(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
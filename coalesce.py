@@ -0,0 +1,112 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from data import PREvent
+
+logger = logging.getLogger(__name__)
+
+COALESCED_ACTIONS = ("updated",)
+
+EventKey = Tuple[str, str]
+
+
+def event_key(event: PREvent) -> EventKey:
+    return event.pr.platform, event.pr.number
+
+
+class EventCoalescer:
+    """Debounces bursty ``updated`` events per (platform, PR number).
+
+    A submitted ``updated`` event replaces any pending one for the same PR and is
+    released by ``due`` only after ``window`` seconds without a newer event, so just
+    the final reviewer set gets applied. Any other action releases the pending
+    event of its PR immediately, ahead of itself, to keep per-PR ordering. The
+    clock is injectable, which makes the behaviour fully deterministic.
+    """
+
+    def __init__(self, window: float, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._pending: Dict[EventKey, Tuple[float, PREvent]] = {}
+
+    def submit(self, event: PREvent) -> List[PREvent]:
+        """Register ``event``; returns the events that must run right away, in order."""
+        key = event_key(event)
+        if event.action in COALESCED_ACTIONS:
+            if key in self._pending:
+                logger.info(f"Coalesced {event.action} for PR #{event.pr.number} into the newer event.")
+            self._pending[key] = (self.clock() + self.window, event)
+            return []
+        released = [self._pending.pop(key)[1]] if key in self._pending else []
+        return released + [event]
+
+    def due(self) -> List[PREvent]:
+        """Pop the pending events whose quiet window has passed, oldest deadline first."""
+        now = self.clock()
+        ready = sorted((deadline, key) for key, (deadline, _) in self._pending.items() if deadline <= now)
+        return [self._pending.pop(key)[1] for _, key in ready]
+
+    def next_deadline(self) -> Optional[float]:
+        return min((deadline for deadline, _ in self._pending.values()), default=None)
+
+
+class FileDebouncer:
+    """Cross-process debounce for CLI runs sharing a host, backed by a queue file.
+
+    Each run ``claim``s a sequence number for its PR, waits out the window and
+    proceeds only if it still holds the latest number; ``lock`` then serialises
+    the surviving runs of one PR so they never dedup against a stale subtask list.
+    """
+
+    def __init__(self, directory: Optional[str], window: float, sleep: Callable[[float], None] = time.sleep):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "asana_sync")
+        self.window = window
+        self.sleep = sleep
+        os.makedirs(self.directory, exist_ok=True)
+        self.queue_path = os.path.join(self.directory, "queue.json")
+
+    @contextmanager
+    def _locked(self, path: str) -> Iterator[None]:
+        with open(path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _update(self, key: EventKey, bump: bool) -> int:
+        with self._locked(self.queue_path + ".lock"):
+            try:
+                with open(self.queue_path, encoding="utf-8") as f:
+                    queue = json.load(f)
+            except (FileNotFoundError, ValueError):
+                queue = {}
+            name = ":".join(key)
+            if bump:
+                queue[name] = queue.get(name, 0) + 1
+                with open(self.queue_path, "w", encoding="utf-8") as f:
+                    json.dump(queue, f)
+            return queue.get(name, 0)
+
+    def claim(self, key: EventKey) -> int:
+        return self._update(key, bump=True)
+
+    def is_latest(self, key: EventKey, seq: int) -> bool:
+        return self._update(key, bump=False) == seq
+
+    def wait_turn(self, key: EventKey) -> bool:
+        """Claim a slot, wait out the window; False when a newer event for the PR arrived meanwhile."""
+        seq = self.claim(key)
+        self.sleep(self.window)
+        return self.is_latest(key, seq)
+
+    @contextmanager
+    def lock(self, key: EventKey) -> Iterator[None]:
+        with self._locked(os.path.join(self.directory, f"{'_'.join(key)}.lock")):
+            yield
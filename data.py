@@ -1,6 +1,7 @@
+import time
 from dataclasses import dataclass, field
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -10,12 +11,33 @@ class PRData:
     body: str
     platform: str
     reviewers: list[str]
+    branch: str = ""
 
 
 class Config(BaseModel):
     token: str
     workspace_gid: str
-    pr: PRData
+    platform: str
+    pr: Optional[PRData] = None
+    host: Optional[str] = None
+    max_workers: int = 8
+    cache_path: str = ":memory:"
+    cache_ttl: float = 6 * 3600
+    rate_limit: float = 25.0
+    rate_burst: float = 25.0
+    max_retries: int = 5
+    pool_size: int = 16
+    coalesce_window: float = 0.0
+    coalesce_dir: Optional[str] = None
+    mirror: bool = False
+    user_directory: bool = False
+    metrics_path: Optional[str] = None
+    trace_path: Optional[str] = None
+    outbox_path: Optional[str] = None
+    outbox_defer: bool = False
+    async_client: bool = False
+    task_index_projects: List[str] = []
+    task_match_min: float = 0.6
 
 
 @dataclass
@@ -47,3 +69,91 @@ class AsanaTask:
     custom_fields: Optional[List[AsanaCustomField]] = field(default_factory=list)
     subtasks: Optional[List["AsanaTask"]] = field(default_factory=list)
     completed: Optional[bool] = None
+    # SubtaskIndex over ``subtasks``, built on demand by AsanaWorkspace.subtask_index.
+    subtask_index: Any = field(default=None, repr=False, compare=False)
+
+
+@dataclass
+class FanOutResult:
+    results: List[Any]
+    errors: Dict[int, Exception] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass(frozen=True)
+class FieldProfile:
+    task_fields: Tuple[str, ...]
+    subtask_fields: Tuple[str, ...]
+
+
+@dataclass
+class BatchAction:
+    method: str
+    relative_path: str
+    data: Dict[str, Any]
+    status_code: Optional[int] = None
+    body: Optional[Dict[str, Any]] = None
+    headers: Optional[Dict[str, str]] = None
+    on_done: Optional[Callable[["BatchAction"], None]] = field(default=None, repr=False)
+    journal_id: Optional[int] = None  # outbox entry, when the write is journaled
+    queued_at: float = field(default_factory=time.time)  # before the first attempt; bounds the in-doubt lookup
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        return (self.body or {}).get("data")
+
+
+@dataclass
+class PRRecord:
+    pr: PRData
+    state: str
+    url: str = ""
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+
+@dataclass
+class PREvent:
+    action: str
+    pr: PRData
+    pr_url: str = ""
+
+
+@dataclass
+class CallRecord:
+    endpoint: str
+    latency: float
+    request_bytes: int
+    response_bytes: int
+    retries: int
+    outcome: str  # HTTP status code, or the exception name when no response came back
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome.startswith("2")
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    duration: float
+    thread: int
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class StageRecord:
+    name: str
+    start: float  # seconds from the start of the run
+    end: float
+    deps: Tuple[str, ...] = ()
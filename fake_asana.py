@@ -0,0 +1,404 @@
+"""In-process stand-in for the parts of the Asana REST API this project uses.
+
+    fake = FakeAsana(latency=0.01)
+    fake.add_project("p1", "Sprint 12 (01.10-14.10)", sections=["Запланировано"])
+    fake.add_task("100", "Root", projects=["p1"])
+    with fake:
+        config = Config(..., host=fake.url)
+
+Supports tasks, subtasks, search, sections, projects, custom fields, stories,
+workspaces/users, batch and events, honours ``opt_fields`` and offset pagination,
+and counts requests and bytes. ``latency`` delays every response; ``rate_limit``
+answers the next requests with 429; ``fail_before_apply`` answers the next writes with a
+5xx without applying them, and ``fail_after_apply`` applies them but answers with a 5xx,
+like a gateway timing out.
+"""
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+API_PREFIX = "/api/1.0"
+DEFAULT_PAGE_SIZE = 100
+
+
+def select_fields(record: Dict, opt_fields: Optional[str]) -> Dict:
+    """Project ``record`` onto a comma-separated ``opt_fields`` list the way Asana does."""
+    if opt_fields is None:
+        return {key: record[key] for key in ("gid", "name", "resource_type") if key in record}
+    return _select(record, [field for field in opt_fields.split(",") if field])
+
+
+def _select(value, paths: List[str]):
+    if isinstance(value, list):
+        return [_select(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+    nested: Dict[str, List[str]] = {}
+    for path in paths:
+        head, _, rest = path.partition(".")
+        nested.setdefault(head, [])
+        if rest:
+            nested[head].append(rest)
+    out = {key: value[key] for key in ("gid", "resource_type") if key in value}
+    for head, rest in nested.items():
+        if head in value:
+            out[head] = _select(value[head], rest) if rest else value[head]
+    return out
+
+
+class FakeAsana:
+    def __init__(self, workspace_gid: str = "1", latency: float = 0.0, retry_after: float = 0.0):
+        self.workspace_gid = workspace_gid
+        self.latency = latency
+        self.retry_after = retry_after
+        self.tasks: Dict[str, Dict] = {}
+        self.projects: Dict[str, Dict] = {}
+        self.sections: Dict[str, Dict] = {}
+        self.custom_fields: Dict[str, Dict] = {}
+        self.users: Dict[str, Dict] = {}
+        self.stories: List[Tuple[str, str]] = []
+        self.story_times: List[str] = []
+        self.events: List[Tuple[str, Dict]] = []
+        self.requests: List[Tuple[str, str]] = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._rate_limited = 0
+        self._fail_before_apply: List[int] = []
+        self._fail_after_apply: List[int] = []
+        self._ids = itertools.count(10 ** 15)
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._lock = threading.RLock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # -- seeding -------------------------------------------------------------------------------
+
+    def new_gid(self) -> str:
+        return str(next(self._ids))
+
+    def add_user(self, gid: str, name: str, email: Optional[str] = None) -> Dict:
+        self.users[gid] = {"gid": gid, "resource_type": "user", "name": name, "email": email}
+        return self.users[gid]
+
+    def add_custom_field(self, gid: str, name: str, options: Iterable[str] = ()) -> Dict:
+        self.custom_fields[gid] = {
+            "gid": gid, "resource_type": "custom_field", "name": name,
+            "enum_options": [{"gid": f"{gid}-{i}", "name": option} for i, option in enumerate(options)],
+        }
+        return self.custom_fields[gid]
+
+    def add_project(self, gid: str, name: str, sections: Iterable[str] = (),
+                    custom_fields: Iterable[str] = ()) -> Dict:
+        self.projects[gid] = {"gid": gid, "resource_type": "project", "name": name,
+                              "custom_fields": list(custom_fields), "sections": []}
+        for section_name in sections:
+            section_gid = self.new_gid()
+            self.sections[section_gid] = {"gid": section_gid, "resource_type": "section", "name": section_name,
+                                          "project": gid}
+            self.projects[gid]["sections"].append(section_gid)
+        return self.projects[gid]
+
+    def add_task(self, gid: Optional[str], name: str, parent: Optional[str] = None, assignee: Optional[str] = None,
+                 completed: bool = False, projects: Iterable[str] = (), custom_fields: Optional[Dict[str, str]] = None,
+                 notes: str = "") -> Dict:
+        gid = gid or self.new_gid()
+        self._clock += timedelta(seconds=1)
+        self.tasks[gid] = {
+            "gid": gid, "name": name, "parent": parent, "assignee": assignee, "completed": completed,
+            "projects": list(projects), "sections": {}, "custom_fields": dict(custom_fields or {}), "notes": notes,
+            "created_at": self._clock.isoformat().replace("+00:00", "Z"), "modified_at": _now(),
+        }
+        if parent:
+            self._emit(parent, "added", gid, self.tasks[gid]["modified_at"])
+        return self.tasks[gid]
+
+    def rate_limit(self, count: int) -> None:
+        """Answer the next ``count`` requests with 429 Too Many Requests."""
+        with self._lock:
+            self._rate_limited += count
+
+    def fail_before_apply(self, count: int, status: int = 500) -> None:
+        """Answer the next ``count`` write requests with ``status`` without applying them."""
+        with self._lock:
+            self._fail_before_apply.extend([status] * count)
+
+    def fail_after_apply(self, count: int, status: int = 504) -> None:
+        """Apply the next ``count`` write requests, then answer them with ``status`` instead of the result."""
+        with self._lock:
+            self._fail_after_apply.extend([status] * count)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.bytes_in = self.bytes_out = 0
+
+    # -- server --------------------------------------------------------------------------------
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "FakeAsana":
+        handler = type("Handler", (_Handler,), {"fake": self})
+        # The default listen backlog of 5 drops connections under concurrent clients (1 s SYN retry).
+        server_class = type("Server", (ThreadingHTTPServer,), {"request_queue_size": 128})
+        self._server = server_class(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeAsana":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -- rendering -----------------------------------------------------------------------------
+
+    def _user_ref(self, gid: Optional[str]) -> Optional[Dict]:
+        if not gid:
+            return None
+        user = self.users.get(gid, {"gid": gid, "name": None})
+        return {"gid": gid, "resource_type": "user", "name": user["name"]}
+
+    def _render_task(self, task: Dict) -> Dict:
+        custom_fields = []
+        for cf_gid, option_gid in task["custom_fields"].items():
+            cf = self.custom_fields[cf_gid]
+            option = next((o for o in cf["enum_options"] if o["gid"] == option_gid), None)
+            custom_fields.append({"gid": cf_gid, "resource_type": "custom_field", "name": cf["name"],
+                                  "enum_value": option})
+        return {
+            "gid": task["gid"], "resource_type": "task", "name": task["name"], "notes": task["notes"],
+            "completed": task["completed"], "created_at": task["created_at"], "modified_at": task["modified_at"],
+            "assignee": self._user_ref(task["assignee"]),
+            "parent": {"gid": task["parent"], "resource_type": "task"} if task["parent"] else None,
+            "projects": [{"gid": p, "resource_type": "project", "name": self.projects[p]["name"]}
+                         for p in task["projects"]],
+            "memberships": [{"project": {"gid": p, "resource_type": "project"},
+                             "section": {"gid": s, "resource_type": "section"} if s else None}
+                            for p, s in ((p, task["sections"].get(p)) for p in task["projects"])],
+            "custom_fields": custom_fields,
+        }
+
+    def _emit(self, resource_gid: str, action: str, gid: str, at: Optional[str] = None) -> None:
+        self.events.append((resource_gid, {"action": action, "resource": {"gid": gid, "resource_type": "task"},
+                                           "parent": {"gid": resource_gid, "resource_type": "task"},
+                                           "created_at": at or _now()}))
+
+    # -- routing -------------------------------------------------------------------------------
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Dict) -> Tuple[int, Dict]:
+        with self._lock:
+            parts = path[len(API_PREFIX):].strip("/").split("/")
+            route = getattr(self, f"_{method.lower()}_{parts[0]}", None)
+            if not route:
+                return _error(404, f"No route for {method} {path}")
+            try:
+                return route(parts[1:], query, body.get("data") or {})
+            except KeyError as e:
+                return _error(404, f"Unknown resource {e}")
+
+    def _page(self, items: List[Dict], query: Dict[str, str], path: str) -> Tuple[int, Dict]:
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", DEFAULT_PAGE_SIZE))
+        page = items[offset:offset + limit]
+        next_page = None
+        if offset + limit < len(items):
+            next_page = {"offset": str(offset + limit), "path": f"{path}?offset={offset + limit}", "uri": None}
+        return 200, {"data": [select_fields(item, query.get("opt_fields")) for item in page], "next_page": next_page}
+
+    def _get_workspaces(self, parts, query, data):
+        if len(parts) == 1:
+            return 200, {"data": select_fields({"gid": parts[0], "resource_type": "workspace", "name": "Workspace"},
+                                               query.get("opt_fields"))}
+        if parts[1] == "users":
+            return self._page(list(self.users.values()), query, f"/workspaces/{parts[0]}/users")
+        if parts[1:] == ["tasks", "search"]:
+            return self._search(query)
+        return _error(404, "Unknown workspace resource")
+
+    def _search(self, query: Dict[str, str]) -> Tuple[int, Dict]:
+        text = query.get("text", "").lower()
+        hits = [t for t in self.tasks.values() if text in t["name"].lower()]
+        if query.get("assignee.any"):
+            hits = [t for t in hits if t["assignee"] in query["assignee.any"].split(",")]
+        if query.get("created_at.before"):
+            hits = [t for t in hits if t["created_at"] < query["created_at.before"]]
+        hits.sort(key=lambda t: t["created_at"], reverse=query.get("sort_ascending", "false").lower() != "true")
+        limit = min(int(query.get("limit", 20)), 100)
+        return 200, {"data": [select_fields(self._render_task(t), query.get("opt_fields")) for t in hits[:limit]]}
+
+    def _get_tasks(self, parts, query, data):
+        if not parts:
+            tasks = [t for t in self.tasks.values() if query.get("project") in t["projects"]]
+            if query.get("completed_since") == "now":
+                tasks = [t for t in tasks if not t["completed"]]
+            if query.get("modified_since"):
+                since = _parse_time(query["modified_since"])
+                tasks = [t for t in tasks if _parse_time(t["modified_at"]) >= since]
+            return self._page([self._render_task(t) for t in tasks], query, "/tasks")
+        if len(parts) == 1:
+            return 200, {"data": select_fields(self._render_task(self.tasks[parts[0]]), query.get("opt_fields"))}
+        if parts[1] == "subtasks":
+            self.tasks[parts[0]]
+            subtasks = [self._render_task(t) for t in self.tasks.values() if t["parent"] == parts[0]]
+            return self._page(subtasks, query, f"/tasks/{parts[0]}/subtasks")
+        if parts[1] == "stories":
+            self.tasks[parts[0]]
+            stories = [{"gid": str(i), "resource_type": "story", "resource_subtype": "comment_added", "text": text,
+                        "created_at": created_at}
+                       for i, ((task_gid, text), created_at) in enumerate(zip(self.stories, self.story_times), 1)
+                       if task_gid == parts[0]]
+            return self._page(stories, query, f"/tasks/{parts[0]}/stories")
+        return _error(404, "Unknown task resource")
+
+    def _post_tasks(self, parts, query, data):
+        if len(parts) == 2 and parts[1] == "subtasks":
+            self.tasks[parts[0]]
+            memberships = data.get("memberships") or []
+            projects = [m["project"] for m in memberships]
+            if data.get("projects"):
+                projects.append(data["projects"])
+            task = self.add_task(None, data["name"], parent=parts[0], assignee=data.get("assignee"),
+                                 projects=projects, custom_fields=data.get("custom_fields"),
+                                 notes=data.get("notes", ""))
+            for membership in memberships:
+                if membership.get("section"):
+                    task["sections"][membership["project"]] = membership["section"]
+            return 201, {"data": self._render_task(task)}
+        if len(parts) == 2 and parts[1] == "stories":
+            self.tasks[parts[0]]
+            self.stories.append((parts[0], data.get("text", "")))
+            self.story_times.append(_now())
+            return 201, {"data": {"gid": self.new_gid(), "resource_type": "story", "text": data.get("text", "")}}
+        return _error(404, "Unknown task resource")
+
+    def _put_tasks(self, parts, query, data):
+        task = self.tasks[parts[0]]
+        task.update({key: value for key, value in data.items() if key in ("name", "completed", "assignee", "notes")})
+        task["modified_at"] = _now()
+        if task["parent"]:
+            self._emit(task["parent"], "changed", task["gid"], task["modified_at"])
+        return 200, {"data": self._render_task(task)}
+
+    def _delete_tasks(self, parts, query, data):
+        task = self.tasks.pop(parts[0])
+        if task["parent"]:
+            self._emit(task["parent"], "deleted", task["gid"])
+        return 200, {"data": {}}
+
+    def _get_projects(self, parts, query, data):
+        project = self.projects[parts[0]]
+        if len(parts) == 2 and parts[1] == "sections":
+            sections = [self.sections[gid] for gid in project["sections"]]
+            return self._page(sections, query, f"/projects/{parts[0]}/sections")
+        settings = [{"gid": self.new_gid(), "resource_type": "custom_field_setting",
+                     "custom_field": {"gid": cf, "resource_type": "custom_field",
+                                      "name": self.custom_fields[cf]["name"]}}
+                    for cf in project["custom_fields"]]
+        return 200, {"data": select_fields(dict(project, custom_field_settings=settings), query.get("opt_fields"))}
+
+    def _post_sections(self, parts, query, data):
+        section = self.sections[parts[0]]
+        task = self.tasks[data["task"]]
+        if section["project"] not in task["projects"]:
+            task["projects"].append(section["project"])
+        task["sections"][section["project"]] = parts[0]
+        return 200, {"data": {}}
+
+    def _get_custom_fields(self, parts, query, data):
+        return 200, {"data": select_fields(self.custom_fields[parts[0]], query.get("opt_fields"))}
+
+    def _get_events(self, parts, query, data):
+        resource = query.get("resource")
+        sync = query.get("sync")
+        if not sync or not sync.isdigit() or int(sync) > len(self.events):
+            return 412, {"errors": [{"message": "Sync token invalid or too old."}], "sync": str(len(self.events))}
+        events = [event for gid, event in self.events[int(sync):] if gid == resource]
+        return 200, {"data": events, "sync": str(len(self.events)), "has_more": False}
+
+    def _post_batch(self, parts, query, data):
+        results = []
+        for action in data.get("actions", []):
+            relative = urlparse(action["relative_path"])
+            sub_query = {key: values[0] for key, values in parse_qs(relative.query).items()}
+            status, payload = self.handle(action["method"].upper(), API_PREFIX + relative.path, sub_query,
+                                          {"data": action.get("data") or {}})
+            results.append({"status_code": status, "headers": {}, "body": payload})
+        return 200, {"data": results}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _error(status: int, message: str) -> Tuple[int, Dict]:
+    return status, {"errors": [{"message": message}]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    fake: FakeAsana
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _respond(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.fake._lock:
+            self.fake.bytes_out += len(body)
+
+    def _dispatch(self) -> None:
+        fake = self.fake
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        url = urlparse(self.path)
+        with fake._lock:
+            fake.requests.append((self.command, url.path))
+            fake.bytes_in += len(raw) + len(self.path)
+            limited = fake._rate_limited > 0
+            if limited:
+                fake._rate_limited -= 1
+            refused = (fake._fail_before_apply.pop(0)
+                       if not limited and fake._fail_before_apply and self.command != "GET" else None)
+        if fake.latency:
+            time.sleep(fake.latency)
+        if limited:
+            self._respond(429, {"errors": [{"message": "Rate limited"}]}, {"Retry-After": str(fake.retry_after)})
+            return
+        if refused:
+            self._respond(refused, {"errors": [{"message": "Internal server error"}]})
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, payload = fake.handle(self.command, url.path, query, json.loads(raw) if raw else {})
+        with fake._lock:
+            lost = fake._fail_after_apply.pop(0) if fake._fail_after_apply and self.command != "GET" else None
+        if lost:
+            self._respond(lost, {"errors": [{"message": "Gateway timeout"}]})
+            return
+        self._respond(status, payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
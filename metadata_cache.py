@@ -0,0 +1,67 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """SQLite-backed key/value store for Asana metadata with a per-entry TTL.
+
+    Values are stored as JSON. The file is small enough to be persisted between
+    workflow runs (e.g. with actions/cache); ``:memory:`` keeps it per process.
+    """
+
+    def __init__(self, path: str = ":memory:", default_ttl: float = 6 * 3600):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM metadata WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            logger.debug(f"Metadata cache entry '{key}' expired.")
+            return None
+        logger.debug(f"Metadata cache hit for '{key}'.")
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._conn.commit()
+
+    def invalidate(self, prefix: str = "") -> int:
+        """Drop every entry whose key starts with ``prefix`` (all entries by default)."""
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM metadata WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",))
+            self._conn.commit()
+        logger.info(f"Invalidated {cursor.rowcount} metadata cache entries for prefix '{prefix}'.")
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM metadata WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
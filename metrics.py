@@ -0,0 +1,112 @@
+import json
+import logging
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from data import CallRecord, Span
+
+logger = logging.getLogger(__name__)
+
+GID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """``GET https://app.asana.com/api/1.0/tasks/123/subtasks`` -> ``GET /tasks/{gid}/subtasks``."""
+    path = url.split("?", 1)[0]
+    path = path.split("/api/1.0", 1)[-1] if "/api/1.0" in path else path
+    return f"{method.upper()} {GID_SEGMENT.sub('/{gid}', path)}"
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty sequence)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Metrics:
+    """Per-call records of every Asana request plus optional trace spans.
+
+    ``summary`` aggregates the calls per endpoint; with ``trace=True`` each call
+    and each ``span`` block is also kept as a span, written out by ``write_trace``
+    in Chrome trace-event format (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls: List[CallRecord] = []
+            self.spans: List[Span] = []
+            self.timeline: Optional[Dict[str, Any]] = None  # stage timeline of the last staged run
+            self.started = time.perf_counter()
+
+    def record(self, call: CallRecord) -> None:
+        end = time.perf_counter()
+        with self._lock:
+            self.calls.append(call)
+            if self.trace:
+                self.spans.append(Span(name=call.endpoint, start=end - call.latency - self.started,
+                                       duration=call.latency, thread=threading.get_ident(),
+                                       attributes={"outcome": call.outcome, "retries": call.retries,
+                                                   "bytes": call.request_bytes + call.response_bytes}))
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block as a trace span; attributes can be added to the yielded dict."""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            if self.trace:
+                with self._lock:
+                    self.spans.append(Span(name=name, start=start - self.started,
+                                           duration=time.perf_counter() - start,
+                                           thread=threading.get_ident(), attributes=attributes))
+
+    def summary(self, **context: Any) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+            wall = time.perf_counter() - self.started
+        endpoints: Dict[str, List[CallRecord]] = {}
+        for call in calls:
+            endpoints.setdefault(call.endpoint, []).append(call)
+
+        def aggregate(records: List[CallRecord]) -> Dict[str, Any]:
+            latencies = [record.latency * 1000 for record in records]
+            return {
+                "count": len(records),
+                "errors": sum(not record.ok for record in records),
+                "retries": sum(record.retries for record in records),
+                "request_bytes": sum(record.request_bytes for record in records),
+                "response_bytes": sum(record.response_bytes for record in records),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+            }
+
+        total = aggregate(calls)
+        total["wall_ms"] = round(wall * 1000, 1)
+        summary = dict(context, total=total,
+                       endpoints={name: aggregate(records) for name, records in sorted(endpoints.items())})
+        if self.timeline:
+            summary["timeline"] = self.timeline
+        return summary
+
+    def write_trace(self, path: str) -> None:
+        with self._lock:
+            events = [
+                {"name": span.name, "ph": "X", "pid": 1, "tid": span.thread, "ts": round(span.start * 1e6),
+                 "dur": round(span.duration * 1e6), "args": span.attributes}
+                for span in self.spans
+            ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Wrote {len(events)} trace span(s) to {path}.")
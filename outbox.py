@@ -0,0 +1,145 @@
+import fcntl
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+from data import BatchAction
+
+logger = logging.getLogger(__name__)
+
+# pending: not sent yet, or failed transiently; sending: claimed by a flusher, which
+# may have died mid-request; done: confirmed by Asana; failed: rejected for good.
+UNSETTLED = ("pending", "sending")
+
+
+def idempotency_key(action: BatchAction) -> str:
+    """Same method, path and data give the same key, so a re-run does not journal a write twice."""
+    payload = json.dumps([action.method, action.relative_path, action.data], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Outbox:
+    """SQLite journal of intended Asana writes.
+
+    ``record`` stores every write of a flush in one transaction before any of them
+    is sent, keyed by ``idempotency_key`` so an intent that is still unsettled is not
+    journaled twice. A flusher ``claim``s the unsettled entries under an exclusive
+    file lock and ``settle``s each one with its Asana result; entries that failed
+    transiently go back to ``pending``. An entry still ``sending`` when it is claimed
+    again belongs to a flusher that died mid-request: the write may or may not have
+    reached Asana, and ``claim`` reports it as in doubt.
+    """
+
+    def __init__(self, path: str, keep_done: float = 7 * 24 * 3600):
+        self.path = path
+        self.keep_done = keep_done
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, flush_id TEXT NOT NULL,"
+            "method TEXT NOT NULL, relative_path TEXT NOT NULL, data TEXT NOT NULL,"
+            "state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+            "status_code INTEGER, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, id);"
+            "CREATE INDEX IF NOT EXISTS outbox_key ON outbox (key, state);"
+        )
+        self._conn.commit()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Serialise flushers across processes sharing the journal."""
+        if self.path == ":memory:":
+            yield
+            return
+        with open(f"{self.path}.lock", "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def record(self, actions: Sequence[BatchAction]) -> str:
+        """Journal ``actions`` atomically and set their ``journal_id``; returns the flush id."""
+        flush_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            for action in actions:
+                key = idempotency_key(action)
+                row = self._conn.execute(
+                    "SELECT id FROM outbox WHERE key = ? AND state IN (?, ?) ORDER BY id LIMIT 1", (key,) + UNSETTLED
+                ).fetchone()
+                if row:
+                    action.journal_id = row[0]
+                    continue
+                action.journal_id = self._conn.execute(
+                    "INSERT INTO outbox (key, flush_id, method, relative_path, data, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, flush_id, action.method, action.relative_path, json.dumps(action.data), now, now)
+                ).lastrowid
+        if actions:
+            logger.info(f"Recorded {len(actions)} write(s) in the outbox.")
+        return flush_id
+
+    def claim(self) -> Tuple[List[BatchAction], Set[int]]:
+        """Mark every unsettled entry as ``sending``, oldest first; also returns the ids in doubt."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, method, relative_path, data, state, created_at FROM outbox WHERE state IN (?, ?) "
+                "ORDER BY id",
+                UNSETTLED
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE outbox SET state = 'sending', attempts = attempts + 1, updated_at = ? "
+                "WHERE state IN (?, ?)", (time.time(),) + UNSETTLED
+            )
+        actions = [BatchAction(method=method, relative_path=path, data=json.loads(data), journal_id=row_id,
+                               queued_at=created_at)
+                   for row_id, method, path, data, _, created_at in rows]
+        return actions, {row[0] for row in rows if row[4] == "sending"}
+
+    def settle(self, actions: Sequence[BatchAction], retryable: Sequence[int]) -> None:
+        """Store the outcome of claimed ``actions``; unanswered or ``retryable`` ones stay pending."""
+        now = time.time()
+        rows = []
+        for action in actions:
+            if action.ok:
+                state = "done"
+            elif action.status_code is None or action.status_code in retryable:
+                state = "pending"
+            else:
+                state = "failed"
+            error = None if action.ok else json.dumps(action.body)
+            rows.append((state, action.status_code, error, now, action.journal_id))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET state = ?, status_code = ?, error = ?, updated_at = ? WHERE id = ?", rows
+            )
+
+    def unsettled(self, path_prefix: str = "") -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE state IN (?, ?) AND relative_path LIKE ?",
+                UNSETTLED + (f"{path_prefix}%",)
+            ).fetchone()[0]
+
+    def purge(self) -> int:
+        """Drop settled entries older than ``keep_done``; failed ones stay for inspection."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM outbox WHERE state = 'done' AND updated_at < ?",
+                                      (time.time() - self.keep_done,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in ("pending", "sending", "done", "failed")}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,89 @@
+import json
+import logging
+from typing import Dict, List
+
+import asana_sync
+from asana_workspace import AsanaWorkspace, FIELD_PROFILES
+from data import PRData, PRRecord
+
+logger = logging.getLogger(__name__)
+
+
+def load_snapshot(path: str, platform: str) -> List[PRRecord]:
+    """Read PR records from a JSON-lines file.
+
+    Each line holds ``number``, ``title``, ``body``, ``reviewers`` (list or comma-separated
+    logins), ``state`` (``open``, ``closed`` or ``merged``) and optionally ``url`` and
+    ``branch``. When a PR appears more than once the last line wins.
+    """
+    records: Dict[str, PRRecord] = {}
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+                reviewers = raw.get("reviewers") or []
+                if isinstance(reviewers, str):
+                    reviewers = [r for r in reviewers.split(",") if r]
+                pr = PRData(number=str(raw["number"]), title=raw["title"], body=raw.get("body") or "",
+                            platform=platform, reviewers=reviewers, branch=raw.get("branch") or "")
+                records[pr.number] = PRRecord(pr=pr, state=str(raw.get("state", "open")).lower(),
+                                              url=raw.get("url") or "")
+            except (KeyError, ValueError) as e:
+                logger.error(f"Skipping malformed snapshot line {line_no}: {e}")
+    logger.info(f"Loaded {len(records)} PR record(s) from {path}.")
+    return list(records.values())
+
+
+def reconcile(asana_ws: AsanaWorkspace, records: List[PRRecord]) -> Dict[str, int]:
+    """Apply the opened/updated/closed diff for many PRs at once.
+
+    PRs are grouped by root task so each subtask tree is fetched once, and every
+    resulting write is queued and sent through the shared batch writer.
+    """
+    groups: Dict[str, List[PRRecord]] = {}
+    for record in records:
+        task_gids = asana_sync.root_task_gids(record.pr) or asana_sync.matched_root_task_gids(asana_ws, record.pr)
+        if not task_gids:
+            logger.warning(f"PR #{record.pr.number}: no Asana task URL or matching task name, skipped.")
+        for task_gid in task_gids:
+            groups.setdefault(task_gid, []).append(record)
+
+    def fetch(task_gid: str):
+        needs_sprint = any(record.is_open for record in groups[task_gid])
+        return asana_ws.get_task_tree(task_gid, FIELD_PROFILES["opened" if needs_sprint else "closed"])
+
+    trees = asana_ws.fan_out(fetch, list(groups))
+    created: List[str] = []
+    completions = {}
+    for (task_gid, group), root_task in zip(groups.items(), trees.results):
+        if not root_task:
+            logger.error(f"Could not load Asana task {task_gid}; {len(group)} PR(s) skipped.")
+            continue
+        sprint = asana_sync.resolve_field_config(asana_ws, root_task)
+        index = asana_ws.subtask_index(root_task)
+        for record in group:
+            pr = record.pr
+            existing_subtasks = asana_sync.extract_existing_subtasks(index, pr.number)
+            if record.is_open:
+                to_open, to_close = asana_sync.plan_reviewer_changes(existing_subtasks,
+                                                                     asana_sync.resolve_reviewers(pr, asana_ws))
+                if to_open:
+                    asana_ws.queue_subtasks(root_task, asana_sync.subtask_name(pr), to_open, sprint.project_gid,
+                                            sprint.fields_config, record.url, sprint.section_map,
+                                            on_created=lambda gid, subtask: created.append(subtask.gid))
+                completions.update(asana_sync.queue_close(asana_ws, to_close, "Review request dismissed"))
+            else:
+                completions.update(asana_sync.queue_close(asana_ws, existing_subtasks, "Pull request closed"))
+
+    asana_ws.flush_writes()
+    asana_ws.flush_section_moves()
+    summary = {
+        "prs": len(records),
+        "root_tasks": len(groups),
+        "created": len(created),
+        "closed": sum(action.ok for action in completions.values()),
+    }
+    logger.info(f"[RECONCILE] {summary}")
+    return summary
@@ -0,0 +1,100 @@
+import copy
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+
+GID = re.compile(r"^\d+$")
+RESPONSE_GID = re.compile(rb'"gid":\s*"(\d+)"')
+UNCACHED_SUFFIXES = ("/events",)  # polling endpoints answer differently on every call
+
+
+def gids_in(path: str) -> Set[str]:
+    return {segment for segment in path.split("?", 1)[0].split("/") if GID.match(segment)}
+
+
+def written_gids(url: str, body: Optional[Dict]) -> Set[str]:
+    """Gids a write may change: those in its path and data, or in every action of a /batch request."""
+    data = (body or {}).get("data") or {}
+    if url.rstrip("/").endswith("/batch"):
+        return set().union(*(written_gids(action.get("relative_path", ""), {"data": action.get("data")})
+                             for action in data.get("actions", [])))
+    values = data.values() if isinstance(data, dict) else ()
+    return gids_in(url) | {value for value in values if isinstance(value, str) and GID.match(value)}
+
+
+class RequestCache:
+    """Run-scoped identity map for GET responses.
+
+    A GET whose URL and query were already answered is served from memory, and
+    concurrent identical GETs share one in-flight call. Writes drop every entry
+    whose path or response names one of the written gids. A response that was in
+    flight while a write invalidated entries is returned but not kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Any] = {}
+        self._by_gid: Dict[str, Set[Hashable]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._generation = 0
+        self.hits = self.shared = self.misses = 0
+
+    @staticmethod
+    def cacheable(url: str) -> bool:
+        return not url.split("?", 1)[0].rstrip("/").endswith(UNCACHED_SUFFIXES)
+
+    def get(self, url: str, query: Iterable, fetch: Callable[[], Any]) -> Any:
+        key = (url, tuple(tuple(item) for item in query or ()))
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return copy.copy(self._entries[key])
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return copy.copy(future.result())
+
+        try:
+            response = fetch()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        # The SDK decodes ``data`` in place, so keep a pristine copy for later readers.
+        stored = copy.copy(response)
+        with self._lock:
+            self._inflight.pop(key, None)
+            if generation == self._generation:
+                self._entries[key] = stored
+                body = stored.data if isinstance(stored.data, bytes) else b""
+                for gid in gids_in(url) | {match.decode() for match in RESPONSE_GID.findall(body)}:
+                    self._by_gid.setdefault(gid, set()).add(key)
+        future.set_result(stored)
+        return response
+
+    def invalidate(self, gids: Iterable[str]) -> int:
+        with self._lock:
+            self._generation += 1
+            keys = set().union(*(self._by_gid.pop(gid, ()) for gid in gids))
+            for key in keys:
+                self._entries.pop(key, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_gid.clear()
+            self.hits = self.shared = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "shared": self.shared, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,89 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data import StageRecord
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+def critical_path(records: List[StageRecord]) -> List[str]:
+    """Stages that decided the run's length: from the stage that ended last, back through
+    the dependency each stage waited on longest."""
+    by_name = {record.name: record for record in records}
+    path = []
+    record = max(records, key=lambda r: r.end, default=None)
+    while record is not None:
+        path.append(record.name)
+        record = max((by_name[dep] for dep in record.deps if dep in by_name), key=lambda r: r.end, default=None)
+    return path[::-1]
+
+
+class StageGraph:
+    """Named stages of one run and the stages each one needs.
+
+    A stage is called with the results of its dependencies, in the order they were
+    listed, as soon as they are all available; stages that do not depend on each other
+    run at the same time on up to ``max_workers`` threads. The first stage to raise
+    stops the run: stages not started yet are skipped and its exception is re-raised
+    once the running ones have finished. Each stage is also recorded as a trace span.
+    """
+
+    def __init__(self, metrics: Metrics, max_workers: int = 4):
+        self.metrics = metrics
+        self.max_workers = max(1, max_workers)
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+        self.records: List[StageRecord] = []
+
+    def add(self, name: str, fn: Callable[..., Any], *deps: str) -> None:
+        unknown = [dep for dep in deps if dep not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on unknown stage(s): {', '.join(unknown)}")
+        self._stages[name] = (fn, deps)
+
+    def run(self) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        waiting = dict(self._stages)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        started = time.perf_counter()
+
+        def call(name: str, fn: Callable[..., Any], args: List[Any]) -> Any:
+            start = time.perf_counter()
+            try:
+                with self.metrics.span(name):
+                    return fn(*args)
+            finally:
+                self.records.append(StageRecord(name=name, start=start - started,
+                                                end=time.perf_counter() - started, deps=self._stages[name][1]))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self._stages) or 1)) as executor:
+            while waiting or running:
+                if error is None:
+                    for name, (fn, deps) in list(waiting.items()):
+                        if all(dep in results for dep in deps):
+                            del waiting[name]
+                            running[executor.submit(call, name, fn, [results[dep] for dep in deps])] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException as e:
+                        error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    def timeline(self) -> Dict[str, Any]:
+        """Start and end of every stage that ran, in ms from the start of the run, plus the critical path."""
+        records = sorted(self.records, key=lambda r: r.start)
+        return {
+            "stages": {record.name: {"start_ms": round(record.start * 1000, 1), "end_ms": round(record.end * 1000, 1),
+                                     "after": list(record.deps)} for record in records},
+            "critical_path": critical_path(records),
+        }
@@ -0,0 +1,52 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import utils
+from data import AsanaTask
+
+SubtaskKey = Tuple[str, str, Optional[str]]
+
+
+class SubtaskIndex:
+    """Subtasks of one root task keyed by (platform, PR number, assignee gid).
+
+    Every title is parsed once, when the subtask is added, so deduplication and
+    the reviewer diff cost a dict lookup per reviewer instead of a scan over all
+    subtasks of the root task. ``source`` is the list the index was built from.
+    """
+
+    def __init__(self, platform: str, subtasks: Iterable[AsanaTask] = ()):
+        self.platform = platform
+        self.source = subtasks
+        self._by_pr: Dict[Tuple[str, str], List[AsanaTask]] = {}
+        self._by_key: Dict[SubtaskKey, List[AsanaTask]] = {}
+        for subtask in subtasks:
+            self.add(subtask)
+
+    def __len__(self) -> int:
+        return sum(len(subtasks) for subtasks in self._by_pr.values())
+
+    def add(self, subtask: AsanaTask) -> bool:
+        """Index ``subtask``; False when its title does not belong to a PR of this platform."""
+        matched, pr_number = utils.parse_task_title(subtask.name or "", self.platform)
+        if not matched:
+            return False
+        assignee_gid = subtask.assignee.gid if subtask.assignee else None
+        self._by_pr.setdefault((self.platform, pr_number), []).append(subtask)
+        self._by_key.setdefault((self.platform, pr_number, assignee_gid), []).append(subtask)
+        return True
+
+    def for_pr(self, pr_number: str) -> List[AsanaTask]:
+        return list(self._by_pr.get((self.platform, pr_number), ()))
+
+    def get(self, pr_number: str, assignee_gid: Optional[str]) -> Optional[AsanaTask]:
+        """The PR's subtask assigned to ``assignee_gid``; the last one if there are several."""
+        subtasks = self._by_key.get((self.platform, pr_number, assignee_gid))
+        return subtasks[-1] if subtasks else None
+
+    def find(self, name: str, assignee_gid: Optional[str]) -> Optional[AsanaTask]:
+        """First subtask titled exactly ``name`` and assigned to ``assignee_gid``."""
+        matched, pr_number = utils.parse_task_title(name, self.platform)
+        if not matched or not assignee_gid:
+            return None
+        subtasks = self._by_key.get((self.platform, pr_number, assignee_gid), ())
+        return next((sub for sub in subtasks if sub.name == name), None)
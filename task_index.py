@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# Words a branch name or PR title carries that say nothing about the task.
+NOISE_WORDS = frozenset({"feature", "feat", "fix", "bugfix", "hotfix", "chore", "refactor", "wip", "pr"})
+# Changes are asked for since a little before the last read, to allow for clock skew.
+CLOCK_SKEW = timedelta(minutes=2)
+
+
+def checkpoint(at: Optional[float] = None) -> str:
+    """``modified_since`` value for a read made at ``at`` (now by default)."""
+    moment = datetime.fromtimestamp(time.time() if at is None else at, timezone.utc) - CLOCK_SKEW
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def words(value: str) -> List[str]:
+    """``"feature/Login-Büttön_fix"`` gives ``["login", "button"]``."""
+    folded = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().lower()
+    return [word for word in NON_ALNUM.sub(" ", folded).split() if word not in NOISE_WORDS]
+
+
+def trigrams(value: str) -> FrozenSet[str]:
+    """Trigrams of every word, padded like pg_trgm so short words and word starts still count."""
+    grams = set()
+    for word in words(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TaskNameIndex:
+    """Names of the tasks in a set of projects, with an in-memory trigram index for fuzzy lookups.
+
+    Rows are persisted in SQLite (the metadata cache file). A project is loaded in full
+    by ``sync_project`` and then kept current with ``apply_changes``, which takes the
+    tasks modified since the previous refresh. Completed tasks leave the index, and
+    subtasks (reviewer subtasks live in the sprint projects too) never enter it.
+    ``search`` ranks names by trigram similarity to the query and never calls Asana.
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: float = 6 * 3600, refresh_interval: float = 300):
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS name_index_tasks (gid TEXT PRIMARY KEY, project_gid TEXT NOT NULL, "
+            "name TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS name_index_projects (project_gid TEXT PRIMARY KEY, "
+            "built_at REAL NOT NULL, refreshed_at REAL NOT NULL, modified_since TEXT);"
+        )
+        self._conn.commit()
+        self._projects: Dict[str, Tuple[float, float, Optional[str]]] = {}
+        self._gids: List[Optional[str]] = []
+        self._names: List[Optional[str]] = []
+        self._task_projects: List[Optional[str]] = []
+        self._grams: List[FrozenSet[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self) -> None:
+        with self._lock:
+            for project_gid, built_at, refreshed_at, modified_since in self._conn.execute(
+                    "SELECT project_gid, built_at, refreshed_at, modified_since FROM name_index_projects"):
+                self._projects[project_gid] = (built_at, refreshed_at, modified_since)
+            for gid, project_gid, name in self._conn.execute("SELECT gid, project_gid, name FROM name_index_tasks"):
+                self._put(gid, project_gid, name)
+        if self._rows:
+            logger.debug(f"Loaded {len(self._rows)} task name(s) from the index.")
+
+    # -- freshness ---------------------------------------------------------------------------
+
+    def needs_build(self, project_gid: str) -> bool:
+        state = self._projects.get(project_gid)
+        return state is None or state[0] + self.max_age < time.time()
+
+    def needs_refresh(self, project_gid: str) -> bool:
+        state = self._projects.get(project_gid)
+        return state is None or state[1] + self.refresh_interval < time.time()
+
+    def modified_since(self, project_gid: str) -> Optional[str]:
+        state = self._projects.get(project_gid)
+        return state[2] if state else None
+
+    # -- rows --------------------------------------------------------------------------------
+
+    def _put(self, gid: str, project_gid: str, name: str) -> bool:
+        row = self._rows.get(gid)
+        if row is not None:
+            if (self._names[row], self._task_projects[row]) == (name, project_gid):
+                return False
+            self._drop(gid)
+        row = self._rows[gid] = len(self._gids)
+        grams = trigrams(name)
+        self._gids.append(gid)
+        self._names.append(name)
+        self._task_projects.append(project_gid)
+        self._grams.append(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(row)
+        return True
+
+    def _drop(self, gid: str) -> bool:
+        row = self._rows.pop(gid, None)
+        if row is None:
+            return False
+        for gram in self._grams[row]:
+            rows = self._postings.get(gram)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._postings[gram]
+        self._gids[row] = self._names[row] = self._task_projects[row] = None
+        self._grams[row] = frozenset()
+        return True
+
+    def _store(self, project_gid: str, tasks: Iterable[Dict]) -> Dict[str, int]:
+        upserts, removed = [], []
+        for task in tasks:
+            gid, name = task["gid"], task.get("name") or ""
+            if task.get("completed") or task.get("parent") or not name.strip():
+                if self._drop(gid):
+                    removed.append((gid,))
+            elif self._put(gid, project_gid, name):
+                upserts.append((gid, project_gid, name))
+        self._conn.executemany("INSERT OR REPLACE INTO name_index_tasks (gid, project_gid, name) VALUES (?, ?, ?)",
+                               upserts)
+        self._conn.executemany("DELETE FROM name_index_tasks WHERE gid = ?", removed)
+        return {"upserted": len(upserts), "removed": len(removed)}
+
+    def _mark(self, project_gid: str, built: bool, modified_since: Optional[str]) -> None:
+        now = time.time()
+        built_at = now if built else self._projects.get(project_gid, (now, now, None))[0]
+        self._projects[project_gid] = (built_at, now, modified_since)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO name_index_projects (project_gid, built_at, refreshed_at, modified_since) "
+            "VALUES (?, ?, ?, ?)", (project_gid, built_at, now, modified_since)
+        )
+
+    # -- refresh -----------------------------------------------------------------------------
+
+    def sync_project(self, project_gid: str, tasks: Iterable[Dict], modified_since: Optional[str] = None
+                     ) -> Dict[str, int]:
+        """Replace the names of ``project_gid`` with a full export of its open tasks.
+
+        ``tasks`` are dicts with ``gid``, ``name`` and optionally ``completed`` and ``parent``;
+        tasks of the project missing from them are dropped. ``modified_since`` is where the
+        next incremental refresh starts. An exception raised by ``tasks`` leaves the stored
+        project as it was before the call.
+        """
+        tasks = list(tasks)
+        with self._lock:
+            seen = {task["gid"] for task in tasks}
+            stale = [gid for gid, row in self._rows.items()
+                     if self._task_projects[row] == project_gid and gid not in seen]
+            for gid in stale:
+                self._drop(gid)
+            with self._conn:
+                self._conn.executemany("DELETE FROM name_index_tasks WHERE gid = ?", [(gid,) for gid in stale])
+                stats = self._store(project_gid, tasks)
+                self._mark(project_gid, True, modified_since)
+        stats["removed"] += len(stale)
+        stats["tasks"] = len(self._rows)
+        logger.info(f"Task name index rebuilt for project {project_gid}: {stats}")
+        return stats
+
+    def apply_changes(self, project_gid: str, tasks: Iterable[Dict], modified_since: Optional[str] = None
+                      ) -> Dict[str, int]:
+        """Apply the tasks of ``project_gid`` modified since the previous refresh."""
+        tasks = list(tasks)
+        with self._lock, self._conn:
+            stats = self._store(project_gid, tasks)
+            self._mark(project_gid, False, modified_since)
+        if stats["upserted"] or stats["removed"]:
+            logger.info(f"Task name index updated for project {project_gid}: {stats}")
+        return stats
+
+    def load_export(self, path: str, project_gids: Optional[Iterable[str]] = None,
+                    modified_since: Optional[str] = None) -> Dict[str, int]:
+        """Build the index from an Asana JSON project export (``{"data": [task, ...]}``).
+
+        Tasks are filed under their first project listed in ``project_gids`` (every project
+        when omitted); an export that carries no memberships is filed under the single
+        configured project. Later refreshes read the changes made since the file was written.
+        """
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+        modified_since = modified_since or checkpoint(os.path.getmtime(path))
+        tasks = raw.get("data", raw) if isinstance(raw, dict) else raw
+        wanted = list(project_gids or [])
+        by_project: Dict[str, List[Dict]] = {gid: [] for gid in wanted}
+        for task in tasks:
+            projects = [p.get("gid") for p in task.get("projects") or [] if p.get("gid")]
+            if not projects and len(wanted) == 1:
+                projects = wanted
+            project_gid = next((gid for gid in projects if not wanted or gid in wanted), None)
+            if project_gid:
+                by_project.setdefault(project_gid, []).append(task)
+        totals: Counter = Counter()
+        for project_gid, project_tasks in by_project.items():
+            totals.update(self.sync_project(project_gid, project_tasks, modified_since))
+        totals["tasks"] = len(self._rows)
+        return dict(totals)
+
+    # -- lookups -----------------------------------------------------------------------------
+
+    def search(self, text: str, limit: int = 5, min_score: float = 0.0,
+               project_gids: Optional[Iterable[str]] = None) -> List[Tuple[str, str, float]]:
+        """``(gid, name, score)`` of the names most similar to ``text``, best first.
+
+        The score is the Dice coefficient of the two trigram sets, from 0 to 1.
+        """
+        query = trigrams(text)
+        if not query:
+            return []
+        projects = set(project_gids) if project_gids is not None else None
+        with self._lock:
+            shared = Counter()
+            for gram in query:
+                shared.update(self._postings.get(gram, ()))
+            ranked = []
+            for row, count in shared.items():
+                if projects is not None and self._task_projects[row] not in projects:
+                    continue
+                score = 2 * count / (len(query) + len(self._grams[row]))
+                if score >= min_score:
+                    ranked.append((self._gids[row], self._names[row], round(score, 4)))
+        ranked.sort(key=lambda match: (-match[2], match[1]))
+        return ranked[:limit]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,117 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TaskMirror:
+    """SQLite copy of the direct subtasks of tracked root tasks.
+
+    Each root task row keeps the Asana events ``sync`` token its subtasks are
+    current to and the opt_fields they were read with, so a run only has to
+    apply the events that happened since. Rows older than ``max_age`` are
+    treated as missing, which bounds drift from edits the events stream of the
+    root task does not report. Shares the file of the metadata cache.
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: float = 6 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS mirror_roots ("
+            "root_gid TEXT PRIMARY KEY, sync TEXT NOT NULL, fields TEXT NOT NULL, refreshed_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS mirror_subtasks ("
+            "gid TEXT PRIMARY KEY, root_gid TEXT NOT NULL, position INTEGER NOT NULL, raw TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS mirror_subtasks_root ON mirror_subtasks (root_gid, position);"
+        )
+        self._conn.commit()
+
+    def load(self, root_gid: str, fields: Sequence[str]) -> Optional[Tuple[str, List[Dict]]]:
+        """The sync token and subtasks stored for ``root_gid``, or None when there is no usable copy."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync, fields, refreshed_at FROM mirror_roots WHERE root_gid = ?", (root_gid,)
+            ).fetchone()
+            if not row:
+                return None
+            sync, stored_fields, refreshed_at = row
+            if stored_fields != ",".join(fields) or refreshed_at + self.max_age < time.time():
+                logger.debug(f"Mirror of task {root_gid} is stale.")
+                return None
+            rows = self._conn.execute(
+                "SELECT raw FROM mirror_subtasks WHERE root_gid = ? ORDER BY position", (root_gid,)
+            ).fetchall()
+        return sync, [json.loads(raw) for raw, in rows]
+
+    def replace(self, root_gid: str, fields: Sequence[str], sync: str, subtasks: List[Dict]) -> None:
+        """Store a full fetch of the subtasks of ``root_gid`` as of ``sync``."""
+        with self._lock:
+            self._conn.execute("DELETE FROM mirror_subtasks WHERE root_gid = ?", (root_gid,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mirror_subtasks (gid, root_gid, position, raw) VALUES (?, ?, ?, ?)",
+                [(raw["gid"], root_gid, i, json.dumps(raw)) for i, raw in enumerate(subtasks)]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mirror_roots (root_gid, sync, fields, refreshed_at) VALUES (?, ?, ?, ?)",
+                (root_gid, sync, ",".join(fields), time.time())
+            )
+            self._conn.commit()
+
+    def apply(self, root_gid: str, sync: str, upserts: Iterable[Dict], removed: Iterable[str]) -> None:
+        """Apply subtask deltas and move ``root_gid`` to ``sync``; new subtasks go to the end."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM mirror_subtasks WHERE gid = ? AND root_gid = ?",
+                                   [(gid, root_gid) for gid in removed])
+            for raw in upserts:
+                self._upsert(root_gid, raw)
+            self._conn.execute("UPDATE mirror_roots SET sync = ? WHERE root_gid = ?", (sync, root_gid))
+            self._conn.commit()
+
+    def _upsert(self, root_gid: str, raw: Dict) -> None:
+        updated = self._conn.execute("UPDATE mirror_subtasks SET raw = ? WHERE gid = ? AND root_gid = ?",
+                                     (json.dumps(raw), raw["gid"], root_gid)).rowcount
+        if not updated:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO mirror_subtasks (gid, root_gid, position, raw) VALUES (?, ?, "
+                "(SELECT COALESCE(MAX(position), -1) + 1 FROM mirror_subtasks WHERE root_gid = ?), ?)",
+                (raw["gid"], root_gid, root_gid, json.dumps(raw))
+            )
+
+    def add_subtask(self, root_gid: str, raw: Dict) -> bool:
+        """Record a subtask this process created, keeping only the mirrored top-level fields."""
+        with self._lock:
+            row = self._conn.execute("SELECT fields FROM mirror_roots WHERE root_gid = ?", (root_gid,)).fetchone()
+            if not row:
+                return False
+            keys = {"gid"} | {field.split(".")[0] for field in row[0].split(",")}
+            self._upsert(root_gid, {key: value for key, value in raw.items() if key in keys})
+            self._conn.commit()
+        return True
+
+    def update_subtask(self, gid: str, changes: Dict) -> bool:
+        """Merge a successful write of this process (e.g. ``{"completed": True}``) into the stored subtask."""
+        with self._lock:
+            row = self._conn.execute("SELECT raw FROM mirror_subtasks WHERE gid = ?", (gid,)).fetchone()
+            if not row:
+                return False
+            raw = json.loads(row[0])
+            raw.update({key: value for key, value in changes.items() if key in raw})
+            self._conn.execute("UPDATE mirror_subtasks SET raw = ? WHERE gid = ?", (json.dumps(raw), gid))
+            self._conn.commit()
+        return True
+
+    def forget(self, root_gid: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM mirror_subtasks WHERE root_gid = ?", (root_gid,))
+            self._conn.execute("DELETE FROM mirror_roots WHERE root_gid = ?", (root_gid,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+from typing import Callable, List, Tuple
+
+import pytest
+
+# The modules live at the repository root, next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asana_workspace import PLANNED_SECTION, AsanaWorkspace  # noqa: E402
+from data import Config, PRData  # noqa: E402
+from fake_asana import FakeAsana  # noqa: E402
+
+REVIEWERS = {"alice": "2001", "bob": "2002", "carol": "2003"}
+ROOT_URL = "https://app.asana.com/0/1/project/300/task/100"
+PR_URL = "https://github.com/owner/repo/pull/7"
+
+
+@pytest.fixture
+def fake(monkeypatch) -> FakeAsana:
+    """A sprint project with its Planned section and root task 100, served over HTTP."""
+    monkeypatch.setenv("REVIEWERS_GIDS", json.dumps(REVIEWERS))
+    fake = FakeAsana()
+    for login, gid in REVIEWERS.items():
+        fake.add_user(gid, login.title(), f"{login}@example.com")
+    fake.add_custom_field("400", "Priority", ["High", "Low"])
+    fake.add_project("300", "Sprint 12 (01.10-14.10)", sections=[PLANNED_SECTION, "Done"], custom_fields=["400"])
+    fake.add_task("100", "Login button crash on Android", projects=["300"], custom_fields={"400": "400-0"})
+    with fake:
+        yield fake
+
+
+@pytest.fixture
+def workspace(fake) -> Callable[..., AsanaWorkspace]:
+    """Factory of workspaces talking to ``fake``; keyword arguments override Config fields."""
+
+    def make(**overrides) -> AsanaWorkspace:
+        config = Config(token="test", workspace_gid=fake.workspace_gid, platform="html5", host=fake.url,
+                        max_retries=2, **overrides)
+        asana_ws = AsanaWorkspace(config)
+        asana_ws.transport.base_delay = 0.01
+        return asana_ws
+
+    return make
+
+
+def make_pr(reviewers: List[str], number: str = "7", title: str = "Fix crash", body: str = ROOT_URL,
+            branch: str = "") -> PRData:
+    return PRData(number=number, title=title, body=body, platform="html5", reviewers=reviewers, branch=branch)
+
+
+def reviewer_subtasks(fake: FakeAsana, number: str = "7", parent: str = "100") -> List[Tuple[str, bool]]:
+    """(assignee gid, completed) of the subtasks PR ``number`` has under ``parent``, sorted."""
+    prefix = f"html5:pr{number}:"
+    return sorted((task["assignee"], task["completed"]) for task in fake.tasks.values()
+                  if task["parent"] == parent and task["name"].startswith(prefix))
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import async_sync
+from async_workspace import AsyncAsanaWorkspace
+from conftest import PR_URL, REVIEWERS, make_pr, reviewer_subtasks
+from data import Config, PRData
+
+ALICE, BOB = REVIEWERS["alice"], REVIEWERS["bob"]
+BATCH = "/api/1.0/batch"
+
+
+def run(fake, *events: Tuple[str, PRData],
+        flush: Optional[Callable[[AsyncAsanaWorkspace], Awaitable[None]]] = None) -> AsyncAsanaWorkspace:
+    """Sync ``events`` one after another on one async workspace talking to ``fake``, then await ``flush``."""
+    config = Config(token="test", workspace_gid=fake.workspace_gid, platform="html5", host=fake.url, max_retries=2)
+    asana_ws = AsyncAsanaWorkspace(config)
+    asana_ws.transport.base_delay = 0.01
+
+    async def main() -> None:
+        async with asana_ws:
+            for action, pr in events:
+                await async_sync.sync_pr(asana_ws, action, pr, PR_URL)
+            if flush:
+                await flush(asana_ws)
+
+    asyncio.run(main())
+    return asana_ws
+
+
+def stories_of(fake, task_gid: str) -> List[str]:
+    return [text for gid, text in fake.stories if gid == task_gid]
+
+
+def subtask_of(fake, assignee: str) -> str:
+    return next(gid for gid, task in fake.tasks.items() if task["parent"] == "100" and task["assignee"] == assignee)
+
+
+def test_review_round_trip(fake):
+    run(fake, ("opened", make_pr(["alice"])), ("opened", make_pr(["alice"])))
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+    alice_gid = subtask_of(fake, ALICE)
+
+    run(fake, ("updated", make_pr(["bob"])), ("comment", make_pr(["bob"])))
+    bob_gid = subtask_of(fake, BOB)
+    assert reviewer_subtasks(fake) == [(ALICE, True), (BOB, False)]
+    assert stories_of(fake, alice_gid) == ["Review request dismissed"]
+    assert stories_of(fake, bob_gid) == ["Changes requested"]
+
+    run(fake, ("approved", make_pr(["bob"])))
+    assert reviewer_subtasks(fake) == [(ALICE, True), (BOB, True)]
+    assert stories_of(fake, bob_gid) == ["Changes requested", "Pull request approved"]
+
+
+def test_rate_limited_batch_is_resent(fake):
+    run(fake, ("opened", make_pr(["alice"])))
+    alice_gid = subtask_of(fake, ALICE)
+    fake.reset_stats()
+
+    async def flush(asana_ws: AsyncAsanaWorkspace) -> None:
+        asana_ws.queue_comment(alice_gid, "Changes requested")
+        # One more 429 than the transport retries itself, so flush_writes has to resend the batch.
+        fake.rate_limit(3)
+        (action,) = await asana_ws.flush_writes()
+        assert action.ok
+
+    run(fake, flush=flush)
+
+    assert fake.requests == [("POST", BATCH)] * 4
+    assert stories_of(fake, alice_gid) == ["Changes requested"]
+
+
+def test_write_refused_by_asana_is_resent_once(fake):
+    run(fake, ("opened", make_pr(["alice"])))
+    fake.reset_stats()
+    fake.fail_before_apply(1, 500)
+
+    run(fake, ("comment", make_pr(["alice"])))
+
+    alice_gid = subtask_of(fake, ALICE)
+    assert fake.requests.count(("POST", BATCH)) == 2
+    assert ("GET", f"/api/1.0/tasks/{alice_gid}/stories") in fake.requests
+    assert stories_of(fake, alice_gid) == ["Changes requested"]
+
+
+def test_write_lost_behind_a_gateway_error_is_not_repeated(fake):
+    fake.fail_after_apply(1, 504)
+
+    run(fake, ("opened", make_pr(["alice", "bob"])))
+
+    assert fake.requests.count(("POST", BATCH)) == 1
+    assert fake.requests[-1] == ("GET", "/api/1.0/tasks/100/subtasks")
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+
+
+def test_repeated_comment_refused_by_asana_is_resent(fake):
+    run(fake, ("opened", make_pr(["alice"])), ("comment", make_pr(["alice"])))
+    fake.fail_before_apply(1, 500)
+
+    run(fake, ("comment", make_pr(["alice"])))
+
+    assert stories_of(fake, subtask_of(fake, ALICE)) == ["Changes requested"] * 2
@@ -0,0 +1,118 @@
+import multiprocessing
+import threading
+
+from coalesce import EventCoalescer, FileDebouncer
+from data import PREvent, PRData
+
+KEY = ("html5", "7")
+
+
+class FakeClock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def event(action: str, number: str = "7", title: str = "Fix") -> PREvent:
+    return PREvent(action=action, pr=PRData(number=number, title=title, body="", platform="html5", reviewers=[]))
+
+
+def test_update_burst_collapses_into_one_run():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=5, clock=clock)
+    for i in range(4):
+        assert coalescer.submit(event("updated", title=f"v{i}")) == []
+        clock.advance(2)
+    assert coalescer.due() == []
+    assert coalescer.next_deadline() == clock.now - 2 + 5
+
+    clock.advance(3)
+    released = coalescer.due()
+    assert [e.pr.title for e in released] == ["v3"]
+    assert coalescer.due() == []
+    assert coalescer.next_deadline() is None
+
+
+def test_bursts_of_different_prs_are_kept_apart():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=5, clock=clock)
+    coalescer.submit(event("updated", number="7"))
+    clock.advance(1)
+    coalescer.submit(event("updated", number="8"))
+    clock.advance(5)
+    assert [e.pr.number for e in coalescer.due()] == ["7", "8"]
+
+
+def test_other_action_releases_pending_update_first():
+    clock = FakeClock()
+    coalescer = EventCoalescer(window=5, clock=clock)
+    coalescer.submit(event("updated", title="v1"))
+    coalescer.submit(event("updated", number="8"))
+
+    released = coalescer.submit(event("closed"))
+    assert [(e.action, e.pr.number, e.pr.title) for e in released] == [("updated", "7", "v1"), ("closed", "7", "Fix")]
+    # The other PR keeps waiting out its window.
+    assert coalescer.submit(event("approved")) == [event("approved")]
+    clock.advance(5)
+    assert [e.pr.number for e in coalescer.due()] == ["8"]
+
+
+def test_wait_turn_lets_only_the_latest_claim_through(tmp_path):
+    claims = []
+    first = FileDebouncer(str(tmp_path), window=5, sleep=lambda _: claims.append(second.claim(KEY)))
+    second = FileDebouncer(str(tmp_path), window=5, sleep=lambda _: None)
+
+    assert first.wait_turn(KEY) is False
+    assert second.is_latest(KEY, claims[0])
+    assert second.wait_turn(("html5", "8")) is True
+
+
+def _hold_lock(directory: str, acquired, release) -> None:
+    with FileDebouncer(directory, 0).lock(KEY):
+        acquired.set()
+        release.wait(10)
+
+
+def _claim(directory: str) -> None:
+    FileDebouncer(directory, 0).claim(KEY)
+
+
+def test_lock_is_handed_off_between_processes(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    acquired, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_lock, args=(str(tmp_path), acquired, release))
+    holder.start()
+    try:
+        assert acquired.wait(10)
+        entered = threading.Event()
+
+        def run_second() -> None:
+            with FileDebouncer(str(tmp_path), 0).lock(KEY):
+                entered.set()
+
+        waiter = threading.Thread(target=run_second)
+        waiter.start()
+        assert not entered.wait(0.3)
+        release.set()
+        assert entered.wait(10)
+        waiter.join(10)
+    finally:
+        release.set()
+        holder.join(10)
+    assert holder.exitcode == 0
+
+
+def test_claim_from_another_process_supersedes_this_one(tmp_path):
+    debouncer = FileDebouncer(str(tmp_path), 0)
+    seq = debouncer.claim(KEY)
+    other = multiprocessing.get_context("fork").Process(target=_claim, args=(str(tmp_path),))
+    other.start()
+    other.join(10)
+    assert other.exitcode == 0
+    assert not debouncer.is_latest(KEY, seq)
+    assert debouncer.is_latest(KEY, seq + 1)
@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import REVIEWERS, reviewer_subtasks
+
+ALICE = REVIEWERS["alice"]
+
+
+@pytest.fixture
+def outbox_path(tmp_path) -> str:
+    return str(tmp_path / "outbox.sqlite")
+
+
+def queue_review_writes(asana_ws):
+    return [
+        asana_ws.queue_subtask("100", {"name": "html5:pr7: Fix crash", "assignee": ALICE}),
+        asana_ws.queue_comment("100", "Review requested"),
+    ]
+
+
+def crash_after_sending(asana_ws) -> None:
+    """Journal the queued writes and send them, then die before the responses are settled."""
+    actions = asana_ws._thread_writes()[:]
+    asana_ws.outbox.record(actions)
+    with asana_ws.outbox.exclusive():
+        claimed, _ = asana_ws.outbox.claim()
+        asana_ws._send_batch(claimed)
+    asana_ws.outbox.close()
+
+
+def test_writes_sent_before_a_crash_are_not_sent_again(fake, workspace, outbox_path):
+    crashed = workspace(outbox_path=outbox_path)
+    queue_review_writes(crashed)
+    crash_after_sending(crashed)
+    fake.reset_stats()
+
+    restarted = workspace(outbox_path=outbox_path)
+    stats = restarted.drain_outbox()
+
+    assert stats["done"] == 2 and stats["pending"] == stats["sending"] == 0
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+    assert fake.stories == [("100", "Review requested")]
+    assert ("POST", "/api/1.0/batch") not in fake.requests
+
+
+def test_writes_lost_before_reaching_asana_are_sent_on_restart(fake, workspace, outbox_path):
+    crashed = workspace(outbox_path=outbox_path)
+    actions = queue_review_writes(crashed)
+    crashed.outbox.record(actions)
+    with crashed.outbox.exclusive():
+        crashed.outbox.claim()
+    crashed.outbox.close()
+
+    restarted = workspace(outbox_path=outbox_path)
+    restarted.drain_outbox()
+    restarted.drain_outbox()
+
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+    assert fake.stories == [("100", "Review requested")]
+
+
+def test_in_doubt_writes_stay_journaled_while_asana_cannot_be_checked(fake, workspace, outbox_path):
+    crashed = workspace(outbox_path=outbox_path)
+    queue_review_writes(crashed)
+    crash_after_sending(crashed)
+
+    restarted = workspace(outbox_path=outbox_path)
+    # Both lookups run out of retries (three attempts each).
+    fake.rate_limit(6)
+    assert restarted.drain_outbox()["sending"] == 2
+
+    assert restarted.drain_outbox()["done"] == 2
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+    assert fake.stories == [("100", "Review requested")]
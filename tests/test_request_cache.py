@@ -0,0 +1,90 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from asana_workspace import FIELD_PROFILES
+from request_cache import RequestCache, written_gids
+
+TASK_URL = "https://app.asana.com/api/1.0/tasks/100"
+SUBTASKS_URL = "https://app.asana.com/api/1.0/tasks/100/subtasks"
+PROJECT_URL = "https://app.asana.com/api/1.0/projects/300"
+
+
+def response(*gids: str) -> SimpleNamespace:
+    """Stand-in for the SDK's raw response; the cache only reads its ``data`` bytes."""
+    return SimpleNamespace(data=b'{"data": [' + b", ".join(b'{"gid": "%s"}' % gid.encode() for gid in gids) + b"]}")
+
+
+def test_concurrent_identical_gets_share_one_call():
+    cache = RequestCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return response("100")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(TASK_URL, [], fetch))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["shared"] < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert [result.data for result in results] == [response("100").data] * 3
+    assert cache.stats() == {"hits": 0, "shared": 2, "misses": 1, "entries": 1}
+
+
+def test_write_drops_the_entries_naming_the_written_gids():
+    cache = RequestCache()
+    cache.get(TASK_URL, [], lambda: response("100"))
+    cache.get(SUBTASKS_URL, [], lambda: response("555", "556"))
+    cache.get(PROJECT_URL, [], lambda: response("300"))
+
+    # Completing subtask 555 changes the subtask list of 100, which names it, but not the task or the project.
+    assert cache.invalidate(written_gids("/tasks/555", {"data": {"completed": True}})) == 1
+
+    fetched = []
+    for url in (TASK_URL, SUBTASKS_URL, PROJECT_URL):
+        cache.get(url, [], lambda: fetched.append(url) or response())
+    assert fetched == [SUBTASKS_URL]
+
+
+def test_batch_write_drops_entries_of_every_action():
+    cache = RequestCache()
+    cache.get(TASK_URL, [], lambda: response("100"))
+    cache.get(PROJECT_URL, [], lambda: response("300"))
+    body = {"data": {"actions": [{"relative_path": "/tasks/100/stories", "data": {"text": "Looks good"}},
+                                 {"relative_path": "/sections/700/addTask", "data": {"task": "300"}}]}}
+
+    assert cache.invalidate(written_gids("https://app.asana.com/api/1.0/batch", body)) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_response_in_flight_during_a_write_is_not_kept():
+    cache = RequestCache()
+
+    def fetch():
+        cache.invalidate({"100"})
+        return response("100")
+
+    cache.get(TASK_URL, [], fetch)
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_reads_of_a_task_reach_asana_once(fake, workspace):
+    fake.latency = 0.05
+    asana_ws = workspace(max_workers=4)
+    fields = FIELD_PROFILES["opened"].task_fields
+
+    tasks = asana_ws.fan_out(lambda gid: asana_ws.get_root_task(gid, fields), ["100"] * 4).results
+
+    assert [task.name for task in tasks] == ["Login button crash on Android"] * 4
+    assert fake.requests == [("GET", "/api/1.0/tasks/100")]
+    assert asana_ws.request_cache.stats()["misses"] == 1
@@ -0,0 +1,292 @@
+import pytest
+
+import asana_sync
+import reconcile
+from asana_sync import NO_ROOT_TASK, SyncError
+from asana_workspace import FIELD_PROFILES, PLANNED_SECTION
+from conftest import PR_URL, REVIEWERS, make_pr, reviewer_subtasks
+from data import PRRecord
+
+ALICE, BOB, CAROL = REVIEWERS["alice"], REVIEWERS["bob"], REVIEWERS["carol"]
+SECTIONS_READ = ("GET", "/api/1.0/projects/300/sections")
+
+
+def planned_section(fake) -> str:
+    return next(gid for gid, section in fake.sections.items() if section["name"] == PLANNED_SECTION)
+
+
+def add_subtask(fake, number: str, assignee: str, completed: bool = False) -> str:
+    return fake.add_task(None, f"html5:pr{number}: Fix crash", parent="100", assignee=assignee,
+                         completed=completed)["gid"]
+
+
+# -- stage graph ---------------------------------------------------------------------------------
+
+
+def test_opened_creates_one_subtask_per_reviewer_in_planned_section(fake, workspace):
+    asana_sync.sync_pr(workspace(), "opened", make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+    section = planned_section(fake)
+    created = [task for task in fake.tasks.values() if task["parent"] == "100"]
+    assert all(task["sections"] == {"300": section} for task in created)
+    assert all(task["custom_fields"] == {"400": "400-0"} for task in created)
+
+
+def test_stages_run_after_the_stages_they_need(fake, workspace):
+    asana_ws = workspace()
+    asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"]), PR_URL)
+
+    stages = asana_ws.metrics.timeline["stages"]
+    for name, stage in stages.items():
+        for dep in stage["after"]:
+            assert stages[dep]["end_ms"] <= stage["start_ms"], f"{name} started before {dep} ended"
+    assert stages["resolve_field_config"]["after"] == ["fetch_root_tasks", "hydrate_subtasks", "resolve_reviewers"]
+    assert asana_ws.metrics.timeline["critical_path"][-2:] == ["handle_opened", "flush_section_moves"]
+
+
+def test_sections_are_read_only_when_subtasks_get_created(fake, workspace):
+    add_subtask(fake, "7", ALICE)
+
+    asana_sync.sync_pr(workspace(), "updated", make_pr(["alice"]), PR_URL)
+    asana_sync.sync_pr(workspace(), "closed", make_pr(["alice"]), PR_URL)
+    assert SECTIONS_READ not in fake.requests
+
+    asana_sync.sync_pr(workspace(), "updated", make_pr(["alice", "bob"]), PR_URL)
+    assert fake.requests.count(SECTIONS_READ) == 1
+
+
+def test_updated_opens_new_and_closes_dismissed_reviewers(fake, workspace):
+    add_subtask(fake, "7", ALICE)
+    add_subtask(fake, "7", CAROL)
+    add_subtask(fake, "8", CAROL)
+
+    asana_sync.sync_pr(workspace(), "updated", make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False), (CAROL, True)]
+    assert reviewer_subtasks(fake, "8") == [(CAROL, False)]
+
+
+def test_unknown_root_task_stops_the_run_before_any_write(fake, workspace):
+    asana_ws = workspace()
+    pr = make_pr(["alice"], body="https://app.asana.com/0/1/project/300/task/999")
+
+    with pytest.raises(SyncError, match="Could not load Asana task 999"):
+        asana_sync.sync_pr(asana_ws, "opened", pr, PR_URL)
+
+    assert not [request for request in fake.requests if request[0] != "GET"]
+    assert "handle_opened" not in asana_ws.metrics.timeline["stages"]
+
+
+def test_pr_without_root_task_fails(fake, workspace):
+    with pytest.raises(SyncError, match=NO_ROOT_TASK):
+        asana_sync.sync_pr(workspace(), "opened", make_pr(["alice"], body="no link"), PR_URL)
+    assert fake.requests == []
+
+
+def test_failed_root_task_does_not_stop_the_others(fake, workspace):
+    fake.add_task("101", "Second root", projects=["300"])
+    fake.add_task("102", "Third root", projects=["300"])
+    body = " ".join(f"https://app.asana.com/0/1/project/300/task/{gid}" for gid in ("100", "101", "102"))
+    asana_ws = workspace()
+    real = asana_ws.create_subtasks
+
+    def create_subtasks(task, *args, **kwargs):
+        if task.gid == "101":
+            raise RuntimeError("boom")
+        return real(task, *args, **kwargs)
+
+    asana_ws.create_subtasks = create_subtasks
+    with pytest.raises(SyncError, match="Sync failed for Asana task 101"):
+        asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"], body=body), PR_URL)
+
+    assert reviewer_subtasks(fake, parent="100") == [(ALICE, False)]
+    assert reviewer_subtasks(fake, parent="101") == []
+    assert reviewer_subtasks(fake, parent="102") == [(ALICE, False)]
+
+
+# -- request cache --------------------------------------------------------------------------------
+
+
+def test_request_cache_serves_repeated_reads_until_a_write(fake, workspace):
+    asana_ws = workspace()
+    fields = FIELD_PROFILES["opened"].task_fields
+    read = ("GET", "/api/1.0/tasks/100")
+
+    asana_ws.get_root_task("100", fields)
+    asana_ws.get_root_task("100", fields)
+    assert fake.requests.count(read) == 1
+
+    assert asana_ws.add_comment_to_task("100", "Looks good")
+    asana_ws.get_root_task("100", fields)
+    assert fake.requests.count(read) == 2
+    assert asana_ws.request_cache.stats()["hits"] == 1
+
+    # The daemon clears the cache between events.
+    asana_ws.request_cache.clear()
+    asana_ws.get_root_task("100", fields)
+    assert fake.requests.count(read) == 3
+
+
+def test_subtasks_created_in_a_run_are_seen_by_the_next_read(fake, workspace):
+    asana_ws = workspace()
+    asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"]), PR_URL)
+    asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+
+
+# -- outbox ---------------------------------------------------------------------------------------
+
+
+def test_deferred_writes_are_delivered_once_by_the_next_run(fake, workspace, tmp_path):
+    outbox_path = str(tmp_path / "outbox.sqlite")
+    asana_sync.sync_pr(workspace(outbox_path=outbox_path, outbox_defer=True), "opened", make_pr(["alice", "bob"]),
+                       PR_URL)
+    assert reviewer_subtasks(fake) == []
+
+    # A new process plans on top of the journal: it drains the outbox first and dedups against the result.
+    resumed = workspace(outbox_path=outbox_path)
+    asana_sync.sync_pr(resumed, "updated", make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+    assert resumed.outbox.stats()["pending"] == resumed.outbox.stats()["sending"] == 0
+
+
+def test_write_lost_behind_a_gateway_error_is_not_repeated(fake, workspace, tmp_path):
+    fake.fail_after_apply(1, 504)
+
+    asana_sync.sync_pr(workspace(outbox_path=str(tmp_path / "outbox.sqlite")), "opened",
+                       make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+
+
+def test_repeated_comment_refused_by_asana_is_resent(fake, workspace):
+    subtask_gid = add_subtask(fake, "7", ALICE)
+    asana_sync.sync_pr(workspace(), "comment", make_pr(["alice"]), PR_URL)
+    # The same text is already on the subtask, but from the earlier run: it must not count as this write.
+    fake.fail_before_apply(1, 500)
+
+    asana_sync.sync_pr(workspace(), "comment", make_pr(["alice"]), PR_URL)
+
+    assert fake.stories == [(subtask_gid, "Changes requested")] * 2
+
+
+def test_repeated_comment_lost_behind_a_gateway_error_is_not_repeated(fake, workspace):
+    subtask_gid = add_subtask(fake, "7", ALICE)
+    asana_sync.sync_pr(workspace(), "comment", make_pr(["alice"]), PR_URL)
+    fake.fail_after_apply(1, 504)
+
+    asana_sync.sync_pr(workspace(), "comment", make_pr(["alice"]), PR_URL)
+
+    assert fake.stories == [(subtask_gid, "Changes requested")] * 2
+
+
+# -- mirror ---------------------------------------------------------------------------------------
+
+
+def test_mirror_follows_changes_made_outside_the_sync(fake, workspace, tmp_path):
+    alice_gid = add_subtask(fake, "7", ALICE)
+    add_subtask(fake, "7", BOB)
+    asana_ws = workspace(mirror=True, cache_path=str(tmp_path / "cache.sqlite"))
+    asana_sync.sync_pr(asana_ws, "updated", make_pr(["alice", "bob"]), PR_URL)
+
+    # Someone deletes Alice's subtask by hand in Asana.
+    fake.handle("DELETE", f"/api/1.0/tasks/{alice_gid}", {}, {})
+    asana_ws.request_cache.clear()
+    fake.reset_stats()
+
+    asana_sync.sync_pr(asana_ws, "updated", make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+    assert ("GET", "/api/1.0/tasks/100/subtasks") not in fake.requests
+
+
+def test_mirror_rereads_only_changed_subtasks_in_the_next_process(fake, workspace, tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    add_subtask(fake, "7", ALICE)
+    asana_sync.sync_pr(workspace(mirror=True, cache_path=cache_path), "updated", make_pr(["alice"]), PR_URL)
+    bob_gid = add_subtask(fake, "7", BOB, completed=True)
+    fake.reset_stats()
+
+    asana_sync.sync_pr(workspace(mirror=True, cache_path=cache_path), "updated", make_pr(["alice", "bob"]), PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, True)]
+    assert ("GET", f"/api/1.0/tasks/{bob_gid}") in fake.requests
+    assert ("GET", "/api/1.0/tasks/100/subtasks") not in fake.requests
+
+
+def test_mirror_does_not_reread_subtasks_this_process_wrote(fake, workspace, tmp_path):
+    add_subtask(fake, "7", ALICE)
+    asana_ws = workspace(mirror=True, cache_path=str(tmp_path / "cache.sqlite"))
+    asana_sync.sync_pr(asana_ws, "updated", make_pr(["alice"]), PR_URL)
+    asana_sync.sync_pr(asana_ws, "updated", make_pr(["alice", "bob"]), PR_URL)
+    asana_ws.request_cache.clear()
+    fake.reset_stats()
+
+    asana_sync.sync_pr(asana_ws, "closed", make_pr(["alice", "bob"]), PR_URL)
+
+    assert [request for request in fake.requests if request[0] == "GET"] == [("GET", "/api/1.0/events")]
+    assert reviewer_subtasks(fake) == [(ALICE, True), (BOB, True)]
+
+
+def test_mirror_rereads_a_subtask_changed_after_its_own_write(fake, workspace, tmp_path):
+    asana_ws = workspace(mirror=True, cache_path=str(tmp_path / "cache.sqlite"))
+    asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"]), PR_URL)
+    alice_gid = next(gid for gid, task in fake.tasks.items() if task["parent"] == "100")
+    fake.handle("PUT", f"/api/1.0/tasks/{alice_gid}", {}, {"data": {"assignee": BOB}})
+    asana_ws.request_cache.clear()
+    fake.reset_stats()
+
+    asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"]), PR_URL)
+
+    assert ("GET", f"/api/1.0/tasks/{alice_gid}") in fake.requests
+    assert reviewer_subtasks(fake) == [(ALICE, False), (BOB, False)]
+
+
+# -- name matching --------------------------------------------------------------------------------
+
+
+def test_pr_without_link_is_matched_to_a_root_task_by_name(fake, workspace, tmp_path):
+    fake.add_task("101", "Payment form validation", projects=["300"])
+    asana_ws = workspace(task_index_projects=["300"], cache_path=str(tmp_path / "cache.sqlite"))
+    pr = make_pr(["alice"], title="Fix login button crash", body="", branch="fix/android-login-crash")
+
+    asana_sync.sync_pr(asana_ws, "opened", pr, PR_URL)
+
+    assert reviewer_subtasks(fake) == [(ALICE, False)]
+    assert reviewer_subtasks(fake, parent="101") == []
+
+
+def test_ambiguous_name_match_is_refused(fake, workspace, tmp_path):
+    fake.add_task("101", "Login button crash on iOS", projects=["300"])
+    asana_ws = workspace(task_index_projects=["300"], cache_path=str(tmp_path / "cache.sqlite"))
+
+    with pytest.raises(SyncError, match=NO_ROOT_TASK):
+        asana_sync.sync_pr(asana_ws, "opened", make_pr(["alice"], title="Login button crash", body=""), PR_URL)
+    assert not [request for request in fake.requests if request[0] != "GET"]
+
+
+# -- reconcile ------------------------------------------------------------------------------------
+
+
+def test_reconcile_applies_every_pr_with_one_tree_read(fake, workspace):
+    add_subtask(fake, "8", ALICE)
+    add_subtask(fake, "8", BOB)
+    add_subtask(fake, "9", CAROL)
+    records = [
+        PRRecord(pr=make_pr(["alice", "bob"], number="7"), state="open", url=PR_URL),
+        PRRecord(pr=make_pr(["alice"], number="8"), state="open"),
+        PRRecord(pr=make_pr(["carol"], number="9"), state="merged"),
+        PRRecord(pr=make_pr(["carol"], number="10", body=""), state="open"),
+    ]
+
+    summary = reconcile.reconcile(workspace(), records)
+
+    assert summary == {"prs": 4, "root_tasks": 1, "created": 2, "closed": 2}
+    assert reviewer_subtasks(fake, "7") == [(ALICE, False), (BOB, False)]
+    assert reviewer_subtasks(fake, "8") == [(ALICE, False), (BOB, True)]
+    assert reviewer_subtasks(fake, "9") == [(CAROL, True)]
+    assert fake.requests.count(("GET", "/api/1.0/tasks/100/subtasks")) == 1
+    assert sorted(text for task_gid, text in fake.stories) == ["Pull request closed", "Review request dismissed"]
@@ -0,0 +1,49 @@
+import logging
+
+from data import AsanaUser
+from user_directory import UserDirectory
+
+
+def make_directory(*users: AsanaUser) -> UserDirectory:
+    directory = UserDirectory()
+    directory.sync(users)
+    return directory
+
+
+def test_exact_email_is_trusted():
+    directory = make_directory(AsanaUser(gid="1", name="Mona Lisa", email="mona@example.com"),
+                               AsanaUser(gid="2", name="Mona Lisa", email="lisa@example.com"))
+
+    assert directory.resolve("octocat", {"octocat": "mona@example.com"}) == "1"
+    assert directory.resolve("lisa", email_domain="example.com") == "2"
+
+
+def test_unique_name_match_is_logged(caplog):
+    directory = make_directory(AsanaUser(gid="1", name="Mona Lisa", email="mona@example.com"))
+
+    with caplog.at_level(logging.INFO, logger="user_directory"):
+        assert directory.resolve("mona-lisa") == "1"
+    assert "mona-lisa" in caplog.text and "Mona Lisa" in caplog.text
+
+
+def test_name_and_local_part_of_different_users_is_ambiguous():
+    directory = make_directory(AsanaUser(gid="1", name="Sam", email="samuel@example.com"),
+                               AsanaUser(gid="2", name="Samuel Jones", email="sam@example.com"))
+
+    assert directory.resolve("sam") is None
+
+
+def test_shared_name_is_not_resolved_through_the_local_part(caplog):
+    directory = make_directory(AsanaUser(gid="1", name="Alex", email="alex@example.com"),
+                               AsanaUser(gid="2", name="Alex", email="alex.k@example.com"))
+
+    with caplog.at_level(logging.WARNING, logger="user_directory"):
+        assert directory.resolve("alex") is None
+        assert directory.resolve("octocat", {"octocat": "Alex"}) is None
+    assert "several Asana users" in caplog.text
+
+
+def test_name_and_local_part_of_the_same_user_resolve():
+    directory = make_directory(AsanaUser(gid="1", name="Mona", email="mona@example.com"))
+
+    assert directory.resolve("mona") == "1"
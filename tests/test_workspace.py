@@ -0,0 +1,122 @@
+import threading
+import time
+
+from asana_workspace import take
+
+USERS = ("GET", "/api/1.0/workspaces/1/users")
+SEARCH = ("GET", "/api/1.0/workspaces/1/tasks/search")
+
+
+# -- fan-out --------------------------------------------------------------------------------------
+
+
+def test_fan_out_keeps_input_order(workspace):
+    delays = [0.05, 0.0, 0.03, 0.01]
+
+    def call(delay: float) -> float:
+        time.sleep(delay)
+        return delay * 2
+
+    outcome = workspace(max_workers=4).fan_out(call, delays)
+
+    assert outcome.ok
+    assert outcome.results == [0.1, 0.0, 0.06, 0.02]
+
+
+def test_fan_out_reports_errors_under_their_index(workspace):
+    done = []
+    lock = threading.Lock()
+
+    def call(item: int) -> int:
+        if item % 2:
+            raise ValueError(f"odd {item}")
+        with lock:
+            done.append(item)
+        return item
+
+    outcome = workspace(max_workers=2).fan_out(call, range(5))
+
+    assert not outcome.ok
+    assert outcome.results == [0, None, 2, None, 4]
+    assert {i: str(e) for i, e in outcome.errors.items()} == {1: "odd 1", 3: "odd 3"}
+    assert sorted(done) == [0, 2, 4]
+
+
+def test_fan_out_runs_at_most_max_workers_calls_at_once(workspace):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call(item: int) -> int:
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return item
+
+    assert workspace(max_workers=3).fan_out(call, range(9)).results == list(range(9))
+    assert peak[0] == 3
+
+
+# -- streaming ------------------------------------------------------------------------------------
+
+
+def test_take_stops_pulling_items_once_done():
+    pulled = []
+
+    def items():
+        for i in range(10):
+            pulled.append(i)
+            yield i
+
+    assert list(take(items(), limit=3)) == [0, 1, 2]
+    assert pulled == [0, 1, 2]
+    pulled.clear()
+    assert list(take(items(), stop=lambda i: i == 1)) == [0, 1]
+    assert pulled == [0, 1]
+    assert list(take(items(), limit=0)) == []
+
+
+def test_iter_users_requests_only_the_pages_it_needs(fake, workspace):
+    for i in range(10):
+        fake.add_user(str(3000 + i), f"User {i}", f"user{i}@example.com")
+    asana_ws = workspace()
+    asana_ws.get_workspace()
+    fake.reset_stats()
+
+    first = next(asana_ws.iter_users(page_size=2))
+    assert first.gid == "2001"
+    assert fake.requests == [USERS]
+
+    asana_ws.request_cache.clear()  # pages already read would be served from the run's cache
+    fake.reset_stats()
+    assert [user.gid for user in asana_ws.iter_users(page_size=2, stop=lambda user: user.gid == "2003")] == [
+        "2001", "2002", "2003"]
+    assert fake.requests == [USERS] * 2
+
+    asana_ws.request_cache.clear()
+    fake.reset_stats()
+    assert len(list(asana_ws.iter_users(limit=5, page_size=2))) == 5
+    assert fake.requests == [USERS] * 3
+
+
+def test_iter_search_tasks_requests_only_the_pages_it_needs(fake, workspace):
+    for i in range(7):
+        fake.add_task(None, f"Login flow step {i}", projects=["300"])
+    asana_ws = workspace()
+
+    newest = next(asana_ws.iter_search_tasks("login flow", page_size=2))
+    assert newest.name == "Login flow step 6"
+    assert fake.requests == [SEARCH]
+
+    asana_ws.request_cache.clear()  # pages already read would be served from the run's cache
+    fake.reset_stats()
+    names = [task.name for task in asana_ws.iter_search_tasks("login flow", limit=3, page_size=2)]
+    assert names == ["Login flow step 6", "Login flow step 5", "Login flow step 4"]
+    assert fake.requests == [SEARCH] * 2
+
+    asana_ws.request_cache.clear()
+    fake.reset_stats()
+    assert len(asana_ws.search_task_by_name("login flow")) == 7
+    assert fake.requests == [SEARCH]
@@ -0,0 +1,280 @@
+import functools
+import importlib
+import json
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, TypeVar
+
+from data import BatchAction, CallRecord
+from metrics import Metrics, endpoint_name
+from request_cache import RequestCache, written_gids
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Asana refused the request before running it. Any other 5xx, or no answer at all, can come
+# after a write was applied, so resending it could create a second subtask or comment.
+UNAPPLIED_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def safe_to_resend(method: str, status: Optional[int]) -> bool:
+    """Whether a request answered with ``status`` may be sent again as it is."""
+    if method.upper() in IDEMPOTENT_METHODS:
+        return status in RETRYABLE_STATUSES
+    return status in UNAPPLIED_STATUSES
+
+
+def in_doubt(method: str, status: Optional[int]) -> bool:
+    """Whether a failed write may still have been applied, and must be looked up before it is resent."""
+    return method.upper() not in IDEMPOTENT_METHODS and (status is None or
+                                                         status in RETRYABLE_STATUSES - UNAPPLIED_STATUSES)
+
+
+class LazySdk:
+    """Stand-in for the ``asana`` package that imports it on first attribute access.
+
+    Importing the SDK pulls in every generated API class, which dominates CLI
+    start-up; actions that fail early or only touch cached data never pay for it.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(importlib.import_module("asana"), name)
+
+    @property
+    def ApiException(self) -> type:
+        return importlib.import_module("asana.rest").ApiException
+
+
+sdk = LazySdk()
+
+
+class LazyApi:
+    """Descriptor that builds an SDK API object (e.g. ``TasksApi``) on first use.
+
+    The owner must provide ``api_client`` and an ``_api_lock`` (RLock).
+    """
+
+    def __init__(self, class_name: str):
+        self.class_name = class_name
+
+    def __set_name__(self, owner, name: str):
+        self.attr = f"_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        api = instance.__dict__.get(self.attr)
+        if api is None:
+            with instance._api_lock:
+                api = instance.__dict__.get(self.attr)
+                if api is None:
+                    api = getattr(sdk, self.class_name)(instance.api_client)
+                    instance.__dict__[self.attr] = api
+        return api
+
+
+def header_value(headers: Optional[Mapping], name: str) -> Optional[str]:
+    if not headers:
+        return None
+    lowered = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == lowered), None)
+
+
+def retry_delay(status: Optional[int], headers: Optional[Mapping], attempt: int,
+                base_delay: float = 0.5, max_delay: float = 60.0) -> float:
+    """Seconds to wait before retrying a response with ``status``.
+
+    429 responses honour ``Retry-After``; otherwise the delay grows exponentially
+    with ``attempt`` and is jittered so parallel workers do not retry in lockstep.
+    """
+    if status == 429:
+        retry_after = header_value(headers, "Retry-After")
+        try:
+            if retry_after is not None:
+                return min(max_delay, max(0.0, float(retry_after)))
+        except ValueError:
+            logger.warning(f"Ignoring unparsable Retry-After header: {retry_after!r}")
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts of up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take one token if available and return 0; otherwise return the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Take one token, blocking until it is available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class TransportStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.limiter_wait = 0.0
+        self.retry_wait = 0.0
+
+    def record(self, **increments: float) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def throttled_seconds(self) -> float:
+        return self.limiter_wait + self.retry_wait
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "limiter_wait_s": round(self.limiter_wait, 3),
+                "retry_wait_s": round(self.retry_wait, 3),
+                "throttled_s": round(self.limiter_wait + self.retry_wait, 3),
+            }
+
+
+class RetryPolicy:
+    """Rate limit, retry budget and counters shared by the sync and async transports."""
+
+    def __init__(self, rate: float = 25.0, burst: float = 25.0, max_retries: int = 5,
+                 pool_size: int = 16, base_delay: float = 0.5, trace: bool = False):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.base_delay = base_delay
+        self.stats = TransportStats()
+        self.metrics = Metrics(trace)
+
+    def backoff(self, method: str, status: Optional[int], headers: Optional[Mapping], attempt: int,
+                unsent: bool = False, reason: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before resending a failed call, or None when it must not be resent.
+
+        ``unsent`` marks a call that never reached Asana, which is safe to resend whatever
+        its method. The retry is counted in ``stats`` and logged.
+        """
+        if attempt >= self.max_retries or not (unsent or safe_to_resend(method, status)):
+            return None
+        delay = retry_delay(status, headers, attempt, self.base_delay)
+        self.stats.record(retries=1, rate_limited=int(status == 429), retry_wait=delay)
+        logger.warning(f"Asana responded {status or reason}, retry {attempt + 1}/{self.max_retries} in {delay:.2f}s.")
+        return delay
+
+    def batch_backoff(self, actions: List[BatchAction], attempt: int) -> float:
+        """Seconds to wait before resending the failed actions of a /batch request, counted and logged."""
+        delay = max(retry_delay(a.status_code, a.headers, attempt, self.base_delay) for a in actions)
+        self.stats.record(retries=len(actions), rate_limited=sum(a.status_code == 429 for a in actions),
+                          retry_wait=delay)
+        logger.warning(f"Retrying {len(actions)} batch action(s) in {delay:.2f}s.")
+        return delay
+
+
+class Transport(RetryPolicy):
+    """Shared rate limiting and retry policy for every Asana API object of a workspace."""
+
+    def send(self, call: Callable[[], T], endpoint: Optional[str] = None, request_bytes: int = 0,
+             method: str = "GET") -> T:
+        """Run ``call`` under the rate limiter, retrying the statuses ``safe_to_resend`` allows for ``method``.
+
+        With ``endpoint`` set, one CallRecord covering all attempts is added to ``metrics``.
+        """
+        attempt = 0
+        start = time.perf_counter()
+
+        def record(outcome: str, response_bytes: int) -> None:
+            if endpoint:
+                self.metrics.record(CallRecord(endpoint=endpoint, latency=time.perf_counter() - start,
+                                               request_bytes=request_bytes, response_bytes=response_bytes,
+                                               retries=attempt, outcome=outcome))
+
+        while True:
+            self.stats.record(requests=1, limiter_wait=self.bucket.acquire())
+            try:
+                response = call()
+                record(str(getattr(response, "status", "")), len(getattr(response, "data", None) or b""))
+                return response
+            except sdk.ApiException as e:
+                delay = self.backoff(method, e.status, e.headers, attempt)
+                if delay is None:
+                    record(str(e.status), len(e.body or b""))
+                    raise
+                time.sleep(delay)
+                attempt += 1
+            except Exception as e:
+                record(type(e).__name__, 0)
+                raise
+
+    def api_client(self, token: str, host: Optional[str] = None, request_cache: Optional[RequestCache] = None):
+        from urllib3.util.retry import Retry
+
+        configuration = sdk.Configuration()
+        configuration.access_token = token
+        if host:
+            configuration.host = host.rstrip("/")
+        configuration.connection_pool_maxsize = self.pool_size
+        # Status retries are handled in send(); urllib3 only retries connection failures.
+        configuration.retry_strategy = Retry(total=3, backoff_factor=self.base_delay, status_forcelist=(),
+                                             respect_retry_after_header=False)
+        return rate_limited_client_class()(configuration, self, request_cache)
+
+
+@functools.lru_cache(maxsize=None)
+def rate_limited_client_class() -> type:
+    """ApiClient subclass routing every HTTP request through a Transport; defined on demand."""
+
+    class RateLimitedApiClient(sdk.ApiClient):
+        def __init__(self, configuration, transport: Transport, request_cache: Optional[RequestCache] = None):
+            super().__init__(configuration)
+            self.transport = transport
+            self.request_cache = request_cache
+
+        def request(self, method, url, *args, **kwargs):
+            body = kwargs.get("body")
+
+            def send():
+                return self.transport.send(lambda: sdk.ApiClient.request(self, method, url, *args, **kwargs),
+                                           endpoint_name(method, url), len(json.dumps(body)) if body else 0,
+                                           method)
+
+            cache = self.request_cache
+            if not cache or not kwargs.get("_preload_content", True):
+                return send()
+            if method == "GET":
+                return cache.get(url, kwargs.get("query_params"), send) if cache.cacheable(url) else send()
+            try:
+                return send()
+            finally:
+                cache.invalidate(written_gids(url, body))
+
+    return RateLimitedApiClient
@@ -0,0 +1,204 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from data import AsanaUser
+
+logger = logging.getLogger(__name__)
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# An index slot holds one row, or a tuple of rows when the key is ambiguous.
+Slot = Union[int, Tuple[int, ...]]
+
+
+def normalize_name(value: str) -> str:
+    """``"Jürgen O'Neil"``, ``"jurgen-oneil"`` and ``"JurgenONeil"`` all give ``"jurgenoneil"``."""
+    folded = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().lower()
+    return NON_ALNUM.sub("", folded)
+
+
+class UserDirectory:
+    """Workspace users kept in parallel arrays, with indexes by email, normalised name and email local part.
+
+    Rows are persisted in SQLite (the metadata cache file) and refreshed by streaming
+    the workspace users: only rows that changed are rewritten, users that disappeared
+    are dropped. Keys shared by several users are marked ambiguous and never resolve.
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: float = 6 * 3600):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS directory_users (gid TEXT PRIMARY KEY, name TEXT, email TEXT);"
+            "CREATE TABLE IF NOT EXISTS directory_state (key TEXT PRIMARY KEY, value REAL NOT NULL);"
+        )
+        self._conn.commit()
+        self.refreshed_at = 0.0
+        self._gids: List[Optional[str]] = []
+        self._names: List[Optional[str]] = []
+        self._emails: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._indexes: Dict[str, Dict[str, Slot]] = {"email": {}, "name": {}, "local": {}}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def stale(self) -> bool:
+        return self.refreshed_at + self.max_age < time.time()
+
+    def _load(self) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM directory_state WHERE key = 'refreshed_at'").fetchone()
+            self.refreshed_at = row[0] if row else 0.0
+            for gid, name, email in self._conn.execute("SELECT gid, name, email FROM directory_users"):
+                self._append(gid, name, email)
+        if self._rows:
+            logger.debug(f"Loaded {len(self._rows)} user(s) from the directory.")
+
+    # -- indexes -----------------------------------------------------------------------------
+
+    @staticmethod
+    def _keys(name: Optional[str], email: Optional[str]) -> Iterable[Tuple[str, str]]:
+        if email:
+            yield "email", email.lower()
+            yield "local", normalize_name(email.split("@", 1)[0])
+        if name:
+            yield "name", normalize_name(name)
+
+    def _index(self, row: int, add: bool) -> None:
+        for index_name, key in self._keys(self._names[row], self._emails[row]):
+            if not key:
+                continue
+            index = self._indexes[index_name]
+            rows = index.get(key, ())
+            rows = (rows,) if isinstance(rows, int) else rows
+            rows = rows + (row,) if add else tuple(r for r in rows if r != row)
+            if not rows:
+                index.pop(key, None)
+            else:
+                index[key] = rows[0] if len(rows) == 1 else rows
+
+    def _append(self, gid: str, name: Optional[str], email: Optional[str]) -> None:
+        self._rows[gid] = len(self._gids)
+        self._gids.append(gid)
+        self._names.append(name)
+        self._emails.append(email)
+        self._index(self._rows[gid], add=True)
+
+    def _lookup(self, index_name: str, key: str) -> Optional[str]:
+        row = self._indexes[index_name].get(key)
+        return self._gids[row] if isinstance(row, int) else None
+
+    # -- lookups -----------------------------------------------------------------------------
+
+    def get(self, gid: str) -> Optional[AsanaUser]:
+        row = self._rows.get(gid)
+        if row is None:
+            return None
+        return AsanaUser(gid=gid, name=self._names[row], email=self._emails[row])
+
+    def by_email(self, email: str) -> Optional[str]:
+        return self._lookup("email", email.lower())
+
+    def by_name(self, name: str) -> Optional[str]:
+        return self._lookup("name", normalize_name(name))
+
+    def resolve(self, login: str, login_map: Optional[Dict[str, str]] = None,
+                email_domain: Optional[str] = None) -> Optional[str]:
+        """Gid of the Asana user behind a GitHub ``login``, or None when it cannot be told apart.
+
+        ``login_map`` may map the login to an email or a display name; otherwise the login is
+        tried as ``login@email_domain``, and then as a name and as an email local part. Only an
+        exact email is trusted as is: any other match must point to a single user, and is logged.
+        """
+        with self._lock:
+            target = (login_map or {}).get(login)
+            if target:
+                if "@" in target:
+                    return self.by_email(target)
+                return self._unique(login, [("name", normalize_name(target))])
+            if email_domain:
+                gid = self.by_email(f"{login}@{email_domain}")
+                if gid:
+                    return gid
+            key = normalize_name(login)
+            if not key:
+                return None
+            return self._unique(login, [("name", key), ("local", key)])
+
+    def _unique(self, login: str, keys: List[Tuple[str, str]]) -> Optional[str]:
+        """The one user matched by any of ``keys``, or None when none or several are."""
+        rows = set()
+        for index_name, key in keys:
+            slot = self._indexes[index_name].get(key, ())
+            rows.update((slot,) if isinstance(slot, int) else slot)
+        if len(rows) > 1:
+            names = ", ".join(sorted(f"{self._names[row]} <{self._emails[row]}>" for row in rows))
+            logger.warning(f"GitHub login '{login}' matches several Asana users ({names}); not assigning any.")
+            return None
+        if not rows:
+            return None
+        row = rows.pop()
+        logger.info(f"GitHub login '{login}' matched Asana user {self._names[row]} <{self._emails[row]}> "
+                    f"({self._gids[row]}) without an exact email.")
+        return self._gids[row]
+
+    # -- refresh -----------------------------------------------------------------------------
+
+    def sync(self, users: Iterable[AsanaUser]) -> Dict[str, int]:
+        """Apply a full stream of workspace users; only changed rows are written.
+
+        Users missing from the stream are dropped, so an exception raised by ``users``
+        aborts the refresh after keeping the rows applied so far.
+        """
+        seen = set()
+        added = changed = 0
+        with self._lock:
+            try:
+                for user in users:
+                    seen.add(user.gid)
+                    added, changed = self._apply(user, added, changed)
+            except Exception:
+                self._conn.commit()
+                raise
+            removed = [gid for gid in self._rows if gid not in seen]
+            for gid in removed:
+                row = self._rows.pop(gid)
+                self._index(row, add=False)
+                self._gids[row] = self._names[row] = self._emails[row] = None
+            self._conn.executemany("DELETE FROM directory_users WHERE gid = ?", [(gid,) for gid in removed])
+            self.refreshed_at = time.time()
+            self._conn.execute("INSERT OR REPLACE INTO directory_state (key, value) VALUES ('refreshed_at', ?)",
+                               (self.refreshed_at,))
+            self._conn.commit()
+        stats = {"users": len(self._rows), "added": added, "changed": changed, "removed": len(removed)}
+        logger.info(f"User directory refreshed: {stats}")
+        return stats
+
+    def _apply(self, user: AsanaUser, added: int, changed: int) -> Tuple[int, int]:
+        row = self._rows.get(user.gid)
+        if row is None:
+            self._append(user.gid, user.name, user.email)
+            added += 1
+        elif (self._names[row], self._emails[row]) != (user.name, user.email):
+            self._index(row, add=False)
+            self._names[row], self._emails[row] = user.name, user.email
+            self._index(row, add=True)
+            changed += 1
+        else:
+            return added, changed
+        self._conn.execute("INSERT OR REPLACE INTO directory_users (gid, name, email) VALUES (?, ?, ?)",
+                           (user.gid, user.name, user.email))
+        return added, changed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
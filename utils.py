@@ -3,21 +3,31 @@ import json
 import re
 import sys
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from data import Config, PRData, AsanaProject
-from dotenv import load_dotenv
 
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
 logger = logging.getLogger(__name__)
 
 
-def load_config() -> Config:
+def setup_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+
+def load_config(require_pr: bool = True) -> Config:
+    """Build the run configuration from the environment (and ``.env.test``).
+
+    With ``require_pr=False`` (webhook daemon mode) the PR_* variables are optional
+    and ``Config.pr`` is left empty; PR data then comes with each event.
+    """
+    from dotenv import load_dotenv
+
     load_dotenv(dotenv_path=".env.test")
 
     token = os.getenv('ASANA_TOKEN')
@@ -26,25 +36,69 @@ def load_config() -> Config:
     pr_title = os.getenv('PR_TITLE')
     pr_body = os.getenv('PR_BODY')
     pr_reviewers_raw = os.getenv('REVIEWERS')
+    pr_branch = os.getenv('PR_BRANCH') or os.getenv('GITHUB_HEAD_REF') or ""
     platform = os.getenv('PLATFORM')
+    host = os.getenv('ASANA_HOST')
+    max_workers = int(os.getenv('ASANA_MAX_WORKERS', '8'))
+    cache_path = os.getenv('ASANA_CACHE_PATH', ':memory:')
+    cache_ttl = float(os.getenv('ASANA_CACHE_TTL', str(6 * 3600)))
+    rate_limit = float(os.getenv('ASANA_RATE_LIMIT', '25'))
+    rate_burst = float(os.getenv('ASANA_RATE_BURST', '25'))
+    max_retries = int(os.getenv('ASANA_MAX_RETRIES', '5'))
+    pool_size = int(os.getenv('ASANA_POOL_SIZE', '16'))
+    coalesce_window = float(os.getenv('ASANA_COALESCE_WINDOW', '0'))
+    coalesce_dir = os.getenv('ASANA_COALESCE_DIR')
+    mirror = os.getenv('ASANA_MIRROR', '').lower() in ('1', 'true', 'yes')
+    user_directory = os.getenv('ASANA_USER_DIRECTORY', '').lower() in ('1', 'true', 'yes')
+    metrics_path = os.getenv('ASANA_METRICS_PATH')
+    trace_path = os.getenv('ASANA_TRACE_PATH')
+    outbox_path = os.getenv('ASANA_OUTBOX_PATH')
+    outbox_defer = os.getenv('ASANA_OUTBOX_DEFER', '').lower() in ('1', 'true', 'yes')
+    async_client = os.getenv('ASANA_ASYNC', '').lower() in ('1', 'true', 'yes')
+    task_index_projects = [gid.strip() for gid in os.getenv('ASANA_TASK_INDEX_PROJECTS', '').split(',') if gid.strip()]
+    task_match_min = float(os.getenv('ASANA_TASK_MATCH_MIN', '0.6'))
 
     missing = []
     if not token: missing.append('ASANA_TOKEN')
     if not workspace_gid: missing.append('ASANA_WORKSPACE_GID')
-    if not pr_number: missing.append('PR_NUMBER')
-    if not pr_title: missing.append('PR_TITLE')
+    if require_pr and not pr_number: missing.append('PR_NUMBER')
+    if require_pr and not pr_title: missing.append('PR_TITLE')
     if not platform: missing.append('PLATFORM')
 
     if missing:
         logger.error(f"Missing required environment variables: {', '.join(missing)}")
         raise EnvironmentError("Missing required environment variables")
 
-    pr_reviewers = pr_reviewers_raw.split(',')
+    pr = None
+    if pr_number:
+        pr_reviewers = pr_reviewers_raw.split(',') if pr_reviewers_raw else []
+        pr = PRData(number=pr_number, title=pr_title, body=pr_body, platform=platform, reviewers=pr_reviewers,
+                    branch=pr_branch)
 
     return Config(
         token=token,
         workspace_gid=workspace_gid,
-        pr=PRData(number=pr_number, title=pr_title, body=pr_body, platform=platform, reviewers=pr_reviewers)
+        platform=platform,
+        pr=pr,
+        host=host,
+        max_workers=max_workers,
+        cache_path=cache_path,
+        cache_ttl=cache_ttl,
+        rate_limit=rate_limit,
+        rate_burst=rate_burst,
+        max_retries=max_retries,
+        pool_size=pool_size,
+        coalesce_window=coalesce_window,
+        coalesce_dir=coalesce_dir,
+        mirror=mirror,
+        user_directory=user_directory,
+        metrics_path=metrics_path,
+        trace_path=trace_path,
+        outbox_path=outbox_path,
+        outbox_defer=outbox_defer,
+        async_client=async_client,
+        task_index_projects=task_index_projects,
+        task_match_min=task_match_min
     )
 
 
@@ -61,6 +115,22 @@ def load_reviewer_mapping() -> Dict:
         raise
 
 
+def load_login_mapping() -> Dict[str, str]:
+    """GitHub login -> Asana email or display name, from the optional GITHUB_LOGIN_MAP JSON."""
+    raw = os.getenv("GITHUB_LOGIN_MAP")
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except Exception as e:
+        logger.error(f"Error parsing GITHUB_LOGIN_MAP from environment: {e}")
+        raise
+
+
+def get_email_domain() -> Optional[str]:
+    return os.getenv("GITHUB_EMAIL_DOMAIN") or None
+
+
 def get_pr_url() -> str:
     url = os.getenv("PR_URL")
     if url:
@@ -82,9 +152,16 @@ def extract_project_gid(url: str) -> str:
     return ""
 
 
-def parse_sprint_info(name: str) -> Optional[Tuple[int, datetime, datetime]]:
-    pattern = r"Sprint\s+(\d+)\s+\((\d{2}\.\d{2})-(\d{2}\.\d{2})\)"
-    match = re.search(pattern, name)
+SPRINT_PATTERN = re.compile(r"Sprint\s+(\d+)\s+\((\d{2}\.\d{2})-(\d{2}\.\d{2})\)")
+
+
+def parse_sprint_info(name: str, year: Optional[int] = None) -> Optional[Tuple[int, datetime, datetime]]:
+    return _parse_sprint_info(name, year or datetime.now().year)
+
+
+@lru_cache(maxsize=1024)
+def _parse_sprint_info(name: str, current_year: int) -> Optional[Tuple[int, datetime, datetime]]:
+    match = SPRINT_PATTERN.search(name)
 
     if not match:
         return None
@@ -93,7 +170,6 @@ def parse_sprint_info(name: str) -> Optional[Tuple[int, datetime, datetime]]:
     start_str = match.group(2)
     end_str = match.group(3)
 
-    current_year = datetime.now().year
     start_date = datetime.strptime(f"{start_str}.{current_year}", "%d.%m.%Y")
     end_date = datetime.strptime(f"{end_str}.{current_year}", "%d.%m.%Y")
 
@@ -106,9 +182,10 @@ def parse_sprint_info(name: str) -> Optional[Tuple[int, datetime, datetime]]:
 
 def get_latest_sprint_project(projects: List[AsanaProject]) -> Optional[Tuple[int, datetime, datetime, AsanaProject]]:
     parsed_projects = []
+    current_year = datetime.now().year
 
     for project in projects:
-        parsed = parse_sprint_info(project.name)
+        parsed = parse_sprint_info(project.name, current_year)
         if parsed:
             sprint_number, start, end = parsed
             parsed_projects.append((sprint_number, start, end, project))
@@ -119,9 +196,13 @@ def get_latest_sprint_project(projects: List[AsanaProject]) -> Optional[Tuple[in
     return max(parsed_projects, key=lambda x: x[0])
 
 
+@lru_cache(maxsize=None)
+def task_title_pattern(platform: str) -> re.Pattern:
+    return re.compile(rf'^{re.escape(platform)}:pr(\d+): .+$')
+
+
 def parse_task_title(title: str, platform: str) -> (bool, Optional[int]):
-    pattern = rf'^{platform}:pr(\d+): .+$'
-    match = re.match(pattern, title)
+    match = task_title_pattern(platform).match(title)
     if match:
         pr_number = match.group(1)
         return True, pr_number
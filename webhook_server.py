@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import weakref
+from typing import Dict, Optional, Tuple
+
+import asana_sync
+from coalesce import EventCoalescer
+from asana_workspace import AsanaWorkspace
+from data import PRData, PREvent
+
+logger = logging.getLogger(__name__)
+
+PULL_REQUEST_ACTIONS = {
+    "opened": "opened",
+    "reopened": "opened",
+    "ready_for_review": "opened",
+    "closed": "closed",
+    "edited": "updated",
+    "synchronize": "updated",
+    "review_requested": "updated",
+    "review_request_removed": "updated",
+}
+REVIEW_STATES = {
+    "approved": "approved",
+    "changes_requested": "comment",
+}
+MAX_BODY_SIZE = 25 * 1024 * 1024  # GitHub caps webhook payloads at 25 MB
+
+
+def parse_event(event_name: str, payload: Dict, platform: str) -> Optional[PREvent]:
+    """Map a GitHub ``pull_request``/``pull_request_review`` payload onto a sync action.
+
+    Returns None for events the sync does not act on.
+    """
+    pull_request = payload.get("pull_request")
+    if not pull_request:
+        return None
+
+    reviewers = [r["login"] for r in pull_request.get("requested_reviewers") or []]
+    if event_name == "pull_request":
+        action = PULL_REQUEST_ACTIONS.get(payload.get("action"))
+    elif event_name == "pull_request_review" and payload.get("action") == "submitted":
+        review = payload.get("review") or {}
+        action = REVIEW_STATES.get((review.get("state") or "").lower())
+        reviewers = [review["user"]["login"]] if review.get("user") else []
+    else:
+        action = None
+    if not action:
+        return None
+
+    pr = PRData(
+        number=str(pull_request["number"]),
+        title=pull_request.get("title") or "",
+        body=pull_request.get("body") or "",
+        platform=platform,
+        reviewers=reviewers,
+        branch=(pull_request.get("head") or {}).get("ref") or ""
+    )
+    return PREvent(action=action, pr=pr, pr_url=pull_request.get("html_url") or "")
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    if not signature:
+        return False
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class WebhookServer:
+    """Minimal HTTP/1.1 endpoint for GitHub webhooks that reuses one warm AsanaWorkspace.
+
+    Deliveries are acknowledged with 202 straight away and synced in the background.
+    With the synchronous workspace events run one at a time, so its write queues are
+    never shared between events; an AsyncAsanaWorkspace runs events of different PRs
+    concurrently on the event loop and only serialises events of the same PR.
+    Bursts of ``updated`` events for one PR are debounced by an EventCoalescer.
+    """
+
+    def __init__(self, asana_ws: AsanaWorkspace, secret: Optional[str] = None, coalesce_window: float = 0.0):
+        self.asana_ws = asana_ws
+        self.secret = secret
+        self.coalescer = EventCoalescer(coalesce_window)
+        self._sync_lock = asyncio.Lock()
+        self._pr_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._running = 0
+        self._wakeup = asyncio.Event()
+        self._tasks = set()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, message = await self._handle_request(reader)
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            status, message = 400, f"Malformed request: {e}"
+        body = json.dumps({"message": message}).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader) -> Tuple[int, str]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if len(request_line) < 2 or request_line[0] != "POST":
+            return 405, "Only POST is supported"
+        length = int(headers.get("content-length", "0"))
+        if length > MAX_BODY_SIZE:
+            return 413, "Payload too large"
+        body = await reader.readexactly(length)
+
+        if self.secret and not verify_signature(self.secret, body, headers.get("x-hub-signature-256")):
+            return 401, "Invalid signature"
+
+        event_name = headers.get("x-github-event", "")
+        if event_name == "ping":
+            return 200, "pong"
+        event = parse_event(event_name, json.loads(body), self.asana_ws.platform)
+        if not event:
+            return 200, f"Ignored {event_name} event"
+
+        for ready in self.coalescer.submit(event):
+            self._schedule(ready)
+        self._wakeup.set()
+        return 202, f"Accepted {event.action} for PR #{event.pr.number}"
+
+    def _schedule(self, event: PREvent) -> None:
+        task = asyncio.create_task(self.dispatch(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def release_coalesced(self) -> None:
+        """Dispatch debounced events as their quiet windows expire."""
+        while True:
+            for event in self.coalescer.due():
+                self._schedule(event)
+            deadline = self.coalescer.next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - self.coalescer.clock())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _lock_for(self, event: PREvent) -> asyncio.Lock:
+        if not self.asana_ws.is_async:
+            return self._sync_lock
+        key = (event.pr.platform, event.pr.number)
+        lock = self._pr_locks.get(key)
+        if lock is None:
+            lock = self._pr_locks[key] = asyncio.Lock()
+        return lock
+
+    async def dispatch(self, event: PREvent) -> None:
+        logger.info(f"Webhook: {event.action} for PR #{event.pr.number} '{event.pr.title}'")
+        async with self._lock_for(event):
+            self._running += 1
+            try:
+                if self.asana_ws.is_async:
+                    import async_sync
+                    await async_sync.sync_pr(self.asana_ws, event.action, event.pr, event.pr_url)
+                else:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, asana_sync.sync_pr, self.asana_ws, event.action, event.pr, event.pr_url
+                    )
+            except asana_sync.SyncError as e:
+                logger.error(f"PR #{event.pr.number}: {e}")
+            except Exception:
+                logger.exception(f"PR #{event.pr.number}: sync failed")
+            finally:
+                self._running -= 1
+                # Metrics and the request cache are scoped to one event, so nothing accumulates
+                # in the daemon and no event reads a task state cached by an earlier one. With
+                # concurrent events the metrics cover everything since the last idle moment.
+                asana_sync.report_metrics(self.asana_ws, action=event.action, pr=event.pr.number)
+                if not self._running:
+                    self.asana_ws.metrics.reset()
+                if self.asana_ws.request_cache:
+                    self.asana_ws.request_cache.clear()
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"Listening for GitHub webhooks on {host}:{port}")
+        releaser = asyncio.create_task(self.release_coalesced())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            releaser.cancel()
+            if self.asana_ws.is_async:
+                await self.asana_ws.close()
+
+
+def serve(asana_ws: AsanaWorkspace, address: str = "127.0.0.1:8080", coalesce_window: float = 0.0) -> None:
+    host, _, port = address.rpartition(":")
+    server = WebhookServer(asana_ws, os.getenv("GITHUB_WEBHOOK_SECRET"), coalesce_window)
+    asyncio.run(server.serve_forever(host or "127.0.0.1", int(port)))